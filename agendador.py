@@ -0,0 +1,361 @@
+"""
+Agendador (daemon) das tarefas periódicas do sistema
+Substitui as tarefas agendadas do Windows e os scripts avulsos:
+sincronização de formulários, fila do Wasseller, limpeza da fila e reconstrução do feed.
+Todas as tarefas compartilham um único IntegrationOrchestrator já inicializado.
+
+Uso:
+    python agendador.py            # roda continuamente
+    python agendador.py --once     # executa cada tarefa uma vez e sai
+"""
+import json
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+from datetime import datetime, timezone
+import schedule
+from config import Config
+from integrations.form_sync import next_watermark
+from orchestrator import IntegrationOrchestrator
+from setup_google_auth import load_google_credentials
+
+
+class ScheduledJob:
+    """Tarefa periódica com jitter, proteção contra sobreposição e métricas"""
+
+    def __init__(self, name: str, func: Callable[[], Optional[Dict]], jitter_seconds: int = 0):
+        """
+        Args:
+            name: Nome da tarefa (usado nos logs e métricas)
+            func: Função executada a cada disparo
+            jitter_seconds: Atraso aleatório máximo antes de cada execução
+        """
+        self.name = name
+        self.func = func
+        self.jitter_seconds = jitter_seconds
+        self._running = threading.Lock()
+        self.metrics = {
+            'runs': 0,
+            'successes': 0,
+            'failures': 0,
+            'skipped_overlaps': 0,
+            'last_started': None,
+            'last_finished': None,
+            'last_duration': None,
+            'avg_duration': None,
+            'max_duration': None,
+            'last_error': None,
+            'last_result': None
+        }
+
+    def trigger(self):
+        """Dispara a tarefa em background (chamado pelo schedule)"""
+        if self._running.locked():
+            # Execução anterior ainda em andamento: não sobrepõe
+            self.metrics['skipped_overlaps'] += 1
+            print(f"⏭️  [{self.name}] Execução anterior ainda em andamento, pulando")
+            return
+        threading.Thread(target=self.run, name=f"job-{self.name}", daemon=True).start()
+
+    def run(self, apply_jitter: bool = True) -> bool:
+        """Executa a tarefa (com jitter) registrando métricas"""
+        if not self._running.acquire(blocking=False):
+            self.metrics['skipped_overlaps'] += 1
+            return False
+
+        try:
+            if apply_jitter and self.jitter_seconds:
+                time.sleep(random.uniform(0, self.jitter_seconds))
+
+            self.metrics['last_started'] = datetime.now().isoformat()
+            start = time.perf_counter()
+            try:
+                result = self.func()
+                self.metrics['successes'] += 1
+                self.metrics['last_error'] = None
+                self.metrics['last_result'] = result
+                success = True
+            except Exception as e:
+                self.metrics['failures'] += 1
+                self.metrics['last_error'] = str(e)
+                print(f"❌ [{self.name}] Erro: {e}")
+                success = False
+
+            duration = round(time.perf_counter() - start, 3)
+            runs = self.metrics['runs'] + 1
+            previous_avg = self.metrics['avg_duration'] or 0.0
+            self.metrics['runs'] = runs
+            self.metrics['last_finished'] = datetime.now().isoformat()
+            self.metrics['last_duration'] = duration
+            self.metrics['avg_duration'] = round(previous_avg + (duration - previous_avg) / runs, 3)
+            self.metrics['max_duration'] = max(self.metrics['max_duration'] or 0.0, duration)
+            print(f"{'✅' if success else '❌'} [{self.name}] Concluída em {duration}s")
+            return success
+        finally:
+            self._running.release()
+
+
+class Agendador:
+    """Processo de longa duração que executa as tarefas periódicas"""
+
+    def __init__(self, status_file: str = "agendador_status.json", state_file: str = "agendador_estado.json"):
+        """
+        Args:
+            status_file: Arquivo JSON com as métricas de cada tarefa
+            state_file: Arquivo JSON com o estado entre execuções (última sincronização)
+        """
+        self.status_file = status_file
+        self.state_file = state_file
+        self.state = self._load_state()
+
+        # Um único orquestrador "quente" para todas as tarefas; os uploads do Drive
+        # ficam na fila e são enviados pelos workers do servidor web
+        self.orchestrator = IntegrationOrchestrator(start_upload_workers=False)
+        if not self.orchestrator.google_forms:
+            creds = load_google_credentials()
+            if creds:
+                self.orchestrator.set_google_credentials(creds)
+
+        self.scheduler = schedule.Scheduler()
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._register_jobs()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao carregar estado do agendador: {e}")
+            return {}
+
+    def _save_state(self):
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao salvar estado do agendador: {e}")
+
+    def _add_job(self, name: str, func: Callable[[], Optional[Dict]], every: schedule.Job):
+        job = ScheduledJob(name, func, jitter_seconds=Config.SCHEDULER_JITTER_SECONDS)
+        every.do(job.trigger)
+        self.jobs[name] = job
+
+    def _register_jobs(self):
+        """Registra as tarefas conforme a configuração"""
+        if Config.FORMS_INGESTION_MODE == 'watch':
+            # Em modo watch as respostas chegam por push; só é preciso renovar os watches
+            self._add_job(
+                'renovar_watches',
+                self.job_renovar_watches,
+                self.scheduler.every(Config.SCHEDULER_WATCH_RENEW_MINUTES).minutes
+            )
+        elif Config.FORMS_INGESTION_MODE == 'polling':
+            # Em modo webhook as respostas chegam pelo Apps Script; polling só quando configurado
+            self._add_job(
+                'sincronizar_formularios',
+                self.job_sincronizar_formularios,
+                self.scheduler.every(Config.SCHEDULER_SYNC_MINUTES).minutes
+            )
+        self._add_job(
+            'processar_fila_wasseller',
+            self.job_processar_fila,
+            self.scheduler.every(Config.SCHEDULER_QUEUE_MINUTES).minutes
+        )
+        self._add_job(
+            'reprocessar_etapas_adiadas',
+            self.job_reprocessar_etapas_adiadas,
+            self.scheduler.every(Config.SCHEDULER_QUEUE_MINUTES).minutes
+        )
+        self._add_job(
+            'limpar_mensagens_enviadas',
+            self.job_limpar_mensagens_enviadas,
+            self.scheduler.every(Config.SCHEDULER_CLEANUP_HOURS).hours
+        )
+        self._add_job(
+            'limpar_arquivo_pdfs',
+            self.job_limpar_arquivo_pdfs,
+            self.scheduler.every(Config.SCHEDULER_CLEANUP_HOURS).hours
+        )
+        self._add_job(
+            'limpar_fila_drive',
+            self.job_limpar_fila_drive,
+            self.scheduler.every(Config.SCHEDULER_CLEANUP_HOURS).hours
+        )
+        self._add_job(
+            'reconstruir_feed',
+            self.job_reconstruir_feed,
+            self.scheduler.every(Config.SCHEDULER_FEED_MINUTES).minutes
+        )
+        self._add_job(
+            'limpar_feed',
+            self.job_limpar_feed,
+            self.scheduler.every(Config.SCHEDULER_CLEANUP_HOURS).hours
+        )
+        self._add_job(
+            'verificar_fotos_feed',
+            self.job_verificar_fotos_feed,
+            self.scheduler.every(Config.SCHEDULER_PHOTO_CHECK_HOURS).hours
+        )
+
+    # ------------------------------------------------------------------
+    # Tarefas
+    # ------------------------------------------------------------------
+
+    def job_sincronizar_formularios(self) -> Dict:
+        """Sincroniza só as respostas novas desde a última sincronização bem-sucedida"""
+        if not self.orchestrator.google_forms:
+            raise ValueError("Google Forms não inicializado. Configure as credenciais primeiro.")
+
+        started_at = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        last_sync = self.state.get('last_forms_sync')
+        if not last_sync:
+            # Primeira execução: começa de agora em vez de reprocessar todo o histórico
+            self.state['last_forms_sync'] = started_at
+            self.state['forms_sync_done'] = {}
+            self._save_state()
+            print(f"📌 Sincronização de formulários iniciada a partir de {started_at}")
+            return {'initialized_at': started_at}
+
+        # Respostas já processadas com sucesso depois da marca d'água (ficaram atrás de uma falha)
+        done = self.state.get('forms_sync_done') or {}
+        report = self.orchestrator.sync_all_forms(last_sync=last_sync, skip_response_ids=set(done))
+        if not report['errors']:
+            watermark, done = next_watermark(started_at, last_sync, done, report['results'])
+            self.state['last_forms_sync'] = watermark
+            self.state['forms_sync_done'] = done
+        else:
+            # Algum formulário não foi buscado: a marca d'água fica onde está, mas as
+            # respostas já processadas não podem rodar de novo (WhatsApp, Drive, ClickUp)
+            done = dict(done)
+            for result in report['results']:
+                if result.get('success') and result.get('response_id') and result.get('submission_time'):
+                    done[result['response_id']] = result['submission_time']
+            self.state['forms_sync_done'] = done
+        self._save_state()
+
+        return {
+            'forms_processed': report['forms_processed'],
+            'total_responses': report['total_responses'],
+            'failed': report['failed'],
+            'skipped': report['skipped'],
+            'errors': len(report['errors']),
+            'watermark': self.state.get('last_forms_sync'),
+            'elapsed_seconds': report['elapsed_seconds']
+        }
+
+    def job_renovar_watches(self) -> Dict:
+        """
+        Registra e renova os watches do Forms (único lugar que faz isso) e tenta de
+        novo os formulários com respostas que falharam na ingestão
+        """
+        forms_watch = self.orchestrator.forms_watch
+        if not forms_watch:
+            raise ValueError("Google Forms não inicializado. Configure as credenciais primeiro.")
+        summary = forms_watch.ensure_watches(Config.get_form_ids())
+        summary['retried'] = [
+            self.orchestrator.ingest_form_delta(form_id) for form_id in forms_watch.forms_to_retry()
+        ]
+        return summary
+
+    def job_processar_fila(self) -> Dict:
+        """Envia mensagens pendentes da fila do Wasseller"""
+        if not self.orchestrator.wasseller_queue:
+            return {'skipped': 'Queue manager não disponível'}
+        return self.orchestrator.wasseller_queue.process_queue(max_messages=Config.SCHEDULER_QUEUE_BATCH)
+
+    def job_reprocessar_etapas_adiadas(self) -> Dict:
+        """Reexecuta etapas adiadas (ex: tarefa do ClickUp) cujo serviço voltou"""
+        report = self.orchestrator.replay_deferred_steps(max_items=Config.SCHEDULER_QUEUE_BATCH)
+        if self.orchestrator.deferred_steps:
+            self.orchestrator.deferred_steps.clear_done(days_old=Config.SCHEDULER_CLEANUP_DAYS)
+        return report
+
+    def job_limpar_mensagens_enviadas(self) -> Dict:
+        """Remove da fila as mensagens já enviadas há mais de N dias"""
+        if not self.orchestrator.wasseller_queue:
+            return {'skipped': 'Queue manager não disponível'}
+        self.orchestrator.wasseller_queue.queue.clear_sent_messages(days_old=Config.SCHEDULER_CLEANUP_DAYS)
+        return self.orchestrator.wasseller_queue.queue.get_queue_stats()
+
+    def job_limpar_arquivo_pdfs(self) -> Dict:
+        """Aplica a política de idade/tamanho da pasta local de PDFs"""
+        return self.orchestrator.pdf_archive.enforce_policy()
+
+    def job_limpar_fila_drive(self) -> Dict:
+        """Remove da fila do Drive os uploads concluídos há mais de N dias"""
+        if not self.orchestrator.drive_uploads:
+            return {'skipped': 'Fila do Drive não disponível'}
+        removed = self.orchestrator.drive_uploads.clear_done(days_old=Config.SCHEDULER_CLEANUP_DAYS)
+        return {'removed': removed, **self.orchestrator.drive_uploads.get_stats()}
+
+    def job_reconstruir_feed(self) -> Dict:
+        """Reconstrói o feed XML do Chaves na Mão"""
+        return self.orchestrator.rebuild_chaves_na_mao_feed()
+
+    def job_limpar_feed(self) -> Dict:
+        """Expira, remove testes e aplica o limite de imóveis do feed"""
+        return self.orchestrator.enforce_feed_retention()
+
+    def job_verificar_fotos_feed(self) -> Dict:
+        """Verifica as fotos do feed com verificação vencida"""
+        return self.orchestrator.check_feed_photos()
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def get_status(self) -> Dict:
+        """Métricas de todas as tarefas"""
+        return {
+            'updated_at': datetime.now().isoformat(),
+            'jobs': {name: dict(job.metrics) for name, job in self.jobs.items()}
+        }
+
+    def _save_status(self):
+        try:
+            with open(self.status_file, 'w', encoding='utf-8') as f:
+                json.dump(self.get_status(), f, indent=2, ensure_ascii=False, default=str)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao salvar status do agendador: {e}")
+
+    def run_once(self) -> bool:
+        """Executa cada tarefa uma vez, em sequência e sem jitter"""
+        results = [job.run(apply_jitter=False) for job in self.jobs.values()]
+        self._save_status()
+        return all(results)
+
+    def run_forever(self, tick_seconds: int = 1):
+        """Loop principal: dispara as tarefas no horário e grava as métricas"""
+        print("="*70)
+        print("⏰ AGENDADOR - SISTEMA DE INTEGRAÇÃO")
+        print("="*70)
+        for name, job in self.jobs.items():
+            print(f"   - {name}")
+        print()
+
+        # Primeira rodada logo na inicialização
+        for job in self.jobs.values():
+            job.trigger()
+
+        last_status = 0.0
+        while True:
+            self.scheduler.run_pending()
+            if time.monotonic() - last_status >= 30:
+                self._save_status()
+                last_status = time.monotonic()
+            time.sleep(tick_seconds)
+
+
+if __name__ == '__main__':
+    agendador = Agendador()
+    if '--once' in sys.argv[1:]:
+        sys.exit(0 if agendador.run_once() else 1)
+    try:
+        agendador.run_forever()
+    except KeyboardInterrupt:
+        agendador._save_status()
+        print("\n👋 Agendador finalizado")
@@ -9,7 +9,6 @@ from setup_google_auth import load_google_credentials
 from datetime import datetime
 import json
 import os
-import threading
 
 app = Flask(__name__)
 CORS(app)
@@ -22,6 +21,9 @@ google_creds = load_google_credentials()
 if google_creds:
     orchestrator.set_google_credentials(google_creds)
 
+# Modo watch: o servidor só recebe as notificações; registrar e renovar os
+# watches é tarefa do agendador (renovar_watches), num único processo
+
 
 @app.route('/')
 def index():
@@ -34,6 +36,8 @@ def index():
             'sync_forms': '/api/sync-forms',
             'sync_all_forms': '/api/sync-all-forms',
             'webhook_forms': '/api/webhook/google-forms',
+            'webhook_forms_watch': '/api/webhook/forms-watch',
+            'drive_uploads': '/api/drive-uploads/<response_id>',
             'import_xml': '/api/chaves-na-mao/import-xml',
             'list_forms': '/api/forms',
             'health': '/api/health'
@@ -44,8 +48,12 @@ def index():
 @app.route('/api/health', methods=['GET'])
 def health():
     """Endpoint de health check"""
+    from integrations.circuit_breaker import get_breakers_status
+    from integrations.http_client import get_http_stats
+    breakers = get_breakers_status()
     return jsonify({
-        'status': 'healthy',
+        # Degradado: alguma integração com circuito aberto (trabalho indo para as filas)
+        'status': 'degraded' if any(b['state'] == 'open' for b in breakers.values()) else 'healthy',
         'integrations': {
             'chatgpt': orchestrator.chatgpt is not None,
             'clickup': orchestrator.clickup is not None,
@@ -54,7 +62,11 @@ def health():
             'google_forms': orchestrator.google_forms is not None,
             'google_drive': orchestrator.google_drive is not None
         },
-        'chaves_na_mao_feed_url': '/api/chaves-na-mao/feed.xml'
+        'chaves_na_mao_feed_url': '/api/chaves-na-mao/feed.xml',
+        'http_clients': get_http_stats(),
+        'circuit_breakers': breakers,
+        'deferred_steps': orchestrator.deferred_steps.get_stats() if orchestrator.deferred_steps else None,
+        'feed_properties': orchestrator.property_store.get_stats() if orchestrator.property_store else None
     })
 
 
@@ -159,13 +171,8 @@ def webhook_google_forms():
         form_title = form_response.get('form_title', 'Formulário')
         
         # Responde IMEDIATAMENTE (evita timeout do Railway - máximo 30s)
-        # O processamento acontece em background
-        thread = threading.Thread(
-            target=process_form_background,
-            args=(form_response,),
-            daemon=True  # Thread morre quando app morre
-        )
-        thread.start()
+        # O processamento acontece em background no pool compartilhado
+        orchestrator.executor.submit(process_form_background, form_response)
         
         # Responde imediatamente antes de processar
         return jsonify({
@@ -190,6 +197,57 @@ def webhook_google_forms():
         }), 200
 
 
+@app.route('/api/webhook/forms-watch', methods=['POST'])
+def webhook_forms_watch():
+    """
+    Recebe notificações push dos watches do Google Forms (assinatura Pub/Sub)
+    
+    Query:
+        token: deve ser igual a GOOGLE_FORMS_WATCH_TOKEN (se configurado)
+    
+    Body: envelope push do Pub/Sub com attributes formId, watchId e eventType
+    """
+    if Config.GOOGLE_FORMS_WATCH_TOKEN and request.args.get('token') != Config.GOOGLE_FORMS_WATCH_TOKEN:
+        return jsonify({'success': False, 'error': 'Token inválido'}), 403
+    
+    try:
+        result = orchestrator.handle_forms_notification(request.json or {})
+        return jsonify({'success': True, **result}), 200
+    except ValueError as e:
+        # 4xx faz o Pub/Sub descartar após as tentativas; não adianta reenviar payload inválido
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        # 5xx faz o Pub/Sub reenviar a notificação
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/forms-watch/status', methods=['GET'])
+def forms_watch_status():
+    """Lista watches registrados e a marca d'água de cada formulário"""
+    if not orchestrator.forms_watch:
+        return jsonify({'error': 'Google Forms não inicializado'}), 503
+    return jsonify(orchestrator.forms_watch.get_status()), 200
+
+
+@app.route('/api/drive-uploads', methods=['GET'])
+def drive_uploads_stats():
+    """Estatísticas da fila de uploads do Drive"""
+    if not orchestrator.drive_uploads:
+        return jsonify({'error': 'Fila de uploads do Drive não inicializada'}), 503
+    return jsonify(orchestrator.drive_uploads.get_stats()), 200
+
+
+@app.route('/api/drive-uploads/<response_id>', methods=['GET'])
+def drive_upload_status(response_id):
+    """Status do upload para o Drive de uma resposta"""
+    if not orchestrator.drive_uploads:
+        return jsonify({'error': 'Fila de uploads do Drive não inicializada'}), 503
+    status = orchestrator.drive_uploads.get_status(response_id)
+    if not status:
+        return jsonify({'error': 'Nenhum upload encontrado para esta resposta'}), 404
+    return jsonify(status), 200
+
+
 @app.route('/api/batch-process', methods=['POST'])
 def batch_process():
     """
@@ -217,7 +275,7 @@ def batch_process():
 @app.route('/api/sync-all-forms', methods=['POST'])
 def sync_all_forms():
     """
-    Sincroniza todos os formulários configurados
+    Sincroniza todos os formulários configurados em paralelo
     
     Body (opcional):
         {
@@ -228,36 +286,7 @@ def sync_all_forms():
         data = request.json or {}
         last_sync = data.get('last_sync')
         
-        form_ids = Config.get_form_ids()
-        forms_config = Config.get_forms_config()
-        
-        results = {
-            'timestamp': datetime.now().isoformat(),
-            'total_forms': len(form_ids),
-            'forms_processed': 0,
-            'total_responses': 0,
-            'form_results': [],
-            'errors': []
-        }
-        
-        for form_id in form_ids:
-            form_info = Config.get_form_by_id(form_id)
-            try:
-                result = orchestrator.sync_google_forms(form_id, last_sync)
-                results['form_results'].append({
-                    'form_id': form_id,
-                    'form_name': form_info['name'] if form_info else 'Unknown',
-                    'responses_processed': result.get('responses_processed', 0),
-                    'success': True
-                })
-                results['total_responses'] += result.get('responses_processed', 0)
-                results['forms_processed'] += 1
-            except Exception as e:
-                results['errors'].append({
-                    'form_id': form_id,
-                    'form_name': form_info['name'] if form_info else 'Unknown',
-                    'error': str(e)
-                })
+        results = orchestrator.sync_all_forms(last_sync)
         
         return jsonify(results), 200
         
@@ -287,8 +316,16 @@ def import_xml():
     Body:
         {
             "xml_content": "<?xml version=\"1.0\"...",
-            "file_path": "optional_path_to_xml_file"
+            "file_path": "optional_path_to_xml_file",
+            "summary_only": false,
+            "resume": true,
+            "only_changed": true
         }
+    
+    Com file_path, a importação é feita em paralelo e com checkpoint (uma
+    importação interrompida continua de onde parou). summary_only=true
+    devolve só os totais e os primeiros erros; only_changed=false reenvia
+    também os imóveis que não mudaram desde a última importação.
     """
     try:
         data = request.json
@@ -297,13 +334,15 @@ def import_xml():
         
         if file_path:
             # Importa de arquivo
-            results = orchestrator.chaves_na_mao.import_properties_from_xml_file(file_path)
+            report = orchestrator.chaves_na_mao.bulk_import_properties_from_xml_file(
+                file_path,
+                resume=data.get('resume', True),
+                summary_only=data.get('summary_only', False),
+                only_changed=data.get('only_changed')
+            )
             return jsonify({
                 'success': True,
-                'total': len(results),
-                'successful': sum(1 for r in results if r.get('success')),
-                'failed': sum(1 for r in results if not r.get('success')),
-                'results': results
+                **report
             }), 200
         elif xml_content:
             # Importa de string XML
@@ -357,28 +396,158 @@ def generate_xml():
         }), 500
 
 
+def _parse_since(value: str) -> float:
+    """Converte ?since= (epoch ou ISO 8601) em timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _read_feed_file(path: str, headers: dict) -> bytes:
+    """
+    Lê um feed já gerado; se o cliente aceita gzip, serve a cópia .gz gravada
+    junto com o XML (sem comprimir a cada requisição)
+    """
+    headers['Vary'] = 'Accept-Encoding'
+    gz_path = f"{path}.gz"
+    if 'gzip' in request.headers.get('Accept-Encoding', '').lower() and os.path.exists(gz_path):
+        headers['Content-Encoding'] = 'gzip'
+        path = gz_path
+    # Os arquivos são trocados com os.replace: a leitura nunca pega um feed pela metade
+    with open(path, 'rb') as f:
+        return f.read()
+
+
 @app.route('/api/chaves-na-mao/feed.xml', methods=['GET'])
 def chaves_na_mao_feed():
     """
     Endpoint que serve o XML feed do Chaves na Mão
-    Gera XML dinamicamente a partir dos dados processados
+    
+    Query:
+        since: Só imóveis novos/alterados depois deste instante (epoch ou ISO 8601)
+        cursor: Só imóveis novos/alterados depois deste cursor (cabeçalho X-Feed-Cursor
+                de uma resposta anterior)
+    
+    Sem parâmetros, serve o feed completo. Toda resposta traz em X-Feed-Cursor o
+    cursor para pedir só as mudanças seguintes. O incremental traz também, em
+    <imoveis_removidos>, os imóveis que saíram do feed; se o cursor/since for
+    anterior a remoções já apagadas de vez, vem o feed completo com X-Feed-Reset: 1.
     """
     try:
         from integrations.chaves_na_mao_xml_generator import ChavesNaMaoXMLGenerator
         import os
         
+        since = request.args.get('since')
+        cursor = request.args.get('cursor')
+        try:
+            since = _parse_since(since) if since else None
+            cursor = int(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'since deve ser epoch ou ISO 8601 e cursor deve ser o valor de X-Feed-Cursor'}), 400
+        
+        store = orchestrator.property_store
+        headers = {'Content-Type': 'application/xml; charset=utf-8'}
         generator = ChavesNaMaoXMLGenerator()
         
+        if (since is not None or cursor is not None) and store.needs_full_resync(since=since, after_version=cursor):
+            # Remoções depois desse ponto já foram apagadas de vez: o consumidor refaz a base
+            headers['X-Feed-Reset'] = '1'
+        elif since is not None or cursor is not None:
+            # Feed incremental: só o que mudou (consulta pelos índices de updated_at/versão).
+            # O cursor é lido antes da consulta: no pior caso um imóvel vem de novo na próxima
+            headers['X-Feed-Cursor'] = str(store.current_version())
+            changed = store.get_changed(since=since, after_version=cursor)
+            removed = store.get_removed(since=since, after_version=cursor)
+            headers['X-Feed-Count'] = str(len(changed))
+            headers['X-Feed-Removed'] = str(len(removed))
+            return generator.generate_feed_xml(changed, removed=removed), 200, headers
+        
         # Tenta carregar XML salvo, ou gera vazio
-        xml_file = 'chaves_na_mao_feed.xml'
+        xml_file = Config.CHAVES_NA_MAO_FEED_FILE
         if os.path.exists(xml_file):
-            with open(xml_file, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
+            xml_content = _read_feed_file(xml_file, headers)
+            # Cursor do arquivo: última versão gravada antes dele ser gerado
+            headers['X-Feed-Cursor'] = str(store.version_at(os.path.getmtime(xml_file)))
         else:
             # Gera XML vazio
             xml_content = generator.generate_feed_xml([])
+            headers['X-Feed-Cursor'] = '0'
         
-        return xml_content, 200, {'Content-Type': 'application/xml; charset=utf-8'}
+        return xml_content, 200, headers
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/chaves-na-mao/properties/<key>', methods=['DELETE'])
+def remove_feed_property(key):
+    """Remove um imóvel do feed (soft delete: o registro fica até o fim da retenção)"""
+    try:
+        if not orchestrator.remove_feed_property(key):
+            return jsonify({'success': False, 'error': f"Imóvel '{key}' não está no feed"}), 404
+        return jsonify({'success': True, 'removed': key}), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/chaves-na-mao/photos', methods=['GET'])
+def feed_photo_checks():
+    """
+    Situação das fotos do feed: fotos quebradas por imóvel (segundo o cache)
+    
+    Query:
+        check: 'true' para verificar agora as fotos com verificação vencida
+    """
+    try:
+        checker = orchestrator.photo_checker
+        if not checker:
+            return jsonify({'enabled': False}), 200
+        checked = None
+        if request.args.get('check', '').lower() == 'true':
+            checked = orchestrator.check_feed_photos()
+        builder = orchestrator.feed_builder
+        return jsonify({
+            'enabled': True,
+            'dead_photo_action': builder.dead_photo_action,
+            'dead_photos': builder.photo_report(),
+            'checked': checked,
+            'stats': checker.get_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/chaves-na-mao/feed/<name>.xml', methods=['GET'])
+def chaves_na_mao_sub_feed(name):
+    """
+    Sub-feed pré-gerado do Chaves na Mão
+    
+    name: categoria do formulário (ex: signature-alto-padrao), transação (venda,
+    locacao) ou categoria-transação (ex: smart-key-locacao)
+    """
+    try:
+        builder = orchestrator.feed_builder
+        path = builder.sub_feed_path(name)
+        if not path or not os.path.exists(path):
+            if path and name in builder.all_sub_feed_names():
+                # Sub-feed conhecido ainda não gerado: nenhum imóvel na categoria
+                from integrations.chaves_na_mao_xml_generator import ChavesNaMaoXMLGenerator
+                return ChavesNaMaoXMLGenerator().generate_feed_xml([]), 200, {'Content-Type': 'application/xml; charset=utf-8'}
+            return jsonify({
+                'error': f"Sub-feed '{name}' não encontrado",
+                'available': sorted(builder.all_sub_feed_names())
+            }), 404
+        
+        headers = {'Content-Type': 'application/xml; charset=utf-8'}
+        return _read_feed_file(path, headers), 200, headers
         
     except Exception as e:
         return jsonify({
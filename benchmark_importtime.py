@@ -0,0 +1,108 @@
+"""
+Benchmark de tempo de import (python -X importtime) com orçamento
+Falha (código de saída 1) se o import a frio de app ou orchestrator passar do orçamento,
+para pegar regressões como um import pesado voltando para o topo de um módulo.
+
+Uso:
+    python benchmark_importtime.py [repeticoes]
+
+Orçamentos (ms) configuráveis por variável de ambiente:
+    IMPORT_BUDGET_ORCHESTRATOR_MS (padrão 300)
+    IMPORT_BUDGET_APP_MS          (padrão 1200)
+"""
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Módulo -> orçamento em ms para o import a frio
+BUDGETS_MS = {
+    'orchestrator': float(os.getenv('IMPORT_BUDGET_ORCHESTRATOR_MS', '300')),
+    'app': float(os.getenv('IMPORT_BUDGET_APP_MS', '1200')),
+}
+
+# Pacotes que não devem ser carregados só por importar o módulo
+FORBIDDEN_AT_IMPORT = ('googleapiclient.discovery', 'openai', 'reportlab', 'google_auth_oauthlib')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Importa o módulo em um processo novo com -X importtime
+
+    Returns:
+        Lista de (módulo, self_us, cumulative_us) na ordem do importtime
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    if completed.returncode != 0:
+        erro = completed.stderr.strip().splitlines()
+        raise RuntimeError(erro[-1] if erro else f"falha ao importar {module}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return entries
+
+
+def measure(module: str, repetitions: int = 3) -> Dict:
+    """Mede o import a frio do módulo (melhor de N execuções)"""
+    best = None
+    for _ in range(repetitions):
+        entries = import_profile(module)
+        total = next((cum for name, _, cum in entries if name == module), None)
+        if total is None:
+            raise RuntimeError(f"{module} não apareceu na saída do importtime")
+        if best is None or total < best[0]:
+            best = (total, entries)
+
+    total_us, entries = best
+    heaviest = sorted(entries, key=lambda e: e[2], reverse=True)
+    top_level = [e for e in heaviest if '.' not in e[0] and e[0] != module][:10]
+    loaded = {name for name, _, _ in entries}
+
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'budget_ms': BUDGETS_MS[module],
+        'heaviest': [(name, round(cum / 1000, 1)) for name, _, cum in top_level],
+        'forbidden_loaded': [name for name in FORBIDDEN_AT_IMPORT if name in loaded]
+    }
+
+
+if __name__ == '__main__':
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print("="*70)
+    print(f"⏱️  BENCHMARK DE IMPORT (-X importtime, melhor de {repeticoes})")
+    print("="*70)
+
+    ok = True
+    for modulo in BUDGETS_MS:
+        try:
+            r = measure(modulo, repeticoes)
+        except Exception as e:
+            print(f"❌ {modulo:<14} erro: {e}")
+            ok = False
+            continue
+
+        dentro = r['total_ms'] <= r['budget_ms'] and not r['forbidden_loaded']
+        ok = ok and dentro
+        print(f"{'✅' if dentro else '❌'} {modulo:<14} {r['total_ms']:>8} ms (orçamento {r['budget_ms']} ms)")
+        for nome, ms in r['heaviest']:
+            print(f"      {nome:<30} {ms:>8} ms")
+        if r['forbidden_loaded']:
+            print(f"   ⚠️  Carregados no import (deveriam ser sob demanda): {', '.join(r['forbidden_loaded'])}")
+
+    sys.exit(0 if ok else 1)
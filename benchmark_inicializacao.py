@@ -0,0 +1,91 @@
+"""
+Benchmark do tempo de inicialização do app.py e dos scripts de linha de comando
+Cada medição roda em um processo Python novo (início a frio)
+
+Uso:
+    python benchmark_inicializacao.py [repeticoes]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Nome -> código executado no processo medido
+ENTRY_POINTS = {
+    'app (import)': "import app",
+    'orchestrator (construção)': (
+        "from orchestrator import IntegrationOrchestrator; IntegrationOrchestrator()"
+    ),
+    'sincronizar_forms': (
+        "import sincronizar_forms; from orchestrator import IntegrationOrchestrator; "
+        "IntegrationOrchestrator()"
+    ),
+    'processar_fila_wasseller': (
+        "import processar_fila_wasseller; from orchestrator import IntegrationOrchestrator; "
+        "IntegrationOrchestrator().wasseller_queue"
+    ),
+    'run_automation': (
+        "import run_automation; from orchestrator import IntegrationOrchestrator; "
+        "IntegrationOrchestrator()"
+    ),
+    'agendador': "import agendador",
+}
+
+TIMER = (
+    "import time, sys; _t = time.perf_counter(); {code}; "
+    "sys.stdout.flush(); print('__ELAPSED__', time.perf_counter() - _t)"
+)
+
+
+def measure(code: str) -> float:
+    """Executa o código em um processo novo e retorna o tempo (segundos)"""
+    completed = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith('__ELAPSED__'):
+            return float(line.split()[1])
+    raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else 'sem saída')
+
+
+def run_benchmark(repetitions: int = 5) -> dict:
+    """Mede cada ponto de entrada N vezes"""
+    results = {}
+    for name, code in ENTRY_POINTS.items():
+        try:
+            timings = [measure(code) for _ in range(repetitions)]
+            results[name] = {
+                'min_ms': round(min(timings) * 1000, 1),
+                'median_ms': round(statistics.median(timings) * 1000, 1),
+                'max_ms': round(max(timings) * 1000, 1)
+            }
+        except Exception as e:
+            results[name] = {'error': str(e)}
+    return results
+
+
+if __name__ == '__main__':
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("="*70)
+    print(f"⏱️  BENCHMARK DE INICIALIZAÇÃO ({repeticoes} repetições, processo novo a cada vez)")
+    print("="*70)
+
+    resultados = run_benchmark(repeticoes)
+    for nome, r in resultados.items():
+        if 'error' in r:
+            print(f"❌ {nome:<28} erro: {r['error']}")
+        else:
+            print(f"✅ {nome:<28} min {r['min_ms']:>8} ms | mediana {r['median_ms']:>8} ms | máx {r['max_ms']:>8} ms")
+
+    with open('benchmark_inicializacao.json', 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print("\n📄 Resultados salvos em benchmark_inicializacao.json")
@@ -0,0 +1,117 @@
+"""
+Benchmark de geração de PDFs (imóvel e demanda)
+Mede PDFs/segundo com o gerador compartilhado e compara com o padrão antigo
+de criar um PDFGenerator novo por lead, e a renderização serial com o pool
+de processos usado em lotes e backfills.
+
+Uso:
+    python benchmark_pdf.py [quantidade] [processos]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from integrations.pdf_generator import PDFGenerator, get_pdf_generator
+from integrations.pdf_render_service import PDFRenderService, build_job
+
+
+SAMPLE_FORM = {
+    'response_id': 'BENCH_001',
+    'answers': {
+        'nome': 'Cliente Benchmark',
+        'telefone': '11999999999',
+        'email': 'cliente@example.com',
+        'tipo_imovel': 'Apartamento',
+        'localizacao': 'Vila Mariana, São Paulo - SP',
+        'valor': 'R$ 850.000',
+        'orcamento': 'R$ 900.000',
+        'quartos': '3',
+        'banheiro': '2',
+        'garagem': '2',
+        'area_total': '120',
+        'area_util': '98',
+        'observacoes': 'Próximo ao metrô, andar alto, sol da manhã.'
+    }
+}
+
+SAMPLE_ANALYSIS = {
+    'tipo_lead': 'proprietario',
+    'prioridade': 'alta',
+    'categoria': 'venda',
+    'resumo': 'Proprietário quer vender apartamento de 3 quartos com urgência.',
+    'acoes_sugeridas': ['Agendar visita', 'Solicitar documentação', 'Definir preço de anúncio'],
+    'informacoes_extraidas': {}
+}
+
+
+def run_layout(layout: str, count: int, generator_factory: Callable[[], PDFGenerator], output_dir: str) -> Dict:
+    """Gera N PDFs de um layout e retorna a vazão"""
+    start = time.perf_counter()
+    for i in range(count):
+        generator = generator_factory()
+        method = generator.generate_property_pdf if layout == 'imovel' else generator.generate_demand_pdf
+        method(
+            form_data=SAMPLE_FORM,
+            analysis=SAMPLE_ANALYSIS,
+            response_id=f"BENCH_{i:05d}",
+            output_path=os.path.join(output_dir, f"{layout}_{i:05d}.pdf")
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        'pdfs': count,
+        'seconds': round(elapsed, 3),
+        'pdfs_per_second': round(count / elapsed, 1) if elapsed else None
+    }
+
+
+def run_pool(layout: str, count: int, service: PDFRenderService) -> Dict:
+    """Gera N PDFs em memória no pool de processos e retorna a vazão"""
+    jobs = [build_job(SAMPLE_FORM, SAMPLE_ANALYSIS, f"BENCH_{i:05d}", layout) for i in range(count)]
+    start = time.perf_counter()
+    service.render_many(jobs)
+    elapsed = time.perf_counter() - start
+    return {
+        'pdfs': count,
+        'seconds': round(elapsed, 3),
+        'pdfs_per_second': round(count / elapsed, 1) if elapsed else None
+    }
+
+
+def run_benchmark(count: int = 200, workers: int = 0) -> Dict:
+    """Mede os dois layouts: gerador compartilhado, um gerador por PDF e pool de processos"""
+    results = {}
+    service = PDFRenderService(max_workers=workers or None)
+    try:
+        # Sobe os processos antes de medir (o custo de inicialização é pago uma vez por execução)
+        service.render_many([build_job(SAMPLE_FORM, SAMPLE_ANALYSIS, 'WARMUP')] * service.max_workers, chunksize=1)
+        with tempfile.TemporaryDirectory(prefix='benchmark_pdf_') as output_dir:
+            for layout in ('imovel', 'demanda'):
+                results[layout] = {
+                    'compartilhado': run_layout(layout, count, get_pdf_generator, output_dir),
+                    'novo_por_pdf': run_layout(layout, count, PDFGenerator, output_dir),
+                    f'pool_{service.max_workers}_processos': run_pool(layout, count, service)
+                }
+    finally:
+        service.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    processos = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    print("="*70)
+    print(f"📄 BENCHMARK DE GERAÇÃO DE PDF ({quantidade} por layout)")
+    print("="*70)
+
+    resultados = run_benchmark(quantidade, processos)
+    for layout, modos in resultados.items():
+        for modo, r in modos.items():
+            print(f"✅ {layout:<8} {modo:<20} {r['pdfs_per_second']:>8} PDFs/s ({r['seconds']}s)")
+
+    with open('benchmark_pdf.json', 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print("\n📄 Resultados salvos em benchmark_pdf.json")
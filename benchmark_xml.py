@@ -0,0 +1,155 @@
+"""
+Benchmark do parse/geração do XML do Chaves na Mão
+Mede o tempo por 10 mil imóveis do parse compilado (uma passada pelos filhos do
+<imovel>, despacho tag -> conversor) contra o padrão antigo de um find() por
+campo, a leitura em streaming de um arquivo inteiro e a geração do XML.
+
+Uso:
+    python benchmark_xml.py [quantidade]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List
+
+from integrations.chaves_na_mao import ChavesNaMaoIntegration
+from integrations.chaves_na_mao_fields import FEED_FIELDS, LIST_KINDS, PARSERS, parse_imovel_element
+from integrations.chaves_na_mao_xml_generator import ChavesNaMaoXMLGenerator
+
+
+SAMPLE_PROPERTY = {
+    'codigo': 'BENCH_00000',
+    'titulo': 'Apartamento 3 quartos Vila Mariana',
+    'tipo': 'Apartamento',
+    'valor': '850000.00',
+    'valor_condominio': '1200',
+    'valor_iptu': '350',
+    'area_total': '120',
+    'area_util': '98',
+    'quartos': '3',
+    'suites': '1',
+    'garagem': '2',
+    'banheiro': '2',
+    'aceita_pet': True,
+    'estado': 'SP',
+    'cidade': 'São Paulo',
+    'bairro': 'Vila Mariana',
+    'endereco': 'Rua Domingos de Morais',
+    'numero': '1000',
+    'descritivo': 'Próximo ao metrô, andar alto, sol da manhã.',
+    'fotos': [f"https://example.com/fotos/{i}.jpg" for i in range(8)],
+    'area_comum': ['Piscina', 'Academia', 'Salão de festas'],
+    'area_privativa': ['Varanda gourmet'],
+}
+
+# Geração usa minidom (lenta): mede numa amostra menor e projeta para 10 mil
+GENERATION_SAMPLE = 1000
+
+
+def parse_by_find(imovel_elem: ET.Element) -> Dict:
+    """Padrão antigo: um find() por campo da especificação"""
+    property_data = {}
+    for field in FEED_FIELDS:
+        elem = imovel_elem.find(field.tag)
+        if elem is not None:
+            PARSERS[field.kind](elem, property_data, field.key)
+        elif field.kind in LIST_KINDS:
+            property_data[field.key] = []
+    return property_data
+
+
+def build_elements(count: int) -> List[ET.Element]:
+    """N elementos <imovel> (cópias do imóvel de exemplo com referências distintas)"""
+    xml = ChavesNaMaoXMLGenerator().generate_property_xml(SAMPLE_PROPERTY)
+    template = ET.fromstring(xml.encode('utf-8')).find('.//imovel')
+    elements = []
+    for i in range(count):
+        elem = ET.fromstring(ET.tostring(template))
+        elem.find('referencia').text = f"BENCH_{i:05d}"
+        elements.append(elem)
+    return elements
+
+
+def timed(func: Callable[[], int]) -> Dict:
+    """Executa func (que retorna quantos imóveis processou) e calcula a vazão"""
+    start = time.perf_counter()
+    processed = func()
+    elapsed = time.perf_counter() - start
+    return {
+        'imoveis': processed,
+        'seconds': round(elapsed, 3),
+        'seconds_per_10k': round(elapsed * 10000 / processed, 3) if processed else None,
+        'imoveis_per_second': round(processed / elapsed, 1) if elapsed else None
+    }
+
+
+def run_benchmark(count: int = 10000) -> Dict:
+    """Parse por find() x parse compilado, streaming de arquivo e geração"""
+    elements = build_elements(count)
+
+    def parse_all(parser: Callable[[ET.Element], Dict]) -> Callable[[], int]:
+        def run():
+            for elem in elements:
+                parser(elem)
+            return len(elements)
+        return run
+
+    # Os dois parsers precisam produzir o mesmo dicionário
+    assert parse_by_find(elements[0]) == parse_imovel_element(elements[0])
+
+    results = {
+        'parse_find_por_campo': timed(parse_all(parse_by_find)),
+        'parse_compilado': timed(parse_all(parse_imovel_element)),
+    }
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_xml_') as tmp_dir:
+        xml_path = os.path.join(tmp_dir, 'feed.xml')
+        root = ET.Element('Document')
+        imoveis = ET.SubElement(root, 'imoveis')
+        imoveis.extend(elements)
+        ET.ElementTree(root).write(xml_path, encoding='utf-8', xml_declaration=True)
+        results['arquivo_mb'] = round(os.path.getsize(xml_path) / 1024 / 1024, 1)
+
+        def stream():
+            processed = 0
+            for imovel_elem in ChavesNaMaoIntegration._iter_imovel_elements(xml_path):
+                parse_imovel_element(imovel_elem)
+                processed += 1
+            return processed
+
+        results['streaming_arquivo'] = timed(stream)
+
+    generator = ChavesNaMaoXMLGenerator()
+    sample = min(count, GENERATION_SAMPLE)
+
+    def generate():
+        for i in range(sample):
+            generator.generate_property_xml({**SAMPLE_PROPERTY, 'codigo': f"BENCH_{i:05d}"})
+        return sample
+
+    results['geracao'] = timed(generate)
+    return results
+
+
+if __name__ == '__main__':
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    print("="*70)
+    print(f"🏠 BENCHMARK DO XML DO CHAVES NA MÃO ({quantidade} imóveis)")
+    print("="*70)
+
+    resultados = run_benchmark(quantidade)
+    for modo, r in resultados.items():
+        if isinstance(r, dict):
+            print(f"✅ {modo:<22} {r['seconds_per_10k']:>8}s por 10 mil ({r['imoveis_per_second']} imóveis/s)")
+    antigo = resultados['parse_find_por_campo']['seconds']
+    novo = resultados['parse_compilado']['seconds']
+    if novo:
+        print(f"\n⚡ Parse compilado: {antigo / novo:.1f}x mais rápido que um find() por campo")
+
+    with open('benchmark_xml.json', 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print("\n📄 Resultados salvos em benchmark_xml.json")
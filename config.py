@@ -3,6 +3,7 @@ Configurações do sistema de integração para imobiliária
 """
 import os
 import json
+from typing import List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,21 +22,81 @@ class Config:
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
     GOOGLE_REDIRECT_URI = os.getenv('GOOGLE_REDIRECT_URI', 'http://localhost:8080/callback')
     GOOGLE_DRIVE_FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
+    # Uploads a partir deste tamanho são resumíveis, enviados em partes de GOOGLE_DRIVE_CHUNK_MB
+    GOOGLE_DRIVE_RESUMABLE_MIN_MB = float(os.getenv('GOOGLE_DRIVE_RESUMABLE_MIN_MB', 5))
+    GOOGLE_DRIVE_CHUNK_MB = float(os.getenv('GOOGLE_DRIVE_CHUNK_MB', 5))
+    # Intervalo mínimo entre leituras de mudanças do Drive para o índice local (drive_index.db)
+    GOOGLE_DRIVE_INDEX_SYNC_SECONDS = int(os.getenv('GOOGLE_DRIVE_INDEX_SYNC_SECONDS', 60))
+    # Uploads para o Drive em fila própria (fora do caminho crítico do processamento)
+    DRIVE_UPLOAD_ASYNC = os.getenv('DRIVE_UPLOAD_ASYNC', 'True').lower() == 'true'
+    DRIVE_UPLOAD_WORKERS = int(os.getenv('DRIVE_UPLOAD_WORKERS', 2))
+    DRIVE_UPLOAD_MAX_ATTEMPTS = int(os.getenv('DRIVE_UPLOAD_MAX_ATTEMPTS', 6))
+    DRIVE_UPLOAD_BACKOFF_SECONDS = float(os.getenv('DRIVE_UPLOAD_BACKOFF_SECONDS', 5))
+    # Validade do lease de um upload em andamento (vencido = outro processo pode reenviar)
+    DRIVE_UPLOAD_LEASE_SECONDS = float(os.getenv('DRIVE_UPLOAD_LEASE_SECONDS', 300))
     GOOGLE_FORMS_FORM_ID = os.getenv('GOOGLE_FORMS_FORM_ID')
+    # Máximo de chamadas simultâneas à API do Forms durante a sincronização
+    GOOGLE_FORMS_MAX_CONCURRENT = int(os.getenv('GOOGLE_FORMS_MAX_CONCURRENT', 3))
+    # Ingestão de respostas: 'webhook' (Apps Script), 'polling' ou 'watch' (Forms API + Pub/Sub)
+    FORMS_INGESTION_MODE = os.getenv('FORMS_INGESTION_MODE', 'webhook')
+    # Tempo sem tentar de novo o forms().get depois de uma falha (ex: 403 sem permissão)
+    FORM_SCHEMA_FAILURE_TTL_SECONDS = float(os.getenv('FORM_SCHEMA_FAILURE_TTL_SECONDS', 300))
+    GOOGLE_FORMS_WATCH_TOPIC = os.getenv('GOOGLE_FORMS_WATCH_TOPIC')  # projects/<projeto>/topics/<tópico>
+    GOOGLE_FORMS_WATCH_TOKEN = os.getenv('GOOGLE_FORMS_WATCH_TOKEN')  # ?token= da assinatura push
+    GOOGLE_FORMS_WATCH_RENEW_HOURS = int(os.getenv('GOOGLE_FORMS_WATCH_RENEW_HOURS', 24))
     
     # OpenAI/ChatGPT
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     CHATGPT_MODEL = os.getenv('CHATGPT_MODEL', 'gpt-4o-mini')  # Modelo atualizado
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))  # segundos por chamada
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))  # retries internos do cliente
+    
+    # Cliente HTTP das APIs REST (ClickUp, Chaves na Mão)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))  # segundos
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))  # segundos
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+    HTTP_BACKOFF_SECONDS = float(os.getenv('HTTP_BACKOFF_SECONDS', 0.5))
+    HTTP_RATE_LIMIT_MARGIN = int(os.getenv('HTTP_RATE_LIMIT_MARGIN', 2))  # pausa ao restar N da cota
+    
+    # Circuit breakers das integrações (OpenAI, ClickUp, Drive, Wasseller)
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))  # falhas seguidas para abrir
+    CIRCUIT_RECOVERY_SECONDS = float(os.getenv('CIRCUIT_RECOVERY_SECONDS', 60))  # tempo aberto antes de testar
+    CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv('CIRCUIT_HALF_OPEN_MAX_CALLS', 1))  # chamadas de teste
+    DEFERRED_STEP_MAX_ATTEMPTS = int(os.getenv('DEFERRED_STEP_MAX_ATTEMPTS', 10))
+    DEFERRED_STEP_BACKOFF_SECONDS = float(os.getenv('DEFERRED_STEP_BACKOFF_SECONDS', 60))
+    # Validade do lease de uma etapa em execução (vencido = outro processo pode reexecutar)
+    DEFERRED_STEP_LEASE_SECONDS = float(os.getenv('DEFERRED_STEP_LEASE_SECONDS', 300))
     
     # ClickUp
     CLICKUP_API_KEY = os.getenv('CLICKUP_API_KEY')
     CLICKUP_TEAM_ID = os.getenv('CLICKUP_TEAM_ID')
     CLICKUP_SPACE_ID = os.getenv('CLICKUP_SPACE_ID')
     CLICKUP_LIST_ID = os.getenv('CLICKUP_LIST_ID')
+    CLICKUP_MAX_CONCURRENT = int(os.getenv('CLICKUP_MAX_CONCURRENT', 4))  # requisições simultâneas
+    CLICKUP_RATE_LIMIT_MARGIN = int(os.getenv('CLICKUP_RATE_LIMIT_MARGIN', 2))  # pausa ao restar N da cota
     
     # Chaves na Mão
     CHAVES_NA_MAO_API_KEY = os.getenv('CHAVES_NA_MAO_API_KEY')
     CHAVES_NA_MAO_API_URL = os.getenv('CHAVES_NA_MAO_API_URL', 'https://api.chavesnamao.com.br')
+    CHAVES_NA_MAO_IMPORT_WORKERS = int(os.getenv('CHAVES_NA_MAO_IMPORT_WORKERS', 4))  # envios simultâneos
+    CHAVES_NA_MAO_IMPORT_RETRIES = int(os.getenv('CHAVES_NA_MAO_IMPORT_RETRIES', 2))  # por imóvel
+    CHAVES_NA_MAO_IMPORT_CHECKPOINT_EVERY = int(os.getenv('CHAVES_NA_MAO_IMPORT_CHECKPOINT_EVERY', 50))
+    CHAVES_NA_MAO_IMPORT_ONLY_CHANGED = os.getenv('CHAVES_NA_MAO_IMPORT_ONLY_CHANGED', 'True').lower() == 'true'
+    CHAVES_NA_MAO_FEED_FILE = os.getenv('CHAVES_NA_MAO_FEED_FILE', 'chaves_na_mao_feed.xml')
+    CHAVES_NA_MAO_FEEDS_DIR = os.getenv('CHAVES_NA_MAO_FEEDS_DIR', 'feeds')  # sub-feeds por categoria
+    CHAVES_NA_MAO_FEED_COALESCE_SECONDS = float(os.getenv('CHAVES_NA_MAO_FEED_COALESCE_SECONDS', 2))  # junta leads simultâneos
+    CHAVES_NA_MAO_LISTING_TTL_DAYS = float(os.getenv('CHAVES_NA_MAO_LISTING_TTL_DAYS', 90))  # 0 = não expira
+    CHAVES_NA_MAO_FEED_MAX_LISTINGS = int(os.getenv('CHAVES_NA_MAO_FEED_MAX_LISTINGS', 5000))  # 0 = sem limite
+    CHAVES_NA_MAO_DELETED_RETENTION_DAYS = float(os.getenv('CHAVES_NA_MAO_DELETED_RETENTION_DAYS', 30))
+    CHAVES_NA_MAO_TEST_PREFIXES = os.getenv('CHAVES_NA_MAO_TEST_PREFIXES', 'TEST_,REAL_TEST_')
+    
+    # Verificação das fotos do feed (HEAD em paralelo, resultado em cache)
+    PHOTO_CHECK_ENABLED = os.getenv('PHOTO_CHECK_ENABLED', 'True').lower() == 'true'
+    PHOTO_CHECK_DEAD_ACTION = os.getenv('PHOTO_CHECK_DEAD_ACTION', 'exclude')  # exclude ou flag
+    PHOTO_CHECK_TTL_HOURS = float(os.getenv('PHOTO_CHECK_TTL_HOURS', 24))
+    PHOTO_CHECK_RETRY_HOURS = float(os.getenv('PHOTO_CHECK_RETRY_HOURS', 1))  # após timeout/5xx
+    PHOTO_CHECK_WORKERS = int(os.getenv('PHOTO_CHECK_WORKERS', 8))
+    PHOTO_CHECK_TIMEOUT = float(os.getenv('PHOTO_CHECK_TIMEOUT', 10))  # segundos
     
     # Wasseller (nova API - usa apenas token)
     WASSELLER_TOKEN = os.getenv('WASSELLER_TOKEN')
@@ -51,6 +112,38 @@ class Config:
     EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
     EMAIL_TO = os.getenv('EMAIL_TO')  # Lista separada por vírgula
     
+    # PDFs: gerados em memória e enviados direto ao Drive; cópia local em pdfs/ é opcional
+    # (sempre feita quando o Drive não está configurado, para o PDF não se perder)
+    PDF_ARCHIVE_ENABLED = os.getenv('PDF_ARCHIVE_ENABLED', 'False').lower() == 'true'
+    PDF_ARCHIVE_DIR = os.getenv('PDF_ARCHIVE_DIR', 'pdfs')
+    PDF_ARCHIVE_MAX_MB = float(os.getenv('PDF_ARCHIVE_MAX_MB', 500))  # 0 = sem limite
+    PDF_ARCHIVE_MAX_AGE_DAYS = float(os.getenv('PDF_ARCHIVE_MAX_AGE_DAYS', 30))  # 0 = sem limite
+    # Processos que renderizam PDFs em lotes/backfills (0 = número de CPUs)
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 0))
+    # Fotos no PDF do imóvel: miniaturas em cache endereçado pelo conteúdo (LRU)
+    PDF_PHOTOS_ENABLED = os.getenv('PDF_PHOTOS_ENABLED', 'True').lower() == 'true'
+    PDF_PHOTO_MAX = int(os.getenv('PDF_PHOTO_MAX', 9))  # fotos por PDF
+    PDF_PHOTO_THUMB_PX = int(os.getenv('PDF_PHOTO_THUMB_PX', 600))  # maior lado da miniatura
+    PDF_PHOTO_WORKERS = int(os.getenv('PDF_PHOTO_WORKERS', 6))  # downloads simultâneos
+    PDF_PHOTO_MAX_DOWNLOAD_MB = float(os.getenv('PDF_PHOTO_MAX_DOWNLOAD_MB', 15))
+    PDF_PHOTO_CACHE_DIR = os.getenv('PDF_PHOTO_CACHE_DIR', 'thumbnails')
+    PDF_PHOTO_CACHE_MAX_MB = float(os.getenv('PDF_PHOTO_CACHE_MAX_MB', 200))  # 0 = sem limite
+    PDF_PHOTO_URL_TTL_DAYS = float(os.getenv('PDF_PHOTO_URL_TTL_DAYS', 7))  # baixa de novo depois disso
+    
+    # Pool compartilhado de workers que processam as respostas
+    ORCHESTRATOR_MAX_WORKERS = int(os.getenv('ORCHESTRATOR_MAX_WORKERS', 4))
+    
+    # Agendador (agendador.py)
+    SCHEDULER_SYNC_MINUTES = int(os.getenv('SCHEDULER_SYNC_MINUTES', 15))
+    SCHEDULER_WATCH_RENEW_MINUTES = int(os.getenv('SCHEDULER_WATCH_RENEW_MINUTES', 60))
+    SCHEDULER_QUEUE_MINUTES = int(os.getenv('SCHEDULER_QUEUE_MINUTES', 5))
+    SCHEDULER_QUEUE_BATCH = int(os.getenv('SCHEDULER_QUEUE_BATCH', 50))
+    SCHEDULER_CLEANUP_HOURS = int(os.getenv('SCHEDULER_CLEANUP_HOURS', 24))
+    SCHEDULER_CLEANUP_DAYS = int(os.getenv('SCHEDULER_CLEANUP_DAYS', 7))
+    SCHEDULER_FEED_MINUTES = int(os.getenv('SCHEDULER_FEED_MINUTES', 60))
+    SCHEDULER_PHOTO_CHECK_HOURS = int(os.getenv('SCHEDULER_PHOTO_CHECK_HOURS', 6))
+    SCHEDULER_JITTER_SECONDS = int(os.getenv('SCHEDULER_JITTER_SECONDS', 30))
+    
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///imobiliaria.db')
     
@@ -82,6 +175,23 @@ class Config:
                 return form
         return None
     
+    @classmethod
+    def get_form_category(cls, form_id: Optional[str]) -> Optional[str]:
+        """Categoria (linha de produto) do formulário, usada nos sub-feeds do Chaves na Mão"""
+        form = cls.get_form_by_id(form_id) if form_id else None
+        return form.get('category') if form else None
+    
+    @classmethod
+    def get_test_prefixes(cls) -> List[str]:
+        """Prefixos de referência de imóveis de teste (removidos do feed automaticamente)"""
+        return [prefix.strip() for prefix in cls.CHAVES_NA_MAO_TEST_PREFIXES.split(',') if prefix.strip()]
+    
+    @classmethod
+    def get_feed_categories(cls) -> List[str]:
+        """Categorias configuradas nos formulários"""
+        config = cls.get_forms_config()
+        return [form['category'] for form in config.get('forms', []) if form.get('category')]
+    
     @classmethod
     def validate(cls):
         """Valida se as configurações essenciais estão presentes"""
@@ -0,0 +1,17 @@
+@echo off
+chcp 65001 >nul
+REM Muda para o diretório onde o script está localizado
+cd /d "%~dp0"
+echo ========================================
+echo   AGENDADOR - SISTEMA DE INTEGRAÇÃO
+echo ========================================
+echo.
+echo Executa sincronização, fila do Wasseller, limpeza e feed
+echo em um único processo (substitui as tarefas agendadas do Windows).
+echo.
+echo Pressione Ctrl+C para parar
+echo.
+
+python agendador.py
+
+pause
@@ -1,20 +1,31 @@
 """
 Módulo de integrações para imobiliária
+
+As classes são importadas sob demanda (no primeiro acesso) para que importar
+o pacote não carregue googleapiclient, openai, requests e reportlab de uma vez.
 """
-from .google_forms import GoogleFormsIntegration
-from .chatgpt import ChatGPTIntegration
-from .clickup import ClickUpIntegration
-from .google_drive import GoogleDriveIntegration
-from .chaves_na_mao import ChavesNaMaoIntegration
-from .wasseller import WassellerIntegration
+import importlib
+
+_LAZY_IMPORTS = {
+    'GoogleFormsIntegration': '.google_forms',
+    'ChatGPTIntegration': '.chatgpt',
+    'ClickUpIntegration': '.clickup',
+    'GoogleDriveIntegration': '.google_drive',
+    'ChavesNaMaoIntegration': '.chaves_na_mao',
+    'WassellerIntegration': '.wasseller',
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
 
-__all__ = [
-    'GoogleFormsIntegration',
-    'ChatGPTIntegration',
-    'ClickUpIntegration',
-    'GoogleDriveIntegration',
-    'ChavesNaMaoIntegration',
-    'WassellerIntegration'
-]
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(list(globals()) + __all__)
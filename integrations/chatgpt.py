@@ -3,8 +3,8 @@ Integração com ChatGPT/OpenAI
 """
 import json
 from typing import Dict, List, Optional
-from openai import OpenAI
 from config import Config
+from integrations.circuit_breaker import circuit_protected
 
 
 class ChatGPTIntegration:
@@ -25,7 +25,14 @@ class ChatGPTIntegration:
         # Nota: Se der erro de 'proxies', pode ser incompatibilidade de versão
         # Solução: Atualizar openai e httpx ou usar versões compatíveis
         try:
-            self.client = OpenAI(api_key=self.api_key)
+            # Importado aqui: o pacote openai (e httpx) é pesado para carregar
+            from openai import OpenAI
+            # Sem timeout o SDK espera até 10 minutos: o circuito nunca veria a falha a tempo
+            self.client = OpenAI(
+                api_key=self.api_key,
+                timeout=Config.OPENAI_TIMEOUT,
+                max_retries=Config.OPENAI_MAX_RETRIES
+            )
         except TypeError as e:
             if 'proxies' in str(e):
                 # Erro conhecido: versão incompatível de openai/httpx
@@ -45,6 +52,11 @@ class ChatGPTIntegration:
         
         self.model = Config.CHATGPT_MODEL
     
+    @circuit_protected('chatgpt')
+    def _create_completion(self, **kwargs):
+        """Chamada à API de chat (protegida pelo circuito da OpenAI)"""
+        return self.client.chat.completions.create(**kwargs)
+    
     def analyze_form_data(self, form_data: Dict, context: Optional[str] = None) -> Dict:
         """
         Analisa dados de formulário usando ChatGPT
@@ -59,7 +71,7 @@ class ChatGPTIntegration:
         prompt = self._build_analysis_prompt(form_data, context)
         
         try:
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
                 model=self.model,
                 messages=[
                     {
@@ -1,10 +1,19 @@
 """
 Integração com Chaves na Mão
 """
-from typing import Dict, List, Optional
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
 import requests
 import xml.etree.ElementTree as ET
 from config import Config
+from integrations.chaves_na_mao_fields import parse_imovel_element
+from integrations.circuit_breaker import is_service_failure
+from integrations.http_client import get_http_client
+from integrations.listing_fingerprints import ListingFingerprintStore, fingerprint, listing_key
 
 
 class ChavesNaMaoIntegration:
@@ -28,6 +37,12 @@ class ChavesNaMaoIntegration:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Cliente HTTP compartilhado (timeouts, retry de chamadas idempotentes, rate limit)
+        self.http = get_http_client('chaves_na_mao')
+        
+        # Hash do último envio de cada imóvel (importação envia só o que mudou)
+        self.fingerprints = ListingFingerprintStore()
     
     def create_lead(self, lead_data: Dict) -> Dict:
         """
@@ -42,8 +57,7 @@ class ChavesNaMaoIntegration:
         url = f"{self.api_url}/api/leads"
         
         try:
-            response = requests.post(url, json=lead_data, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.post(url, json=lead_data, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao criar lead no Chaves na Mão: {e}")
@@ -96,8 +110,7 @@ class ChavesNaMaoIntegration:
         url = f"{self.api_url}/api/leads/{lead_id}"
         
         try:
-            response = requests.put(url, json=updates, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.put(url, json=updates, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao atualizar lead no Chaves na Mão: {e}")
@@ -116,8 +129,7 @@ class ChavesNaMaoIntegration:
         url = f"{self.api_url}/api/leads/{lead_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.get(url, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao obter lead do Chaves na Mão: {e}")
@@ -136,13 +148,28 @@ class ChavesNaMaoIntegration:
         url = f"{self.api_url}/api/properties/search"
         
         try:
-            response = requests.post(url, json=filters, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.post(url, json=filters, headers=self.headers, retry=True)  # busca: pode repetir
             return response.json().get('properties', [])
         except requests.exceptions.RequestException as e:
             print(f"Erro ao buscar imóveis no Chaves na Mão: {e}")
             return []
     
+    @staticmethod
+    def _parse_imovel_element(imovel_elem: ET.Element) -> Dict:
+        """
+        Converte um elemento <imovel> já parseado no dicionário do imóvel
+        
+        Uma única passada pelos filhos do elemento, com o conversor de cada tag
+        vindo da especificação compartilhada com o gerador (chaves_na_mao_fields).
+        
+        Args:
+            imovel_elem: Elemento <imovel>
+            
+        Returns:
+            Dicionário com dados do imóvel formatado
+        """
+        return parse_imovel_element(imovel_elem)
+    
     def parse_xml_property(self, xml_content: str) -> Dict:
         """
         Parse um imóvel do formato XML do Chaves na Mão
@@ -161,131 +188,27 @@ class ChavesNaMaoIntegration:
             if imovel_elem is None:
                 raise ValueError("Elemento 'imovel' não encontrado no XML")
             
-            # Extrai todos os campos do XML
-            property_data = {}
-            
-            # Campos básicos
-            for field in ['referencia', 'codigo_cliente', 'link_cliente', 'titulo', 
-                         'transacao', 'transacao2', 'finalidade', 'finalidade2', 
-                         'destaque', 'tipo', 'tipo2']:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    property_data[field] = elem.text.strip()
-            
-            # Valores numéricos
-            for field in ['valor', 'valor_locacao', 'valor_iptu', 'valor_condominio']:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    try:
-                        property_data[field] = float(elem.text.strip())
-                    except ValueError:
-                        property_data[field] = elem.text.strip()
-            
-            # Áreas
-            for field in ['area_total', 'area_util']:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    try:
-                        property_data[field] = float(elem.text.strip())
-                    except ValueError:
-                        property_data[field] = elem.text.strip()
-            
-            # Características (booleanos e numéricos)
-            boolean_fields = ['aceita_pet', 'esconder_endereco_imovel', 'aceita_troca']
-            numeric_fields = ['quartos', 'suites', 'garagem', 'banheiro', 'closet', 
-                            'salas', 'despensa', 'bar', 'cozinha', 'quarto_empregada',
-                            'escritorio', 'area_servico', 'lareira', 'varanda', 'lavanderia']
-            
-            for field in boolean_fields + numeric_fields:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    if field in boolean_fields:
-                        property_data[field] = elem.text.strip() == '1'
-                    else:
-                        try:
-                            property_data[field] = int(elem.text.strip())
-                        except ValueError:
-                            property_data[field] = elem.text.strip()
-            
-            # Endereço
-            address_fields = ['estado', 'cidade', 'bairro', 'cep', 'endereco', 
-                            'numero', 'complemento']
-            for field in address_fields:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    property_data[field] = elem.text.strip()
-            
-            # Descrição
-            descritivo_elem = imovel_elem.find('descritivo')
-            if descritivo_elem is not None:
-                property_data['descritivo'] = descritivo_elem.text.strip() if descritivo_elem.text else ''
-            
-            # Fotos
-            fotos = []
-            fotos_elem = imovel_elem.find('fotos_imovel')
-            if fotos_elem is not None:
-                for foto_elem in fotos_elem.findall('foto'):
-                    foto_data = {}
-                    url_elem = foto_elem.find('url')
-                    data_elem = foto_elem.find('data_atualizacao')
-                    if url_elem is not None and url_elem.text:
-                        foto_data['url'] = url_elem.text.strip()
-                    if data_elem is not None and data_elem.text:
-                        foto_data['data_atualizacao'] = data_elem.text.strip()
-                    if foto_data:
-                        fotos.append(foto_data)
-            property_data['fotos'] = fotos
-            
-            # Áreas comuns e privativas
-            area_comum = []
-            area_comum_elem = imovel_elem.find('area_comum')
-            if area_comum_elem is not None:
-                for item in area_comum_elem.findall('item'):
-                    if item.text:
-                        area_comum.append(item.text.strip())
-            property_data['area_comum'] = area_comum
-            
-            area_privativa = []
-            area_privativa_elem = imovel_elem.find('area_privativa')
-            if area_privativa_elem is not None:
-                for item in area_privativa_elem.findall('item'):
-                    if item.text:
-                        area_privativa.append(item.text.strip())
-            property_data['area_privativa'] = area_privativa
-            
-            # Outros campos
-            for field in ['data_atualizacao', 'latitude', 'longitude', 'video', 
-                         'tour_360', 'periodo_locacao', 'conservacao']:
-                elem = imovel_elem.find(field)
-                if elem is not None and elem.text:
-                    property_data[field] = elem.text.strip()
-            
-            return property_data
+            return self._parse_imovel_element(imovel_elem)
             
         except ET.ParseError as e:
             raise ValueError(f"Erro ao fazer parse do XML: {e}")
         except Exception as e:
             raise ValueError(f"Erro ao processar XML do imóvel: {e}")
     
-    def import_property_from_xml(self, xml_content: str) -> Dict:
+    def create_property(self, property_data: Dict) -> Dict:
         """
-        Importa um imóvel a partir de XML e cria na plataforma
+        Cria um imóvel (já convertido em dicionário) na plataforma
         
         Args:
-            xml_content: Conteúdo XML do imóvel
+            property_data: Dados do imóvel (formato de parse_xml_property)
             
         Returns:
             Dados do imóvel criado
         """
-        # Parse do XML
-        property_data = self.parse_xml_property(xml_content)
-        
-        # Cria o imóvel via API
         url = f"{self.api_url}/api/properties"
         
         try:
-            response = requests.post(url, json=property_data, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.post(url, json=property_data, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao importar imóvel no Chaves na Mão: {e}")
@@ -293,52 +216,307 @@ class ChavesNaMaoIntegration:
                 print(f"Resposta do servidor: {e.response.text}")
             raise
     
-    def import_properties_from_xml_file(self, xml_file_path: str) -> List[Dict]:
+    def import_property_from_xml(self, xml_content: str) -> Dict:
         """
-        Importa múltiplos imóveis a partir de um arquivo XML
+        Importa um imóvel a partir de XML e cria na plataforma
         
         Args:
-            xml_file_path: Caminho do arquivo XML
+            xml_content: Conteúdo XML do imóvel
             
         Returns:
-            Lista de imóveis importados
+            Dados do imóvel criado
         """
-        try:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
+        # Parse do XML
+        property_data = self.parse_xml_property(xml_content)
+        
+        # Cria o imóvel via API
+        return self.create_property(property_data)
+    
+    @staticmethod
+    def _iter_imovel_elements(xml_file_path: str) -> Iterator[ET.Element]:
+        """
+        Percorre os elementos <imovel> do arquivo em streaming (iterparse)
+        
+        Cada elemento é liberado depois de consumido, então a memória fica constante
+        mesmo em exportações com dezenas de milhares de imóveis.
+        """
+        stack = []
+        for event, elem in ET.iterparse(xml_file_path, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag == 'imovel':
+                yield elem
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+    
+    def iter_properties_from_xml_file(self, xml_file_path: str) -> Iterator[Dict]:
+        """
+        Lê os imóveis de um arquivo XML sob demanda (um por vez, parse único)
+        
+        Args:
+            xml_file_path: Caminho do arquivo XML
             
-            imported_properties = []
+        Yields:
+            Dicionário de cada imóvel (formato de parse_xml_property)
+        """
+        try:
+            for imovel_elem in self._iter_imovel_elements(xml_file_path):
+                yield self._parse_imovel_element(imovel_elem)
+        except ET.ParseError as e:
+            raise ValueError(f"Erro ao fazer parse do arquivo XML: {e}")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo não encontrado: {xml_file_path}")
+    
+    def _create_property_with_retry(self, property_data: Dict, retries: int) -> Dict:
+        """Cria o imóvel repetindo falhas temporárias do serviço (5xx, timeout, conexão)"""
+        attempt = 0
+        while True:
+            try:
+                return self.create_property(property_data)
+            except Exception as e:
+                if attempt >= retries or not is_service_failure(e):
+                    raise
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+                attempt += 1
+    
+    @staticmethod
+    def _load_import_checkpoint(checkpoint_file: str) -> Dict:
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️  Aviso: Checkpoint de importação inválido ({e}), recomeçando do início")
+            return {}
+    
+    @staticmethod
+    def _save_import_checkpoint(checkpoint_file: str, data: Dict):
+        """Grava o checkpoint de forma atômica (arquivo temporário + os.replace)"""
+        tmp_path = f"{checkpoint_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, checkpoint_file)
+    
+    def bulk_import_properties_from_xml_file(
+        self,
+        xml_file_path: str,
+        max_workers: Optional[int] = None,
+        retries: Optional[int] = None,
+        resume: bool = True,
+        summary_only: bool = False,
+        checkpoint_file: Optional[str] = None,
+        only_changed: Optional[bool] = None,
+        fingerprint_source: str = 'chaves_na_mao'
+    ) -> Dict:
+        """
+        Importa os imóveis de um arquivo XML em paralelo, com retry e checkpoint
+        
+        O arquivo é lido em streaming e os imóveis são enviados por workers em
+        paralelo (no máximo 2x workers em andamento, memória constante). As
+        referências já importadas vão para um checkpoint JSON: se a importação
+        for interrompida, a próxima execução continua de onde parou.
+        
+        Com only_changed, cada imóvel parseado é comparado (hash do conteúdo
+        normalizado) com o último envio bem-sucedido: só os novos e alterados são
+        enviados. Os que estavam no último envio e sumiram do arquivo são
+        informados em 'removed' (a API não tem remoção de imóveis) e saem do índice.
+        
+        Args:
+            xml_file_path: Caminho do arquivo XML
+            max_workers: Envios simultâneos (padrão: CHAVES_NA_MAO_IMPORT_WORKERS)
+            retries: Novas tentativas por imóvel em falhas temporárias (padrão: CHAVES_NA_MAO_IMPORT_RETRIES)
+            resume: Pula os imóveis já importados segundo o checkpoint
+            summary_only: Retorna só os totais e os primeiros erros (sem a lista de resultados)
+            checkpoint_file: Arquivo do checkpoint (padrão: <xml>.checkpoint.json)
+            only_changed: Envia só os imóveis novos/alterados (padrão: CHAVES_NA_MAO_IMPORT_ONLY_CHANGED)
+            fingerprint_source: Índice de hashes a comparar (use um próprio para arquivos parciais)
             
-            # Processa cada imóvel no XML
-            for imovel_elem in root.findall('.//imovel'):
-                # Converte elemento para string XML
-                xml_string = ET.tostring(imovel_elem, encoding='unicode')
-                # Adiciona tags raiz para parse
-                xml_content = f'<?xml version="1.0" encoding="UTF-8"?><Document><imoveis>{xml_string}</imoveis></Document>'
-                
+        Returns:
+            {'total', 'successful', 'failed', 'skipped', 'resumed', 'elapsed_seconds',
+             'errors', 'checkpoint_file', 'new', 'changed', 'unchanged', 'removed',
+             'removed_referencias', 'estimated_time_saved_seconds'} e 'results'
+            (se summary_only=False)
+        """
+        max_workers = max(1, max_workers or Config.CHAVES_NA_MAO_IMPORT_WORKERS)
+        retries = Config.CHAVES_NA_MAO_IMPORT_RETRIES if retries is None else retries
+        checkpoint_every = Config.CHAVES_NA_MAO_IMPORT_CHECKPOINT_EVERY
+        checkpoint_file = checkpoint_file or f"{xml_file_path}.checkpoint.json"
+        only_changed = Config.CHAVES_NA_MAO_IMPORT_ONLY_CHANGED if only_changed is None else only_changed
+        
+        checkpoint = self._load_import_checkpoint(checkpoint_file) if resume else {}
+        done = set(checkpoint.get('done', []))
+        report = {
+            'total': 0,
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'resumed': bool(done),
+            'errors': [],
+            'checkpoint_file': checkpoint_file,
+            'new': 0,
+            'changed': 0,
+            'unchanged': 0,
+            'removed': 0,
+            'removed_referencias': []
+        }
+        results = []
+        start = time.perf_counter()
+        since_checkpoint = 0
+        
+        known = self.fingerprints.get_all(fingerprint_source) if only_changed else {}
+        seen = set()
+        fingerprint_updates = []
+        push_seconds = 0.0
+        pushed = 0
+        
+        def flush_fingerprints():
+            self.fingerprints.upsert_many(fingerprint_source, fingerprint_updates)
+            fingerprint_updates.clear()
+        
+        def save_checkpoint():
+            flush_fingerprints()
+            self._save_import_checkpoint(checkpoint_file, {
+                'xml_file': xml_file_path,
+                'updated_at': time.time(),
+                'done': sorted(done)
+            })
+        
+        def record(result: Dict):
+            nonlocal since_checkpoint, push_seconds, pushed
+            fingerprint_info = result.pop('fingerprint', None)
+            if 'seconds' in result:
+                push_seconds += result.pop('seconds')
+                pushed += 1
+            if result['success']:
+                report['successful'] += 1
+                done.add(result['referencia'])
+                if fingerprint_info:
+                    fingerprint_updates.append(fingerprint_info)
+            else:
+                report['failed'] += 1
+                if len(report['errors']) < 100:
+                    report['errors'].append({'referencia': result['referencia'], 'error': result['error']})
+            if not summary_only:
+                results.append(result)
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                save_checkpoint()
+                since_checkpoint = 0
+        
+        def push(index: int, key: str, property_data: Dict, fingerprint_info) -> Dict:
+            push_start = time.perf_counter()
+            try:
+                created = self._create_property_with_retry(property_data, retries)
+                result = {'index': index, 'success': True, 'property': created, 'referencia': key}
+            except Exception as e:
+                result = {'index': index, 'success': False, 'error': str(e), 'referencia': key}
+            result['seconds'] = time.perf_counter() - push_start
+            result['fingerprint'] = fingerprint_info
+            return result
+        
+        def drain(pending, limit: int):
+            while len(pending) > limit:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.discard(future)
+                    record(future.result())
+        
+        pending = set()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chaves-import') as pool:
                 try:
-                    property_data = self.parse_xml_property(xml_content)
-                    # Importa via API
-                    result = self.import_property_from_xml(xml_content)
-                    imported_properties.append({
-                        'success': True,
-                        'property': result,
-                        'referencia': property_data.get('referencia', 'N/A')
-                    })
-                except Exception as e:
-                    imported_properties.append({
-                        'success': False,
-                        'error': str(e),
-                        'referencia': imovel_elem.find('referencia').text if imovel_elem.find('referencia') is not None else 'N/A'
-                    })
-            
-            return imported_properties
-            
+                    for index, imovel_elem in enumerate(self._iter_imovel_elements(xml_file_path)):
+                        report['total'] += 1
+                        key = (imovel_elem.findtext('referencia') or '').strip() or f"#{index}"
+                        stored_key = listing_key({
+                            'referencia': imovel_elem.findtext('referencia'),
+                            'codigo_cliente': imovel_elem.findtext('codigo_cliente')
+                        })
+                        if stored_key:
+                            seen.add(stored_key)
+                        if key in done:
+                            report['skipped'] += 1
+                            continue
+                        try:
+                            property_data = self._parse_imovel_element(imovel_elem)
+                        except Exception as e:
+                            record({'index': index, 'success': False, 'error': str(e), 'referencia': key})
+                            continue
+                        fingerprint_info = None
+                        if stored_key:
+                            content_hash = fingerprint(property_data)
+                            fingerprint_info = (stored_key, content_hash)
+                            if only_changed:
+                                previous = known.get(stored_key)
+                                if previous == content_hash:
+                                    report['unchanged'] += 1
+                                    continue
+                                report['changed' if previous else 'new'] += 1
+                        pending.add(pool.submit(push, index, key, property_data, fingerprint_info))
+                        drain(pending, max_workers * 2)
+                finally:
+                    # Mesmo com erro no arquivo, registra o que já foi enviado
+                    drain(pending, 0)
         except ET.ParseError as e:
             raise ValueError(f"Erro ao fazer parse do arquivo XML: {e}")
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo não encontrado: {xml_file_path}")
+        finally:
+            if done or os.path.exists(checkpoint_file):
+                save_checkpoint()
+            else:
+                flush_fingerprints()
+        
+        # Arquivo lido até o fim: o que estava no último envio e não veio mais foi removido
+        if only_changed:
+            removed = sorted(set(known) - seen)
+            report['removed'] = len(removed)
+            report['removed_referencias'] = removed[:100]
+            self.fingerprints.remove_many(fingerprint_source, removed)
+        
+        # Tempo economizado: imóveis não enviados x tempo médio de envio (em paralelo)
+        self.fingerprints.record_push_time(fingerprint_source, pushed, push_seconds)
+        average = push_seconds / pushed if pushed else self.fingerprints.average_push_seconds(fingerprint_source)
+        report['estimated_time_saved_seconds'] = round(report['unchanged'] * (average or 0) / max_workers, 2)
+        
+        # Tudo importado: o checkpoint não é mais necessário
+        if report['failed'] == 0:
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+            report['checkpoint_file'] = None
+        
+        report['elapsed_seconds'] = round(time.perf_counter() - start, 2)
+        if not summary_only:
+            report['results'] = sorted(results, key=lambda r: r['index'])
+        return report
+    
+    def import_properties_from_xml_file(self, xml_file_path: str) -> List[Dict]:
+        """
+        Importa múltiplos imóveis a partir de um arquivo XML
+        
+        O arquivo é lido em streaming (cada <imovel> parseado uma única vez) e os
+        imóveis são enviados em paralelo; ver bulk_import_properties_from_xml_file.
+        
+        Args:
+            xml_file_path: Caminho do arquivo XML
+            
+        Returns:
+            Lista de imóveis importados
+        """
+        try:
+            report = self.bulk_import_properties_from_xml_file(xml_file_path, resume=False, only_changed=False)
+        except (ValueError, FileNotFoundError):
+            raise
         except Exception as e:
             raise ValueError(f"Erro ao processar arquivo XML: {e}")
+        
+        return [
+            {key: value for key, value in result.items() if key != 'index'}
+            for result in report['results']
+        ]
 
 
@@ -0,0 +1,244 @@
+"""
+Especificação dos campos do <imovel> no XML do Chaves na Mão
+Uma única tabela declarativa (tag, tipo, chave no dicionário, origem na geração)
+usada tanto pelo parse (ChavesNaMaoIntegration) quanto pela geração
+(ChavesNaMaoXMLGenerator), para que os dois lados fiquem simétricos. O parse é
+compilado uma vez num despacho tag -> conversor percorrido em uma única passada
+pelos filhos do elemento.
+"""
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, Optional, Tuple
+
+
+TEXT = 'text'
+FLOAT = 'float'
+INT = 'int'
+BOOL = 'bool'
+PRESERVE = 'preserve'  # texto livre com xml:space="preserve" (descritivo)
+PHOTOS = 'photos'      # <fotos_imovel><foto><url/><data_atualizacao/></foto>...
+ITEMS = 'items'        # <area_comum><item/>...
+
+LIST_KINDS = (PHOTOS, ITEMS)
+
+TRUE_VALUES = {'1', 'true', 'sim', 's', 'yes'}
+
+
+class FeedField:
+    """Um campo do <imovel>"""
+
+    __slots__ = ('tag', 'kind', 'key', 'sources', 'default')
+
+    def __init__(
+        self,
+        tag: str,
+        kind: str = TEXT,
+        key: Optional[str] = None,
+        sources: Tuple[str, ...] = (),
+        default: str = ''
+    ):
+        """
+        Args:
+            tag: Tag do elemento no XML
+            kind: Tipo do valor (TEXT, FLOAT, INT, BOOL, PRESERVE, PHOTOS, ITEMS)
+            key: Chave no dicionário parseado (padrão: a própria tag)
+            sources: Chaves lidas na geração, em ordem de preferência (padrão: key)
+            default: Texto gerado quando nenhuma das chaves existe
+        """
+        self.tag = tag
+        self.kind = kind
+        self.key = key or tag
+        self.sources = sources or (self.key,)
+        self.default = default
+
+    def value_from(self, property_data: Dict):
+        """Valor do campo nos dados do imóvel (primeira chave presente)"""
+        for source in self.sources:
+            if source in property_data:
+                return property_data[source]
+        return self.default
+
+
+# Campos na ordem em que são gerados no feed (o parse não depende da ordem)
+FEED_FIELDS = (
+    FeedField('referencia', sources=('codigo', 'referencia')),
+    FeedField('codigo_cliente', sources=('codigo_cliente', 'codigo')),
+    FeedField('link_cliente'),
+    FeedField('titulo', sources=('titulo', 'nome_imovel'), default='Imóvel'),
+    FeedField('transacao', default='V'),  # V=venda, L=locacao
+    FeedField('transacao2'),
+    FeedField('finalidade', default='RE'),  # RE=residencial
+    FeedField('finalidade2'),
+    FeedField('destaque', default='0'),
+    FeedField('tipo', sources=('tipo', 'tipo_imovel'), default='Apartamento'),
+    FeedField('tipo2'),
+    FeedField('valor', FLOAT),
+    FeedField('valor_locacao', FLOAT),
+    FeedField('valor_iptu', FLOAT),
+    FeedField('valor_condominio', FLOAT),
+    FeedField('area_total', FLOAT, sources=('area_total', 'area')),
+    FeedField('area_util', FLOAT),
+    FeedField('conservacao'),
+    FeedField('quartos', INT),
+    FeedField('suites', INT),
+    FeedField('garagem', INT, sources=('garagem', 'vagas')),
+    FeedField('banheiro', INT, sources=('banheiro', 'banheiros')),
+    FeedField('closet', INT),
+    FeedField('salas', INT),
+    FeedField('despensa', INT),
+    FeedField('bar', INT),
+    FeedField('cozinha', INT),
+    FeedField('quarto_empregada', INT),
+    FeedField('escritorio', INT),
+    FeedField('area_servico', INT),
+    FeedField('lareira', INT),
+    FeedField('varanda', INT),
+    FeedField('lavanderia', INT),
+    FeedField('aceita_pet', BOOL, default='0'),
+    FeedField('estado'),
+    FeedField('cidade'),
+    FeedField('bairro'),
+    FeedField('cep'),
+    FeedField('endereco'),
+    FeedField('numero'),
+    FeedField('complemento'),
+    FeedField('esconder_endereco_imovel', BOOL,
+              sources=('esconder_endereco', 'esconder_endereco_imovel'), default='0'),
+    FeedField('descritivo', PRESERVE, sources=('descritivo', 'descricao', 'observacoes')),
+    FeedField('fotos_imovel', PHOTOS, key='fotos', sources=('fotos', 'foto_urls')),
+    FeedField('data_atualizacao'),
+    FeedField('latitude'),
+    FeedField('longitude'),
+    FeedField('video'),
+    FeedField('tour_360'),
+    FeedField('area_comum', ITEMS, sources=('area_comum', 'areas_comuns')),
+    FeedField('area_privativa', ITEMS, sources=('area_privativa', 'areas_privativas')),
+    FeedField('aceita_troca', BOOL),
+    FeedField('periodo_locacao'),
+)
+
+
+# ----------------------------------------------------------------------
+# Geração: valor do dicionário -> texto do elemento
+# ----------------------------------------------------------------------
+
+def format_value(value) -> str:
+    """Texto de um valor simples (vazio para None, 850000.0 -> '850000', bool -> '1'/'0')"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def format_flag(value, default: str = '') -> str:
+    """Texto de um campo 0/1 (aceita bool, números e 'sim'/'true'/'1')"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return '1' if value.strip().lower() in TRUE_VALUES else '0'
+    return '1' if value else '0'
+
+
+def as_list(value) -> list:
+    """Lista de fotos/itens (texto único vira lista de um item)"""
+    if isinstance(value, (str, dict)):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return []
+
+
+# ----------------------------------------------------------------------
+# Parse: elemento -> valor do dicionário
+# ----------------------------------------------------------------------
+
+def _parse_text(elem: ET.Element, data: Dict, key: str):
+    if elem.text:
+        data[key] = elem.text.strip()
+
+
+def _parse_float(elem: ET.Element, data: Dict, key: str):
+    if elem.text:
+        text = elem.text.strip()
+        try:
+            data[key] = float(text)
+        except ValueError:
+            data[key] = text
+
+
+def _parse_int(elem: ET.Element, data: Dict, key: str):
+    if elem.text:
+        text = elem.text.strip()
+        try:
+            data[key] = int(text)
+        except ValueError:
+            data[key] = text
+
+
+def _parse_bool(elem: ET.Element, data: Dict, key: str):
+    if elem.text:
+        data[key] = elem.text.strip() == '1'
+
+
+def _parse_preserve(elem: ET.Element, data: Dict, key: str):
+    data[key] = elem.text.strip() if elem.text else ''
+
+
+def _parse_photos(elem: ET.Element, data: Dict, key: str):
+    fotos = []
+    for foto_elem in elem:
+        if foto_elem.tag != 'foto':
+            continue
+        foto_data = {}
+        for child in foto_elem:
+            if child.tag in ('url', 'data_atualizacao') and child.text and child.tag not in foto_data:
+                foto_data[child.tag] = child.text.strip()
+        if foto_data:
+            fotos.append(foto_data)
+    data[key] = fotos
+
+
+def _parse_items(elem: ET.Element, data: Dict, key: str):
+    data[key] = [item.text.strip() for item in elem if item.tag == 'item' and item.text]
+
+
+PARSERS = {
+    TEXT: _parse_text,
+    FLOAT: _parse_float,
+    INT: _parse_int,
+    BOOL: _parse_bool,
+    PRESERVE: _parse_preserve,
+    PHOTOS: _parse_photos,
+    ITEMS: _parse_items,
+}
+
+
+def compile_parser(fields: Tuple[FeedField, ...] = FEED_FIELDS) -> Callable[[ET.Element], Dict]:
+    """
+    Compila a especificação num parser de uma passada pelos filhos do <imovel>
+
+    Returns:
+        Função que converte um elemento <imovel> no dicionário do imóvel
+    """
+    dispatch = {field.tag: (PARSERS[field.kind], field.key) for field in fields}
+    list_keys = tuple(field.key for field in fields if field.kind in LIST_KINDS)
+
+    def parse(imovel_elem: ET.Element) -> Dict:
+        property_data = {key: [] for key in list_keys}
+        seen = set()
+        for child in imovel_elem:
+            tag = child.tag
+            if tag in seen:
+                continue  # Tag repetida: vale a primeira, como em find()
+            entry = dispatch.get(tag)
+            if entry is not None:
+                seen.add(tag)
+                entry[0](child, property_data, entry[1])
+        return property_data
+
+    return parse
+
+
+parse_imovel_element = compile_parser()
@@ -0,0 +1,234 @@
+"""
+Circuit breakers por integração externa (OpenAI, ClickUp, Drive, Wasseller)
+Depois de N falhas seguidas do serviço o circuito abre: as chamadas falham na hora
+(CircuitOpenError) em vez de esperar o serviço fora do ar, e o trabalho vai para as
+filas de retry. Passado o tempo de recuperação, algumas chamadas de teste (meio-aberto)
+decidem se o circuito fecha de novo.
+"""
+import functools
+import time
+from threading import Lock
+from typing import Callable, Dict, Optional
+from config import Config
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Respostas que indicam problema do serviço (e não da requisição)
+FAILURE_STATUS = {408, 429}
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito da integração está aberto"""
+
+    def __init__(self, name: str, retry_at: float):
+        self.name = name
+        self.retry_at = retry_at
+        super().__init__(
+            f"Circuito '{name}' aberto: serviço indisponível, nova tentativa em {self.retry_in:.0f}s"
+        )
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.retry_at - time.time())
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    """Código HTTP do erro (requests, googleapiclient ou openai), se houver"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        status = getattr(error, 'status_code', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_service_failure(error: Exception) -> bool:
+    """
+    Indica se o erro conta como falha do serviço para o circuito
+
+    Conta: 5xx, 408/429, timeouts e falhas de conexão. Não conta: erros 4xx e de
+    validação/configuração (ValueError, KeyError...), que repetir não resolve.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = _status_of(error)
+    if status is not None:
+        return status >= 500 or status in FAILURE_STATUS
+    return not isinstance(error, (ValueError, TypeError, KeyError, AttributeError))
+
+
+class CircuitBreaker:
+    """Circuito fechado/aberto/meio-aberto de uma integração"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        recovery_seconds: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None,
+        is_failure: Callable[[Exception], bool] = is_service_failure
+    ):
+        """
+        Args:
+            name: Nome da integração
+            failure_threshold: Falhas seguidas para abrir (padrão: CIRCUIT_FAILURE_THRESHOLD)
+            recovery_seconds: Tempo aberto antes de testar de novo (padrão: CIRCUIT_RECOVERY_SECONDS)
+            half_open_max_calls: Chamadas de teste simultâneas no meio-aberto (padrão: CIRCUIT_HALF_OPEN_MAX_CALLS)
+            is_failure: Decide se uma exceção conta como falha do serviço
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_seconds = recovery_seconds or Config.CIRCUIT_RECOVERY_SECONDS
+        self.half_open_max_calls = half_open_max_calls or Config.CIRCUIT_HALF_OPEN_MAX_CALLS
+        self.is_failure = is_failure
+
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.stats = {
+            'calls': 0,
+            'failures': 0,
+            'rejected': 0,
+            'opened': 0,
+            'last_error': None,
+            'last_failure_at': None,
+            'last_state_change': None
+        }
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            self._state = state
+            self.stats['last_state_change'] = time.time()
+            icon = {'open': '🔴', 'half_open': '🟡', 'closed': '🟢'}[state]
+            print(f"{icon} Circuito '{self.name}': {state}")
+
+    def _current_state(self) -> str:
+        """Estado atual (aberto vira meio-aberto quando o tempo de recuperação passa)"""
+        if self._state == OPEN and time.time() - self._opened_at >= self.recovery_seconds:
+            self._set_state(HALF_OPEN)
+            self._half_open_calls = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def retry_at(self) -> float:
+        """Quando o circuito aceita chamadas de novo (agora, se não estiver aberto)"""
+        with self._lock:
+            if self._current_state() == OPEN:
+                return self._opened_at + self.recovery_seconds
+            return time.time()
+
+    def allows_calls(self) -> bool:
+        """Consulta sem reservar vaga: False se o circuito está aberto"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls)
+
+    def before_call(self):
+        """Reserva a chamada ou levanta CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._half_open_calls >= self.half_open_max_calls):
+                self.stats['rejected'] += 1
+                retry_at = self._opened_at + self.recovery_seconds if state == OPEN else time.time() + 1
+                raise CircuitOpenError(self.name, retry_at)
+            if state == HALF_OPEN:
+                self._half_open_calls += 1
+            self.stats['calls'] += 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state == HALF_OPEN:
+                self._half_open_calls = max(0, self._half_open_calls - 1)
+                self._set_state(CLOSED)
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self._failures += 1
+            self.stats['failures'] += 1
+            self.stats['last_error'] = str(error)[:300]
+            self.stats['last_failure_at'] = time.time()
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.stats['opened'] += 1
+                self._opened_at = time.time()
+                self._half_open_calls = 0
+                self._set_state(OPEN)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Executa func protegida pelo circuito"""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            else:
+                # O serviço respondeu (ex: 404): está de pé
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def reset(self):
+        """Fecha o circuito manualmente"""
+        with self._lock:
+            self._failures = 0
+            self._half_open_calls = 0
+            self._set_state(CLOSED)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_seconds': self.recovery_seconds,
+                'retry_at': self._opened_at + self.recovery_seconds if state == OPEN else None,
+                **self.stats
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Circuito compartilhado da integração (criado no primeiro uso)"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_breakers_status() -> Dict:
+    """Estado de todos os circuitos criados até agora"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.snapshot() for name, breaker in breakers}
+
+
+def circuit_protected(name: str):
+    """Decorator: executa o método através do circuito da integração"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_breaker(name).call(func, *args, **kwargs)
+        return wrapper
+    return decorator
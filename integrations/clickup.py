@@ -1,9 +1,14 @@
 """
 Integração com ClickUp
 """
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from typing import Dict, List, Optional
 import requests
 from config import Config
+from integrations.circuit_breaker import CircuitOpenError, circuit_protected, is_service_failure
+from integrations.clickup_task_cache import ClickUpTaskCache
+from integrations.http_client import get_http_client
 
 
 class ClickUpIntegration:
@@ -28,7 +33,30 @@ class ClickUpIntegration:
         self.team_id = Config.CLICKUP_TEAM_ID
         self.space_id = Config.CLICKUP_SPACE_ID
         self.list_id = Config.CLICKUP_LIST_ID
+        
+        # Mapa response_id -> tarefa (evita tarefas duplicadas em reprocessamentos)
+        self.task_cache = ClickUpTaskCache()
+        self._response_locks: Dict[str, Lock] = {}
+        self._response_locks_lock = Lock()
+        
+        # Cliente HTTP compartilhado: timeouts, retry, concorrência limitada e rate limit
+        self.max_concurrent = max(1, Config.CLICKUP_MAX_CONCURRENT)
+        self.http = get_http_client(
+            'clickup',
+            rate_limit_margin=Config.CLICKUP_RATE_LIMIT_MARGIN,
+            max_concurrent=self.max_concurrent
+        )
+    
+    def _response_lock(self, response_id: str) -> Lock:
+        """Lock por resposta (duas execuções da mesma resposta não criam duas tarefas)"""
+        with self._response_locks_lock:
+            return self._response_locks.setdefault(response_id, Lock())
+    
+    # ------------------------------------------------------------------
+    # Tarefas
+    # ------------------------------------------------------------------
     
+    @circuit_protected('clickup')
     def create_task(
         self,
         name: str,
@@ -50,7 +78,7 @@ class ClickUpIntegration:
             assignees: Lista de IDs de usuários para atribuir
             tags: Lista de tags
             custom_fields: Campos customizados
-            
+        
         Returns:
             Dados da tarefa criada
         """
@@ -73,8 +101,7 @@ class ClickUpIntegration:
             payload["custom_fields"] = custom_fields
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.post(url, json=payload, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao criar tarefa no ClickUp: {e}")
@@ -82,23 +109,9 @@ class ClickUpIntegration:
                 print(f"Resposta do servidor: {e.response.text}")
             raise
     
-    def create_task_from_analysis(
-        self,
-        analysis: Dict,
-        task_description: str,
-        response_id: Optional[str] = None
-    ) -> Dict:
-        """
-        Cria uma tarefa no ClickUp baseada na análise do ChatGPT
-        
-        Args:
-            analysis: Análise gerada pelo ChatGPT
-            task_description: Descrição formatada da tarefa
-            response_id: ID da resposta original (para rastreamento)
-            
-        Returns:
-            Dados da tarefa criada
-        """
+    @staticmethod
+    def _build_task_fields(analysis: Dict, task_description: str, response_id: Optional[str] = None) -> Dict:
+        """Nome, descrição, prioridade e tags da tarefa a partir da análise do ChatGPT"""
         info = analysis.get('informacoes_extraidas', {})
         tipo_lead = analysis.get('tipo_lead', 'Lead')
         prioridade = analysis.get('prioridade', 'média')
@@ -124,13 +137,122 @@ class ClickUpIntegration:
         if response_id:
             task_description += f"\n\n**ID da Resposta:** {response_id}"
         
-        return self.create_task(
-            name=task_name,
-            description=task_description,
-            priority=priority,
-            tags=tags
-        )
+        return {
+            'name': task_name,
+            'description': task_description,
+            'priority': priority,
+            'tags': tags
+        }
     
+    def upsert_task_from_analysis(
+        self,
+        analysis: Dict,
+        task_description: str,
+        response_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Cria a tarefa da resposta ou, se ela já tem tarefa, atualiza a existente
+        
+        Args:
+            analysis: Análise gerada pelo ChatGPT
+            task_description: Descrição formatada da tarefa
+            response_id: ID da resposta original (chave de deduplicação)
+        
+        Returns:
+            {'task': dados da tarefa, 'action': 'created' | 'updated'}
+        """
+        fields = self._build_task_fields(analysis, task_description, response_id)
+        if not response_id:
+            return {'task': self.create_task(**fields), 'action': 'created'}
+        
+        with self._response_lock(response_id):
+            cached = self.task_cache.get(response_id)
+            if cached:
+                try:
+                    # Tags não são alteradas pelo PUT da API; nome, descrição e prioridade sim
+                    task = self.update_task(cached['task_id'], {
+                        'name': fields['name'],
+                        'description': fields['description'],
+                        'priority': fields['priority']
+                    })
+                    self.task_cache.set(response_id, task, self.list_id)
+                    return {'task': task, 'action': 'updated'}
+                except requests.exceptions.HTTPError as e:
+                    if e.response is None or e.response.status_code != 404:
+                        raise
+                    print(f"⚠️  Tarefa {cached['task_id']} não existe mais no ClickUp, criando outra")
+                    self.task_cache.remove(response_id)
+            
+            task = self.create_task(**fields)
+            self.task_cache.set(response_id, task, self.list_id)
+            return {'task': task, 'action': 'created'}
+    
+    def create_task_from_analysis(
+        self,
+        analysis: Dict,
+        task_description: str,
+        response_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Cria uma tarefa no ClickUp baseada na análise do ChatGPT
+        
+        Se a resposta já tiver tarefa (cache local), ela é atualizada em vez de duplicada.
+        
+        Args:
+            analysis: Análise gerada pelo ChatGPT
+            task_description: Descrição formatada da tarefa
+            response_id: ID da resposta original (para rastreamento)
+        
+        Returns:
+            Dados da tarefa criada (ou atualizada)
+        """
+        return self.upsert_task_from_analysis(analysis, task_description, response_id)['task']
+    
+    def create_tasks_bulk(self, items: List[Dict], max_concurrent: Optional[int] = None) -> List[Dict]:
+        """
+        Cria (ou atualiza) várias tarefas em paralelo, com concorrência limitada
+        e respeitando o rate limit do ClickUp
+        
+        Args:
+            items: Lista de {'analysis', 'task_description', 'response_id'}
+            max_concurrent: Requisições simultâneas (padrão: CLICKUP_MAX_CONCURRENT)
+        
+        Returns:
+            Um resultado por item, na mesma ordem: {'response_id', 'success',
+            'action', 'task_id', 'task_url'} ou {'response_id', 'success', 'error',
+            'service_failure'} (service_failure: ClickUp fora do ar, vale adiar a etapa)
+        """
+        if not items:
+            return []
+        
+        def run(item: Dict) -> Dict:
+            response_id = item.get('response_id')
+            try:
+                outcome = self.upsert_task_from_analysis(
+                    analysis=item['analysis'],
+                    task_description=item['task_description'],
+                    response_id=response_id
+                )
+                return {
+                    'response_id': response_id,
+                    'success': True,
+                    'action': outcome['action'],
+                    'task_id': outcome['task'].get('id'),
+                    'task_url': outcome['task'].get('url')
+                }
+            except Exception as e:
+                return {
+                    'response_id': response_id,
+                    'success': False,
+                    'error': str(e),
+                    'service_failure': isinstance(e, CircuitOpenError) or is_service_failure(e)
+                }
+        
+        workers = min(len(items), max_concurrent or self.max_concurrent)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='clickup-bulk') as pool:
+            return list(pool.map(run, items))
+    
+    @circuit_protected('clickup')
     def update_task(self, task_id: str, updates: Dict) -> Dict:
         """
         Atualiza uma tarefa existente
@@ -138,35 +260,34 @@ class ClickUpIntegration:
         Args:
             task_id: ID da tarefa
             updates: Dicionário com campos a atualizar
-            
+        
         Returns:
             Dados atualizados da tarefa
         """
         url = f"{self.base_url}/task/{task_id}"
         
         try:
-            response = requests.put(url, json=updates, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.put(url, json=updates, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao atualizar tarefa no ClickUp: {e}")
             raise
     
+    @circuit_protected('clickup')
     def get_task(self, task_id: str) -> Dict:
         """
         Obtém dados de uma tarefa
         
         Args:
             task_id: ID da tarefa
-            
+        
         Returns:
             Dados da tarefa
         """
         url = f"{self.base_url}/task/{task_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
+            response = self.http.get(url, headers=self.headers)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao obter tarefa do ClickUp: {e}")
@@ -0,0 +1,85 @@
+"""
+Mapa persistente response_id -> tarefa do ClickUp
+Evita criar tarefas duplicadas quando a mesma resposta é processada de novo
+"""
+import sqlite3
+from typing import Dict, Optional
+from threading import Lock
+
+
+class ClickUpTaskCache:
+    """Cache SQLite das tarefas criadas por resposta de formulário"""
+
+    def __init__(self, db_file: str = "clickup_tasks.db"):
+        """
+        Args:
+            db_file: Arquivo SQLite do cache
+        """
+        self.db_file = db_file
+        self.lock = Lock()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clickup_tasks (
+                    response_id TEXT PRIMARY KEY,
+                    task_id TEXT NOT NULL,
+                    task_url TEXT,
+                    list_id TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar cache de tarefas do ClickUp: {e}")
+
+    def get(self, response_id: str) -> Optional[Dict]:
+        """Tarefa já criada para a resposta (ou None)"""
+        conn = self._connect()
+        row = conn.execute('''
+            SELECT task_id, task_url, list_id, created_at, updated_at
+            FROM clickup_tasks
+            WHERE response_id = ?
+        ''', (response_id,)).fetchone()
+        conn.close()
+        if not row:
+            return None
+        return {
+            'response_id': response_id,
+            'task_id': row[0],
+            'task_url': row[1],
+            'list_id': row[2],
+            'created_at': row[3],
+            'updated_at': row[4]
+        }
+
+    def set(self, response_id: str, task: Dict, list_id: Optional[str] = None):
+        """Registra (ou atualiza) a tarefa da resposta"""
+        with self.lock:
+            conn = self._connect()
+            conn.execute('''
+                INSERT INTO clickup_tasks (response_id, task_id, task_url, list_id)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(response_id) DO UPDATE SET
+                    task_id = excluded.task_id,
+                    task_url = COALESCE(excluded.task_url, clickup_tasks.task_url),
+                    list_id = COALESCE(excluded.list_id, clickup_tasks.list_id),
+                    updated_at = datetime('now')
+            ''', (response_id, task['id'], task.get('url'), list_id))
+            conn.commit()
+            conn.close()
+
+    def remove(self, response_id: str):
+        """Esquece a tarefa da resposta (ex: tarefa apagada no ClickUp)"""
+        with self.lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM clickup_tasks WHERE response_id = ?", (response_id,))
+            conn.commit()
+            conn.close()
@@ -0,0 +1,323 @@
+"""
+Fila persistente de etapas adiadas do processamento de leads
+Quando uma integração sem fila própria (ex: ClickUp) está fora do ar ou com o
+circuito aberto, a etapa é gravada aqui (SQLite) e reexecutada depois pelo agendador.
+Etapas em execução têm um lease (dono + validade): só as de lease vencido (processo
+que morreu no meio) voltam a ser pegas.
+"""
+import json
+import os
+import random
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional
+from datetime import datetime
+from threading import Lock
+from config import Config
+
+
+# Colunas adicionadas depois da primeira versão da tabela
+EXTRA_COLUMNS = {
+    'lease_owner': 'TEXT',
+    'lease_expires_at': 'REAL'
+}
+
+
+class DeferredStepQueue:
+    """Fila de etapas (tarefa do ClickUp, ...) a reexecutar quando o serviço voltar"""
+
+    def __init__(
+        self,
+        db_file: str = "deferred_steps.db",
+        max_attempts: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None
+    ):
+        """
+        Args:
+            db_file: Arquivo SQLite da fila
+            max_attempts: Tentativas antes de marcar a etapa como falha
+            backoff_seconds: Espera base entre tentativas (dobra a cada falha)
+            lease_seconds: Validade do lease de uma etapa em execução
+                           (padrão: DEFERRED_STEP_LEASE_SECONDS)
+        """
+        self.db_file = db_file
+        self.max_attempts = max_attempts or Config.DEFERRED_STEP_MAX_ATTEMPTS
+        self.backoff_seconds = backoff_seconds or Config.DEFERRED_STEP_BACKOFF_SECONDS
+        self.lease_seconds = lease_seconds or Config.DEFERRED_STEP_LEASE_SECONDS
+        self.max_backoff_seconds = 3600
+        # Identifica esta instância como dona dos leases (único entre processos e máquinas)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = Lock()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        """Cria a tabela (etapas interrompidas voltam à fila quando o lease vence)"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS deferred_steps (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    step TEXT NOT NULL,
+                    response_id TEXT,
+                    payload TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT,
+                    result TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_deferred_steps_status
+                ON deferred_steps (status, next_attempt_at)
+            ''')
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(deferred_steps)").fetchall()]
+            for column, column_type in EXTRA_COLUMNS.items():
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE deferred_steps ADD COLUMN {column} {column_type}")
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar banco de dados de etapas adiadas: {e}")
+
+    def enqueue(
+        self,
+        step: str,
+        response_id: Optional[str],
+        payload: Dict,
+        not_before: Optional[float] = None,
+        error: Optional[str] = None
+    ) -> int:
+        """
+        Adia uma etapa (uma entrada pendente por etapa/resposta: a mais recente vale)
+
+        Args:
+            step: Nome da etapa (ex: 'clickup_task')
+            response_id: ID da resposta
+            payload: Dados necessários para reexecutar a etapa
+            not_before: Timestamp antes do qual não tentar (ex: reabertura do circuito)
+            error: Motivo do adiamento
+
+        Returns:
+            ID da etapa na fila
+        """
+        next_attempt_at = not_before or time.time()
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('''
+                    SELECT id FROM deferred_steps
+                    WHERE step = ? AND response_id IS ? AND status = 'pending'
+                    ORDER BY id DESC LIMIT 1
+                ''', (step, response_id)).fetchone()
+                if row:
+                    step_id = row[0]
+                    conn.execute('''
+                        UPDATE deferred_steps
+                        SET payload = ?, next_attempt_at = ?, last_error = ?, updated_at = datetime('now')
+                        WHERE id = ?
+                    ''', (data, next_attempt_at, error, step_id))
+                else:
+                    cursor = conn.execute('''
+                        INSERT INTO deferred_steps (step, response_id, payload, next_attempt_at, last_error)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (step, response_id, data, next_attempt_at, error))
+                    step_id = cursor.lastrowid
+                conn.commit()
+            finally:
+                conn.close()
+        return step_id
+
+    def claim_due(self, limit: int = 50, steps: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Pega as etapas vencidas (atômico também entre processos)
+
+        Além das pendentes, reaproveita etapas 'running' cujo lease venceu
+        (o processo dono morreu no meio da reexecução).
+        """
+        now = time.time()
+        query = '''
+            SELECT id, step, response_id, payload, attempts
+            FROM deferred_steps
+            WHERE ((status = 'pending' AND next_attempt_at <= ?)
+            OR (status = 'running' AND COALESCE(lease_expires_at, 0) <= ?))
+        '''
+        params = [now, now]
+        if steps is not None:
+            if not steps:
+                return []
+            query += f" AND step IN ({', '.join('?' for _ in steps)})"
+            params.extend(steps)
+        query += " ORDER BY next_attempt_at ASC, id ASC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                rows = conn.execute(query, params).fetchall()
+                conn.executemany('''
+                    UPDATE deferred_steps
+                    SET status = 'running', lease_owner = ?, lease_expires_at = ?,
+                        updated_at = datetime('now')
+                    WHERE id = ?
+                ''', [(self.owner, now + self.lease_seconds, row[0]) for row in rows])
+                conn.commit()
+            finally:
+                conn.close()
+
+        return [
+            {
+                'id': row[0],
+                'step': row[1],
+                'response_id': row[2],
+                'payload': json.loads(row[3]) if row[3] else {},
+                'attempts': row[4]
+            }
+            for row in rows
+        ]
+
+    def renew_leases(self, step_ids: List[int]) -> int:
+        """Estende o lease das etapas que esta instância ainda vai executar"""
+        if not step_ids:
+            return 0
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                f'''
+                UPDATE deferred_steps SET lease_expires_at = ?
+                WHERE status = 'running' AND lease_owner = ? AND id IN ({', '.join('?' for _ in step_ids)})
+                ''',
+                (time.time() + self.lease_seconds, self.owner, *step_ids)
+            )
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+        return count
+
+    def _update(self, step_id: int, **fields):
+        """Grava o resultado da etapa e libera o lease"""
+        fields = {**fields, 'lease_owner': None, 'lease_expires_at': None}
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                f"UPDATE deferred_steps SET {assignments}, updated_at = datetime('now') WHERE id = ?",
+                (*fields.values(), step_id)
+            )
+            conn.commit()
+            conn.close()
+
+    def mark_done(self, step_id: int, result: Optional[Dict] = None):
+        self._update(
+            step_id,
+            status='done',
+            last_error=None,
+            result=json.dumps(result, ensure_ascii=False, default=str) if result else None
+        )
+
+    def postpone(self, step_id: int, until: float, error: Optional[str] = None):
+        """Devolve a etapa para a fila sem gastar tentativa (ex: circuito ainda aberto)"""
+        self._update(step_id, status='pending', next_attempt_at=until, last_error=error)
+
+    def mark_retry(self, step: Dict, error: str) -> bool:
+        """
+        Registra uma tentativa falha: agenda nova tentativa com backoff ou marca como falha
+
+        Returns:
+            True se a etapa volta para a fila
+        """
+        attempts = step['attempts'] + 1
+        if attempts >= self.max_attempts:
+            self._update(step['id'], status='failed', attempts=attempts, last_error=error)
+            return False
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** (attempts - 1)))
+        self._update(
+            step['id'],
+            status='pending',
+            attempts=attempts,
+            last_error=error,
+            next_attempt_at=time.time() + delay * random.uniform(0.8, 1.2)
+        )
+        return True
+
+    def mark_failed(self, step: Dict, error: str):
+        self._update(step['id'], status='failed', attempts=step['attempts'] + 1, last_error=error)
+
+    def get_pending(self, response_id: str) -> List[Dict]:
+        """Etapas ainda pendentes de uma resposta"""
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT id, step, attempts, next_attempt_at, last_error
+            FROM deferred_steps
+            WHERE response_id = ? AND status IN ('pending', 'running')
+            ORDER BY id
+        ''', (response_id,)).fetchall()
+        conn.close()
+        return [
+            {
+                'id': row[0],
+                'step': row[1],
+                'attempts': row[2],
+                'next_attempt_at': datetime.fromtimestamp(row[3]).isoformat() if row[3] else None,
+                'last_error': row[4]
+            }
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict:
+        """Retorna estatísticas da fila"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute('''
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN (status = 'pending' AND next_attempt_at <= ?)
+                        OR (status = 'running' AND COALESCE(lease_expires_at, 0) <= ?) THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'running' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'running' AND COALESCE(lease_expires_at, 0) <= ? THEN 1 ELSE 0 END)
+                FROM deferred_steps
+            ''', (now, now, now)).fetchone()
+            conn.close()
+            return {
+                'total': row[0] or 0,
+                'pending': row[1] or 0,
+                'ready': row[2] or 0,
+                'running': row[3] or 0,
+                'done': row[4] or 0,
+                'failed': row[5] or 0,
+                'expired_leases': row[6] or 0
+            }
+        except Exception as e:
+            print(f"❌ Erro ao obter estatísticas de etapas adiadas: {e}")
+            return {'total': 0, 'pending': 0, 'ready': 0, 'running': 0, 'done': 0, 'failed': 0,
+                    'expired_leases': 0}
+
+    def clear_done(self, days_old: int = 7) -> int:
+        """Remove etapas concluídas mais antigas que X dias"""
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.execute('''
+                DELETE FROM deferred_steps
+                WHERE status = 'done'
+                AND updated_at < datetime('now', '-' || ? || ' days')
+            ''', (days_old,))
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+        return count
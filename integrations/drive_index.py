@@ -0,0 +1,242 @@
+"""
+Índice local (SQLite) das pastas e arquivos do Drive criados pelo sistema
+Permite achar a pasta/PDF de uma resposta sem consultar o Drive; é mantido em dia
+de forma incremental pelos tokens de mudança da API (changes().list).
+"""
+import re
+import sqlite3
+from typing import Dict, List, Optional
+from threading import Lock
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Imovel_<id>, Imovel_<id>_<AAAAMMDD> (pastas antigas), Imovel_<id>_<AAAAMMDD_HHMMSS>.pdf,
+# Demanda_<id>_....pdf, Resposta_<id>_....txt
+_NAME_PATTERN = re.compile(
+    r'^(Imovel|Demanda|Resposta)_(?P<response_id>.+?)(?:_\d{8}(?:_\d{6})?)?(?:\.(?P<ext>pdf|txt))?$',
+    re.IGNORECASE
+)
+
+
+def parse_document_name(name: str) -> Optional[Dict]:
+    """
+    Extrai o response_id e o tipo de um nome de pasta/arquivo gerado pelo sistema
+
+    Returns:
+        {'response_id', 'prefix', 'ext'} ou None se o nome não segue o padrão
+    """
+    match = _NAME_PATTERN.match(name or '')
+    if not match:
+        return None
+    return {
+        'response_id': match.group('response_id'),
+        'prefix': match.group(1).capitalize(),
+        'ext': (match.group('ext') or '').lower() or None
+    }
+
+
+class DriveIndex:
+    """Índice de pastas/arquivos do Drive por nome, pasta pai e response_id"""
+
+    def __init__(self, db_file: str = "drive_index.db"):
+        """
+        Args:
+            db_file: Arquivo SQLite do índice
+        """
+        self.db_file = db_file
+        self.lock = Lock()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS drive_files (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    mime_type TEXT,
+                    parent_id TEXT,
+                    response_id TEXT,
+                    web_view_link TEXT,
+                    modified_time TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_drive_files_parent_name
+                ON drive_files (parent_id, name)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_drive_files_response
+                ON drive_files (response_id)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS drive_index_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar índice do Drive: {e}")
+
+    # ------------------------------------------------------------------
+    # Estado (token de mudanças)
+    # ------------------------------------------------------------------
+
+    def get_page_token(self) -> Optional[str]:
+        """Token da última leitura de mudanças (None = índice ainda não populado)"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM drive_index_state WHERE key = 'page_token'"
+        ).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def set_page_token(self, token: str):
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO drive_index_state (key, value) VALUES ('page_token', ?)",
+                (token,)
+            )
+            conn.commit()
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row(file: Dict, parent_id: Optional[str] = None):
+        parents = file.get('parents') or []
+        parsed = parse_document_name(file.get('name', ''))
+        return (
+            file['id'],
+            file.get('name', ''),
+            file.get('mimeType'),
+            parent_id or (parents[0] if parents else None),
+            parsed['response_id'] if parsed else None,
+            file.get('webViewLink'),
+            file.get('modifiedTime')
+        )
+
+    def upsert_many(self, files: List[Dict]):
+        """Grava/atualiza vários arquivos; arquivos na lixeira são removidos do índice"""
+        active = [self._row(f) for f in files if not f.get('trashed')]
+        trashed = [(f['id'],) for f in files if f.get('trashed')]
+        with self.lock:
+            conn = self._connect()
+            conn.executemany('''
+                INSERT OR REPLACE INTO drive_files
+                (id, name, mime_type, parent_id, response_id, web_view_link, modified_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', active)
+            conn.executemany("DELETE FROM drive_files WHERE id = ?", trashed)
+            conn.commit()
+            conn.close()
+
+    def upsert(self, file: Dict, parent_id: Optional[str] = None):
+        """Grava um arquivo recém-criado/atualizado (sem esperar o próximo changes().list)"""
+        if parent_id and not file.get('parents'):
+            file = {**file, 'parents': [parent_id]}
+        self.upsert_many([file])
+
+    def remove_many(self, file_ids: List[str]):
+        with self.lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM drive_files WHERE id = ?", [(i,) for i in file_ids])
+            conn.commit()
+            conn.close()
+
+    def clear(self):
+        """Apaga o índice (força nova carga completa)"""
+        with self.lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM drive_files")
+            conn.execute("DELETE FROM drive_index_state")
+            conn.commit()
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _as_dict(row) -> Dict:
+        return {
+            'id': row[0],
+            'name': row[1],
+            'mimeType': row[2],
+            'parent_id': row[3],
+            'response_id': row[4],
+            'webViewLink': row[5],
+            'modifiedTime': row[6]
+        }
+
+    def find_folder(self, name: str, parent_id: Optional[str] = None) -> Optional[Dict]:
+        """Pasta pelo nome dentro da pasta pai"""
+        conn = self._connect()
+        if parent_id:
+            row = conn.execute('''
+                SELECT id, name, mime_type, parent_id, response_id, web_view_link, modified_time
+                FROM drive_files
+                WHERE name = ? AND parent_id = ? AND mime_type = ?
+                LIMIT 1
+            ''', (name, parent_id, FOLDER_MIME_TYPE)).fetchone()
+        else:
+            row = conn.execute('''
+                SELECT id, name, mime_type, parent_id, response_id, web_view_link, modified_time
+                FROM drive_files
+                WHERE name = ? AND mime_type = ?
+                LIMIT 1
+            ''', (name, FOLDER_MIME_TYPE)).fetchone()
+        conn.close()
+        return self._as_dict(row) if row else None
+
+    def find_by_response(self, response_id: str) -> Dict:
+        """
+        Pastas e arquivos de uma resposta
+
+        Returns:
+            {'folders': [...], 'files': [...]}
+        """
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT id, name, mime_type, parent_id, response_id, web_view_link, modified_time
+            FROM drive_files
+            WHERE response_id = ?
+            ORDER BY modified_time DESC
+        ''', (response_id,)).fetchall()
+        conn.close()
+
+        items = [self._as_dict(row) for row in rows]
+        return {
+            'folders': [i for i in items if i['mimeType'] == FOLDER_MIME_TYPE],
+            'files': [i for i in items if i['mimeType'] != FOLDER_MIME_TYPE]
+        }
+
+    def find_document(self, response_id: str, mime_type: str, parent_id: Optional[str] = None) -> Optional[Dict]:
+        """Documento (PDF/texto) já enviado de uma resposta, para atualizar em vez de duplicar"""
+        for item in self.find_by_response(response_id)['files']:
+            if item['mimeType'] == mime_type and (parent_id is None or item['parent_id'] == parent_id):
+                return item
+        return None
+
+    def get_stats(self) -> Dict:
+        conn = self._connect()
+        row = conn.execute('''
+            SELECT COUNT(*), SUM(CASE WHEN mime_type = ? THEN 1 ELSE 0 END)
+            FROM drive_files
+        ''', (FOLDER_MIME_TYPE,)).fetchone()
+        conn.close()
+        return {
+            'files': (row[0] or 0) - (row[1] or 0),
+            'folders': row[1] or 0,
+            'synced': self.get_page_token() is not None
+        }
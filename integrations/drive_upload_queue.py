@@ -0,0 +1,475 @@
+"""
+Fila persistente de uploads para o Google Drive
+Tira o upload do caminho crítico do processamento: o PDF é gravado na fila (SQLite)
+e workers próprios enviam ao Drive, com novas tentativas e backoff exponencial.
+Cada upload em andamento tem um lease (dono + validade), renovado enquanto o envio
+dura; só uploads com lease vencido (processo que morreu) voltam a ser pegos.
+"""
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+from datetime import datetime
+from threading import Lock
+from config import Config
+from integrations.circuit_breaker import CircuitOpenError
+
+
+# Códigos HTTP em que vale a pena tentar de novo (limite de taxa e erros do servidor)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Colunas adicionadas depois da primeira versão da tabela
+EXTRA_COLUMNS = {
+    'lease_owner': 'TEXT',
+    'lease_expires_at': 'REAL'
+}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Indica se o erro do upload é temporário (429/5xx ou falha de rede)"""
+    resp = getattr(error, 'resp', None)
+    if resp is not None:
+        try:
+            return int(getattr(resp, 'status', 0)) in RETRYABLE_STATUS
+        except (TypeError, ValueError):
+            return False
+    # Sem resposta HTTP: timeout, conexão recusada, etc.
+    return isinstance(error, (OSError, TimeoutError, ConnectionError))
+
+
+class DriveUploadQueue:
+    """Fila de uploads do Drive com workers em background"""
+
+    def __init__(
+        self,
+        google_drive_getter: Callable[[], object],
+        db_file: str = "drive_upload_queue.db",
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None
+    ):
+        """
+        Inicializa a fila
+
+        Args:
+            google_drive_getter: Função que retorna o GoogleDriveIntegration atual
+                (as credenciais podem ser trocadas com a fila rodando)
+            db_file: Arquivo SQLite da fila
+            workers: Número de threads de upload
+            max_attempts: Tentativas antes de marcar como falha
+            backoff_seconds: Espera base entre tentativas (dobra a cada falha)
+            lease_seconds: Validade do lease de um upload em andamento
+                           (padrão: DRIVE_UPLOAD_LEASE_SECONDS; renovado a cada 1/3 do prazo)
+        """
+        self.google_drive_getter = google_drive_getter
+        self.db_file = db_file
+        self.workers = workers or Config.DRIVE_UPLOAD_WORKERS
+        self.max_attempts = max_attempts or Config.DRIVE_UPLOAD_MAX_ATTEMPTS
+        self.backoff_seconds = backoff_seconds or Config.DRIVE_UPLOAD_BACKOFF_SECONDS
+        self.lease_seconds = lease_seconds or Config.DRIVE_UPLOAD_LEASE_SECONDS
+        self.max_backoff_seconds = 900
+        self.poll_seconds = 5
+        # Identifica esta instância como dona dos leases (único entre processos e máquinas)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = Lock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._lease_thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._active = 0
+        self._leased = set()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        """Cria a tabela (uploads interrompidos voltam à fila quando o lease vence)"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS drive_uploads (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    response_id TEXT NOT NULL,
+                    is_property INTEGER DEFAULT 1,
+                    form_data TEXT,
+                    analysis TEXT,
+                    pdf_data BLOB,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL DEFAULT 0,
+                    last_error TEXT,
+                    result TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_drive_uploads_status
+                ON drive_uploads (status, next_attempt_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_drive_uploads_response
+                ON drive_uploads (response_id)
+            ''')
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(drive_uploads)").fetchall()]
+            for column, column_type in EXTRA_COLUMNS.items():
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE drive_uploads ADD COLUMN {column} {column_type}")
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar banco de dados da fila do Drive: {e}")
+
+    def enqueue(
+        self,
+        response_id: str,
+        form_data: Dict,
+        analysis: Dict,
+        pdf_bytes: Optional[bytes] = None,
+        is_property: bool = True
+    ) -> int:
+        """
+        Adiciona um upload à fila
+
+        Args:
+            response_id: ID da resposta
+            form_data: Dados do formulário
+            analysis: Análise do ChatGPT
+            pdf_bytes: PDF gerado (sem PDF, salva como texto)
+            is_property: Se True, é imóvel; se False, é demanda
+
+        Returns:
+            ID do upload na fila
+        """
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO drive_uploads
+                (response_id, is_property, form_data, analysis, pdf_data)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                response_id,
+                1 if is_property else 0,
+                json.dumps(form_data, ensure_ascii=False, default=str),
+                json.dumps(analysis, ensure_ascii=False, default=str),
+                sqlite3.Binary(pdf_bytes) if pdf_bytes else None
+            ))
+            upload_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return upload_id
+
+    def _claim_next(self) -> Optional[Dict]:
+        """
+        Pega o próximo upload vencido (atômico também entre processos)
+
+        Além dos pendentes, reaproveita uploads 'uploading' cujo lease venceu
+        (o processo dono morreu no meio do envio).
+        """
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('''
+                    SELECT id, response_id, is_property, form_data, analysis, pdf_data, attempts
+                    FROM drive_uploads
+                    WHERE (status = 'pending' AND next_attempt_at <= ?)
+                    OR (status = 'uploading' AND COALESCE(lease_expires_at, 0) <= ?)
+                    ORDER BY next_attempt_at ASC, id ASC
+                    LIMIT 1
+                ''', (now, now)).fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                conn.execute('''
+                    UPDATE drive_uploads
+                    SET status = 'uploading', lease_owner = ?, lease_expires_at = ?,
+                        updated_at = datetime('now')
+                    WHERE id = ?
+                ''', (self.owner, now + self.lease_seconds, row[0]))
+                conn.commit()
+            finally:
+                conn.close()
+            self._leased.add(row[0])
+
+        return {
+            'id': row[0],
+            'response_id': row[1],
+            'is_property': bool(row[2]),
+            'form_data': json.loads(row[3]) if row[3] else {},
+            'analysis': json.loads(row[4]) if row[4] else {},
+            'pdf_bytes': bytes(row[5]) if row[5] is not None else None,
+            'attempts': row[6]
+        }
+
+    def _update(self, upload_id: int, **fields):
+        """Grava o resultado de um envio e libera o lease"""
+        fields = {**fields, 'lease_owner': None, 'lease_expires_at': None}
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                f"UPDATE drive_uploads SET {assignments}, updated_at = datetime('now') WHERE id = ?",
+                (*fields.values(), upload_id)
+            )
+            conn.commit()
+            conn.close()
+            self._leased.discard(upload_id)
+
+    def _renew_leases(self) -> int:
+        """Estende o lease dos uploads que esta instância está enviando"""
+        with self.lock:
+            if not self._leased:
+                return 0
+            ids = list(self._leased)
+            conn = self._connect()
+            cursor = conn.execute(
+                f'''
+                UPDATE drive_uploads SET lease_expires_at = ?
+                WHERE status = 'uploading' AND lease_owner = ? AND id IN ({','.join('?' * len(ids))})
+                ''',
+                (time.time() + self.lease_seconds, self.owner, *ids)
+            )
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+        return count
+
+    def _lease_keeper(self):
+        # Depois do stop() continua enquanto houver envio em andamento
+        while not self._stopping or self._leased:
+            with self._wakeup:
+                self._wakeup.wait(self.lease_seconds / 3)
+            try:
+                self._renew_leases()
+            except Exception as e:
+                print(f"⚠️  Aviso: Erro ao renovar leases da fila do Drive: {e}")
+
+    def _backoff(self, attempts: int) -> float:
+        """Espera exponencial com jitter: base * 2^(tentativas-1), limitada"""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def process_upload(self, job: Dict) -> bool:
+        """
+        Envia um upload ao Drive e grava o resultado no registro da fila
+
+        Returns:
+            True se enviado com sucesso
+        """
+        attempts = job['attempts'] + 1
+        google_drive = self.google_drive_getter()
+        try:
+            if not google_drive:
+                raise ConnectionError("Google Drive não configurado")
+
+            document = google_drive.save_form_response_document(
+                form_data=job['form_data'],
+                analysis=job['analysis'],
+                response_id=job['response_id'],
+                is_property=job['is_property'],
+                pdf_bytes=job['pdf_bytes']
+            )
+            # Enviado: o PDF não precisa mais ficar no banco
+            self._update(
+                job['id'],
+                status='done',
+                attempts=attempts,
+                last_error=None,
+                pdf_data=None,
+                result=json.dumps({
+                    'document_id': document.get('id'),
+                    'document_url': document.get('webViewLink')
+                })
+            )
+            print(f"✅ Drive: upload de {job['response_id']} concluído")
+            return True
+
+        except CircuitOpenError as e:
+            # Drive fora do ar: volta para a fila sem gastar tentativa, até o circuito reabrir
+            self._update(
+                job['id'],
+                status='pending',
+                last_error=str(e),
+                next_attempt_at=e.retry_at
+            )
+            return False
+
+        except Exception as e:
+            if is_retryable_error(e) and attempts < self.max_attempts:
+                delay = self._backoff(attempts)
+                self._update(
+                    job['id'],
+                    status='pending',
+                    attempts=attempts,
+                    last_error=str(e),
+                    next_attempt_at=time.time() + delay
+                )
+                print(f"⚠️  Drive: upload de {job['response_id']} falhou ({e}), nova tentativa em {delay:.0f}s")
+            else:
+                self._update(job['id'], status='failed', attempts=attempts, last_error=str(e))
+                print(f"❌ Drive: upload de {job['response_id']} falhou definitivamente: {e}")
+            return False
+
+    def _worker(self):
+        while not self._stopping:
+            job = None
+            try:
+                job = self._claim_next()
+            except Exception as e:
+                print(f"⚠️  Aviso: Erro ao ler fila do Drive: {e}")
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_seconds)
+                continue
+
+            with self._wakeup:
+                self._active += 1
+            try:
+                self.process_upload(job)
+            finally:
+                with self._wakeup:
+                    self._active -= 1
+                    self._wakeup.notify_all()
+
+    def start(self):
+        """Inicia os workers de upload e a renovação dos leases (threads daemon)"""
+        if self._threads:
+            return
+        self._stopping = False
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"drive-upload-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._lease_thread = threading.Thread(target=self._lease_keeper, name='drive-upload-lease', daemon=True)
+        self._lease_thread.start()
+
+    def stop(self):
+        """Sinaliza os workers para parar (uploads em andamento terminam)"""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self._threads = []
+
+    def wait_until_idle(self, timeout: float = 300) -> bool:
+        """
+        Espera os uploads vencidos terminarem (útil em scripts que saem logo depois)
+
+        Returns:
+            True se a fila ficou sem uploads prontos para envio dentro do prazo
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = self.get_stats()
+            with self._wakeup:
+                busy = self._active > 0
+            if not busy and stats['ready'] == 0:
+                return True
+            with self._wakeup:
+                self._wakeup.wait(min(1.0, max(0.0, deadline - time.monotonic())))
+        return False
+
+    def get_status(self, response_id: str) -> Optional[Dict]:
+        """Status do upload mais recente de uma resposta"""
+        conn = self._connect()
+        row = conn.execute('''
+            SELECT id, status, attempts, last_error, result, next_attempt_at, created_at, updated_at
+            FROM drive_uploads
+            WHERE response_id = ?
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (response_id,)).fetchone()
+        conn.close()
+
+        if not row:
+            return None
+        return {
+            'upload_id': row[0],
+            'response_id': response_id,
+            'status': row[1],
+            'attempts': row[2],
+            'last_error': row[3],
+            **(json.loads(row[4]) if row[4] else {}),
+            'next_attempt_at': (
+                datetime.fromtimestamp(row[5]).isoformat() if row[1] == 'pending' and row[5] else None
+            ),
+            'created_at': row[6],
+            'updated_at': row[7]
+        }
+
+    def get_stats(self) -> Dict:
+        """Retorna estatísticas da fila"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute('''
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN (status = 'pending' AND next_attempt_at <= ?)
+                        OR (status = 'uploading' AND COALESCE(lease_expires_at, 0) <= ?) THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'uploading' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN status = 'uploading' AND COALESCE(lease_expires_at, 0) <= ? THEN 1 ELSE 0 END)
+                FROM drive_uploads
+            ''', (now, now, now)).fetchone()
+            conn.close()
+            return {
+                'total': row[0] or 0,
+                'pending': row[1] or 0,
+                'ready': row[2] or 0,
+                'uploading': row[3] or 0,
+                'done': row[4] or 0,
+                'failed': row[5] or 0,
+                'expired_leases': row[6] or 0,
+                'workers': len(self._threads)
+            }
+        except Exception as e:
+            print(f"❌ Erro ao obter estatísticas da fila do Drive: {e}")
+            return {'total': 0, 'pending': 0, 'ready': 0, 'uploading': 0, 'done': 0, 'failed': 0,
+                    'expired_leases': 0, 'workers': len(self._threads)}
+
+    def retry_failed(self) -> int:
+        """Devolve para a fila os uploads que falharam definitivamente"""
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.execute('''
+                UPDATE drive_uploads
+                SET status = 'pending', attempts = 0, next_attempt_at = 0, updated_at = datetime('now')
+                WHERE status = 'failed'
+            ''')
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return count
+
+    def clear_done(self, days_old: int = 7) -> int:
+        """Remove uploads concluídos mais antigos que X dias"""
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.execute('''
+                DELETE FROM drive_uploads
+                WHERE status = 'done'
+                AND updated_at < datetime('now', '-' || ? || ' days')
+            ''', (days_old,))
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+        return count
@@ -0,0 +1,258 @@
+"""
+Geração do feed do Chaves na Mão e dos sub-feeds por categoria
+Além do feed completo, mantém sub-feeds pré-gerados por categoria (linha de
+produto do formulário), por tipo de transação e por categoria + transação, em
+feeds/<nome>.xml. Quando um imóvel muda, só os sub-feeds dos quais ele faz (ou
+fazia) parte são gerados de novo.
+Cada arquivo é gravado de forma atômica (temporário + os.replace) junto com uma
+cópia .gz para a rota HTTP. A geração é protegida por um lock de arquivo, então
+o servidor web e o agendador nunca escrevem o feed ao mesmo tempo.
+Com verificação de fotos, as fotos quebradas (segundo o cache do
+PhotoURLChecker) são retiradas do feed ou apenas sinalizadas.
+"""
+import gzip
+import os
+import re
+import threading
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config import Config
+from integrations.chaves_na_mao_fields import as_list
+from integrations.chaves_na_mao_xml_generator import ChavesNaMaoXMLGenerator
+from integrations.file_lock import interprocess_lock
+from integrations.photo_checker import PhotoURLChecker
+from integrations.property_store import PropertyStore, property_key
+
+
+# Código de transação do feed -> nome usado nos sub-feeds
+TRANSACTION_SLUGS = {'V': 'venda', 'L': 'locacao'}
+
+FEED_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]*$')
+
+
+def transaction_slugs(property_data: Dict) -> List[str]:
+    """Tipos de transação do imóvel (transacao e transacao2) como 'venda'/'locacao'"""
+    slugs = []
+    for field in ('transacao', 'transacao2'):
+        code = str(property_data.get(field) or '').strip()[:1].upper()
+        slug = TRANSACTION_SLUGS.get(code)
+        if slug and slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def photo_urls(property_data: Dict) -> List[str]:
+    """URLs das fotos do imóvel (fotos como URL ou como {'url', 'data_atualizacao'})"""
+    urls = []
+    for foto in as_list(property_data.get('fotos') or property_data.get('foto_urls')):
+        url = foto.get('url') if isinstance(foto, dict) else foto
+        if url:
+            urls.append(str(url).strip())
+    return urls
+
+
+def sub_feed_names(property_data: Dict) -> Set[str]:
+    """Sub-feeds dos quais o imóvel faz parte: <categoria>, <transacao> e <categoria>-<transacao>"""
+    category = property_data.get('categoria')
+    names = set()
+    if category:
+        names.add(category)
+    for slug in transaction_slugs(property_data):
+        names.add(slug)
+        if category:
+            names.add(f"{category}-{slug}")
+    return names
+
+
+class FeedBuilder:
+    """Gera o feed completo e os sub-feeds a partir do PropertyStore"""
+
+    def __init__(
+        self,
+        store: PropertyStore,
+        feed_file: Optional[str] = None,
+        feeds_dir: Optional[str] = None,
+        photo_checker: Optional[PhotoURLChecker] = None,
+        dead_photo_action: Optional[str] = None
+    ):
+        """
+        Args:
+            store: Imóveis do feed
+            feed_file: Feed completo (padrão: CHAVES_NA_MAO_FEED_FILE)
+            feeds_dir: Pasta dos sub-feeds (padrão: CHAVES_NA_MAO_FEEDS_DIR)
+            photo_checker: Cache de verificação das fotos (None = fotos não são verificadas)
+            dead_photo_action: 'exclude' (tira a foto quebrada do feed) ou 'flag' (mantém
+                               e só lista em photo_report; padrão: PHOTO_CHECK_DEAD_ACTION)
+        """
+        self.store = store
+        self.feed_file = feed_file or Config.CHAVES_NA_MAO_FEED_FILE
+        self.feeds_dir = feeds_dir or Config.CHAVES_NA_MAO_FEEDS_DIR
+        self.generator = ChavesNaMaoXMLGenerator()
+        self.photo_checker = photo_checker
+        self.dead_photo_action = (dead_photo_action or Config.PHOTO_CHECK_DEAD_ACTION).lower()
+        self.lock = Lock()
+        # Imóveis que usam cada URL de foto (para gerar de novo quando a verificação muda)
+        self._photo_owners: Dict[str, Set[str]] = {}
+        # Sub-feeds de cada imóvel na última geração (None = gerar todos na próxima)
+        self._memberships: Optional[Dict[str, Set[str]]] = None
+        # mtime do feed na última geração deste processo (outro processo gerou = gera tudo)
+        self._last_written_mtime: Optional[float] = None
+
+    @staticmethod
+    def all_sub_feed_names() -> Set[str]:
+        """Sub-feeds que sempre existem (mesmo vazios): categorias configuradas e transações"""
+        names = set(TRANSACTION_SLUGS.values())
+        for category in Config.get_feed_categories():
+            names.add(category)
+            names.update(f"{category}-{slug}" for slug in TRANSACTION_SLUGS.values())
+        return names
+
+    def sub_feed_path(self, name: str) -> Optional[str]:
+        """Caminho do sub-feed (None se o nome não for válido)"""
+        if not FEED_NAME_PATTERN.match(name):
+            return None
+        return os.path.join(self.feeds_dir, f"{name}.xml")
+
+    @staticmethod
+    def gzip_path(path: str) -> str:
+        """Cópia pré-comprimida do feed servida pela rota HTTP"""
+        return f"{path}.gz"
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        """Grava em arquivo temporário na mesma pasta e troca com os.replace (leitor nunca vê arquivo pela metade)"""
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _write(self, path: str, properties: List[Dict]):
+        data = self.generator.generate_feed_xml(properties).encode('utf-8')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._atomic_write(path, data)
+        self._atomic_write(self.gzip_path(path), gzip.compress(data, compresslevel=6, mtime=0))
+
+    @staticmethod
+    def _owners_of(properties: List[Dict]) -> Dict[str, Set[str]]:
+        owners: Dict[str, Set[str]] = {}
+        for property_data in properties:
+            key = property_key(property_data)
+            for url in photo_urls(property_data):
+                owners.setdefault(url, set()).add(key)
+        return owners
+
+    def _current_photo_owners(self) -> Dict[str, Set[str]]:
+        """Dono de cada foto na última geração (ou no banco, se este processo ainda não gerou)"""
+        if not self._photo_owners:
+            self._photo_owners = self._owners_of(self.store.get_all())
+        return self._photo_owners
+
+    def _apply_photo_checks(self, properties: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Consulta o cache das fotos (sem requisições) e retira as quebradas se a ação for 'exclude'
+
+        Returns:
+            (imóveis para o feed, quantidade de fotos quebradas)
+        """
+        owners = self._photo_owners = self._owners_of(properties)
+        dead = self.photo_checker.dead_urls(owners)
+        if not dead or self.dead_photo_action != 'exclude':
+            return properties, len(dead)
+
+        filtered = []
+        for property_data in properties:
+            urls = photo_urls(property_data)
+            if any(url in dead for url in urls):
+                fotos = [
+                    foto for foto in as_list(property_data.get('fotos') or property_data.get('foto_urls'))
+                    if str(foto.get('url') if isinstance(foto, dict) else foto).strip() not in dead
+                ]
+                property_data = {**property_data, 'fotos': fotos, 'foto_urls': []}
+            filtered.append(property_data)
+        return filtered, len(dead)
+
+    def keys_with_photos(self, urls: Iterable[str]) -> Set[str]:
+        """Imóveis publicados que usam alguma das URLs"""
+        owners = self._current_photo_owners()
+        keys = set()
+        for url in urls:
+            keys |= owners.get(url, set())
+        return keys
+
+    def photo_report(self) -> Dict[str, List[str]]:
+        """Fotos quebradas de cada imóvel publicado (segundo o cache)"""
+        if not self.photo_checker:
+            return {}
+        owners = self._current_photo_owners()
+        dead = self.photo_checker.dead_urls(owners, schedule_stale=False)
+        report: Dict[str, List[str]] = {}
+        for url in sorted(dead):
+            for key in owners.get(url, ()):
+                report.setdefault(key, []).append(url)
+        return report
+
+    def _feed_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.feed_file)
+        except OSError:
+            return None
+
+    def publish(self, changed_keys: Optional[Iterable[str]] = None, feed_file: Optional[str] = None) -> Dict:
+        """
+        Gera o feed completo e os sub-feeds afetados
+
+        Args:
+            changed_keys: Imóveis que mudaram (None = gera todos os sub-feeds)
+            feed_file: Feed completo (padrão: o do construtor)
+
+        Returns:
+            {'properties', 'feed_file', 'sub_feeds', 'dead_photos'} com os sub-feeds gerados
+        """
+        feed_file = feed_file or self.feed_file
+        with self.lock, interprocess_lock(f"{self.feed_file}.lock"):
+            if self._memberships is not None and self._feed_mtime() != self._last_written_mtime:
+                # Outro processo (ex: agendador) gerou o feed depois de nós: os sub-feeds
+                # de cada imóvel guardados aqui podem estar desatualizados
+                self._memberships = None
+            properties = self.store.get_all()
+            dead_photos = 0
+            if self.photo_checker:
+                properties, dead_photos = self._apply_photo_checks(properties)
+            memberships = {}
+            groups: Dict[str, List[Dict]] = {}
+            for property_data in properties:
+                names = sub_feed_names(property_data)
+                memberships[property_key(property_data)] = names
+                for name in names:
+                    groups.setdefault(name, []).append(property_data)
+
+            if changed_keys is None or self._memberships is None:
+                affected = self.all_sub_feed_names() | set(groups)
+                if self._memberships:
+                    affected.update(*self._memberships.values())
+            else:
+                affected = set()
+                for key in changed_keys:
+                    affected |= memberships.get(key, set()) | self._memberships.get(key, set())
+
+            self._write(feed_file, properties)
+            os.makedirs(self.feeds_dir, exist_ok=True)
+            for name in affected:
+                path = self.sub_feed_path(name)
+                if path:
+                    self._write(path, groups.get(name, []))
+            self._memberships = memberships
+            self._last_written_mtime = self._feed_mtime()
+
+        return {
+            'properties': len(properties),
+            'feed_file': feed_file,
+            'sub_feeds': sorted(affected),
+            'dead_photos': dead_photos
+        }
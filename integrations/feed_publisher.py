@@ -0,0 +1,171 @@
+"""
+Publicação do feed do Chaves na Mão por um único escritor
+As threads que processam leads não escrevem mais o feed: gravam o imóvel no
+banco e pedem uma publicação. Uma thread dedicada junta os pedidos de uma janela
+curta (CHAVES_NA_MAO_FEED_COALESCE_SECONDS), gera o feed uma vez e grava de forma
+atômica (arquivo temporário + rename), com cópia gzip ao lado para a rota HTTP.
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+from config import Config
+from integrations.feed_builder import FeedBuilder
+from integrations.property_store import property_key
+
+
+class FeedPublisher:
+    """Thread única que junta os pedidos de publicação e gera o feed"""
+
+    def __init__(self, builder: FeedBuilder, coalesce_seconds: Optional[float] = None):
+        """
+        Args:
+            builder: Gerador do feed e dos sub-feeds
+            coalesce_seconds: Janela para juntar pedidos antes de gerar
+                              (padrão: CHAVES_NA_MAO_FEED_COALESCE_SECONDS)
+        """
+        self.builder = builder
+        self.store = builder.store
+        self.coalesce_seconds = (
+            Config.CHAVES_NA_MAO_FEED_COALESCE_SECONDS if coalesce_seconds is None else coalesce_seconds
+        )
+        self._cond = threading.Condition()
+        self._pending_keys: Set[str] = set()
+        self._full = False
+        self._requested = 0
+        self._published = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # True quando a thread atual já decidiu sair (decidido sob _cond)
+        self._exiting = False
+        self.last_result: Optional[Dict] = None
+        self.stats = {
+            'requests': 0,
+            'publishes': 0,
+            'errors': 0,
+            'last_error': None,
+            'last_published_at': None,
+            'last_publish_seconds': None
+        }
+
+    def start(self):
+        """Inicia a thread de publicação (daemon); nunca cria uma segunda enquanto a atual segue viva"""
+        with self._cond:
+            self._stopping = False
+            if self._thread and self._thread.is_alive() and not self._exiting:
+                return
+            self._exiting = False
+            self._thread = threading.Thread(target=self._worker, name='feed-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Para a thread e espera ela sair (a publicação em andamento termina)
+
+        Enquanto a thread antiga estiver viva a referência é mantida: um start()
+        seguinte reaproveita essa thread em vez de criar um segundo escritor.
+        """
+        self._stopping = True
+        with self._cond:
+            self._cond.notify_all()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+        if not thread or not thread.is_alive():
+            self._thread = None
+
+    def request(self, changed_keys: Optional[Iterable[str]] = None) -> int:
+        """
+        Pede uma publicação (não bloqueia)
+
+        Args:
+            changed_keys: Imóveis que mudaram (None = todos os sub-feeds)
+
+        Returns:
+            Número do pedido, para wait()
+        """
+        self.start()
+        with self._cond:
+            if changed_keys is None:
+                self._full = True
+            else:
+                self._pending_keys.update(changed_keys)
+            self._requested += 1
+            self.stats['requests'] += 1
+            ticket = self._requested
+            self._cond.notify_all()
+        return ticket
+
+    def upsert(self, property_data: Dict) -> bool:
+        """
+        Grava o imóvel, aplica o ciclo de vida do feed e pede a publicação
+
+        Returns:
+            True se o imóvel é novo ou mudou
+        """
+        changed = self.store.upsert(property_data)
+        changed_keys = [property_key(property_data)] if changed else []
+        changed_keys += self.store.enforce_policy()['changed_keys']
+        if changed_keys:
+            self.request(changed_keys)
+        return changed
+
+    def wait(self, ticket: int, timeout: Optional[float] = None) -> bool:
+        """Espera o pedido ser publicado; True se publicou dentro do prazo"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._published >= ticket, timeout)
+
+    def publish(self, changed_keys: Optional[Iterable[str]] = None, timeout: float = 300) -> Optional[Dict]:
+        """
+        Pede a publicação e espera por ela (reconstrução, remoção manual)
+
+        Returns:
+            Resultado desta publicação, ou {'error': ...} se o prazo acabar antes
+            (last_result seria de uma publicação anterior)
+        """
+        ticket = self.request(changed_keys)
+        if not self.wait(ticket, timeout):
+            return {'error': f"timeout: feed não publicado em {timeout:.0f}s (segue na fila)"}
+        return self.last_result
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._requested > self._published or self._stopping)
+                if self._stopping:
+                    self._exiting = True
+                    return
+
+            # Janela curta: pedidos de leads simultâneos saem numa única geração
+            if self.coalesce_seconds:
+                time.sleep(self.coalesce_seconds)
+
+            with self._cond:
+                changed_keys = None if self._full else set(self._pending_keys)
+                self._full = False
+                self._pending_keys.clear()
+                ticket = self._requested
+
+            start = time.perf_counter()
+            try:
+                result = self.builder.publish(changed_keys)
+                self.stats['publishes'] += 1
+                self.stats['last_published_at'] = time.time()
+            except Exception as e:
+                result = {'error': str(e)}
+                self.stats['errors'] += 1
+                self.stats['last_error'] = str(e)[:300]
+                print(f"❌ Erro ao publicar feed do Chaves na Mão: {e}")
+            self.stats['last_publish_seconds'] = round(time.perf_counter() - start, 3)
+
+            with self._cond:
+                self.last_result = result
+                self._published = ticket
+                self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {
+                **self.stats,
+                'pending': self._requested - self._published,
+                'coalesce_seconds': self.coalesce_seconds
+            }
@@ -0,0 +1,37 @@
+"""
+Lock exclusivo entre processos por arquivo de lock
+Usado onde o servidor web e o agendador gravam os mesmos arquivos (feed do
+Chaves na Mão, estado dos watches do Forms). Só depende da biblioteca padrão.
+"""
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def interprocess_lock(path: str):
+    """Lock exclusivo entre processos (arquivo de lock; fcntl no Linux, msvcrt no Windows)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK desiste depois de ~10s: tenta de novo
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,244 @@
+"""
+Cache de estrutura (schema) dos formulários Google Forms
+Mapeia os IDs das perguntas para nomes de campos usados pelo sistema
+(nome, telefone, valor, quartos...) uma única vez por revisão do formulário
+"""
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, Iterable, Optional
+from datetime import datetime
+from threading import Lock
+from config import Config
+
+
+# Palavras-chave (sem acento, minúsculas) -> campo canônico.
+# A ordem importa: termos mais específicos vêm antes dos genéricos.
+FIELD_KEYWORDS = [
+    ('area_total', ['area total', 'metragem total']),
+    ('area_util', ['area util', 'area privativa', 'metragem util']),
+    ('valor_condominio', ['valor do condominio', 'taxa de condominio']),
+    ('valor_iptu', ['iptu']),
+    ('valor_locacao', ['valor do aluguel', 'valor da locacao', 'valor de locacao']),
+    ('tipo_imovel', ['tipo de imovel', 'tipo do imovel']),
+    ('conservacao', ['conservacao']),
+    ('telefone', ['telefone', 'whatsapp', 'celular']),
+    ('email', ['e-mail', 'email']),
+    ('nome', ['nome']),
+    ('fotos', ['foto', 'imagem', 'imagens']),
+    ('suites', ['suite']),
+    ('quartos', ['quarto', 'dormitorio']),
+    ('banheiro', ['banheiro']),
+    ('garagem', ['garagem', 'vaga']),
+    ('orcamento', ['orcamento']),
+    ('valor', ['valor', 'preco']),
+    ('cep', ['cep']),
+    ('bairro', ['bairro']),
+    ('cidade', ['cidade', 'municipio']),
+    ('estado', ['estado', 'uf']),
+    ('endereco', ['endereco', 'logradouro', 'rua']),
+    ('numero', ['numero']),
+    ('localizacao', ['localizacao', 'regiao']),
+    ('transacao', ['transacao', 'venda ou locacao', 'venda ou aluguel']),
+    ('titulo', ['titulo']),
+    ('observacoes', ['observac', 'descricao', 'detalhes']),
+]
+
+
+def _normalize(text: str) -> str:
+    """Remove acentos e deixa o texto em minúsculas"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def canonical_field_name(title: str) -> str:
+    """
+    Converte o título de uma pergunta no nome de campo canônico
+
+    Args:
+        title: Título da pergunta no formulário
+
+    Returns:
+        Nome canônico (ex: 'telefone') ou o título em snake_case se não reconhecido
+    """
+    normalized = _normalize(title)
+    for field, keywords in FIELD_KEYWORDS:
+        for keyword in keywords:
+            if re.search(r'\b' + re.escape(keyword), normalized):
+                return field
+    slug = re.sub(r'[^a-z0-9]+', '_', normalized).strip('_')
+    return slug or 'campo'
+
+
+class FormSchemaCache:
+    """Cache persistente do schema dos formulários (question_id -> campo)"""
+
+    def __init__(self, cache_file: str = "form_schemas.json", failure_ttl_seconds: Optional[float] = None):
+        """
+        Inicializa o cache
+
+        Args:
+            cache_file: Arquivo JSON onde os schemas são persistidos
+            failure_ttl_seconds: Tempo em que uma falha do forms().get é lembrada
+                                 (padrão: FORM_SCHEMA_FAILURE_TTL_SECONDS)
+        """
+        self.cache_file = cache_file
+        self.failure_ttl_seconds = (
+            Config.FORM_SCHEMA_FAILURE_TTL_SECONDS if failure_ttl_seconds is None else failure_ttl_seconds
+        )
+        self.lock = Lock()
+        self._schemas = self._load()
+        # form_id -> (tentar de novo a partir de, erro): evita uma chamada por resposta com a API negando acesso
+        self._failures: Dict[str, tuple] = {}
+
+    def _load(self) -> Dict:
+        """Carrega schemas salvos em disco"""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao carregar cache de schemas: {e}")
+        return {}
+
+    def _save(self):
+        """Salva schemas em disco"""
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self._schemas, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao salvar cache de schemas: {e}")
+
+    def get(self, form_id: str) -> Optional[Dict]:
+        """Retorna o schema em cache de um formulário (ou None)"""
+        with self.lock:
+            return self._schemas.get(form_id)
+
+    def covers(self, form_id: str, question_ids: Iterable[str]) -> bool:
+        """Indica se o schema em cache conhece todas as perguntas informadas"""
+        schema = self.get(form_id)
+        if not schema:
+            return False
+        questions = schema.get('questions', {})
+        return all(question_id in questions for question_id in question_ids)
+
+    def invalidate(self, form_id: str):
+        """Descarta o schema de um formulário (ex: formulário editado)"""
+        with self.lock:
+            self._failures.pop(form_id, None)
+            if self._schemas.pop(form_id, None) is not None:
+                self._save()
+
+    def record_failure(self, form_id: str, error: Exception):
+        """Lembra por failure_ttl_seconds que a busca do formulário falhou (ex: 403)"""
+        with self.lock:
+            self._failures[form_id] = (time.time() + self.failure_ttl_seconds, str(error)[:300])
+
+    def recent_failure(self, form_id: str) -> Optional[str]:
+        """Erro da última busca, se ainda estiver dentro da janela de falha"""
+        with self.lock:
+            failure = self._failures.get(form_id)
+            if not failure:
+                return None
+            if time.time() >= failure[0]:
+                del self._failures[form_id]
+                return None
+            return failure[1]
+
+    def fallback(self, form_id: str, field_overrides: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Schema usado enquanto o formulário não pode ser buscado
+
+        Usa o schema em cache (mesmo desatualizado) e completa com o mapeamento
+        manual do forms_config.json; perguntas desconhecidas ficam com o question_id.
+        """
+        cached = self.get(form_id)
+        if not field_overrides:
+            return cached
+        questions = dict(cached.get('questions', {})) if cached else {}
+        for question_id, field in field_overrides.items():
+            questions[question_id] = {**questions.get(question_id, {'title': '', 'kind': 'text'}), 'field': field}
+        return {**(cached or {'revision_id': None, 'title': ''}), 'questions': questions}
+
+    def store(self, form_id: str, form: Dict, field_overrides: Optional[Dict] = None) -> Dict:
+        """
+        Monta e salva o schema a partir do retorno de forms().get
+
+        Args:
+            form_id: ID do formulário
+            form: Definição completa do formulário retornada pela API
+            field_overrides: Mapeamento manual question_id -> campo (forms_config.json)
+
+        Returns:
+            Schema montado
+        """
+        with self.lock:
+            self._failures.pop(form_id, None)
+            previous = self._schemas.get(form_id)
+            if previous and previous.get('revision_id') == form.get('revisionId') and not field_overrides:
+                # Mesma revisão: só atualiza a data da verificação
+                previous['checked_at'] = datetime.now().isoformat()
+                self._save()
+                return previous
+
+            schema = {
+                'revision_id': form.get('revisionId'),
+                'title': form.get('info', {}).get('title', ''),
+                'fetched_at': datetime.now().isoformat(),
+                'checked_at': datetime.now().isoformat(),
+                'questions': self._build_questions(form, field_overrides or {})
+            }
+            self._schemas[form_id] = schema
+            self._save()
+            return schema
+
+    def _build_questions(self, form: Dict, field_overrides: Dict) -> Dict:
+        """Extrai as perguntas do formulário e define o campo de cada uma"""
+        questions = {}
+        used_fields = set(field_overrides.values())
+
+        for item in form.get('items', []):
+            item_title = item.get('title', '')
+            entries = []
+
+            question = item.get('questionItem', {}).get('question')
+            if question:
+                entries.append((question, item_title))
+
+            # Grades (questionGroupItem): uma pergunta por linha
+            for row_question in item.get('questionGroupItem', {}).get('questions', []):
+                row_title = row_question.get('rowQuestion', {}).get('title', '')
+                entries.append((row_question, f"{item_title} {row_title}".strip()))
+
+            for question, title in entries:
+                question_id = question.get('questionId')
+                if not question_id:
+                    continue
+
+                if 'fileUploadQuestion' in question:
+                    kind = 'file'
+                elif question.get('choiceQuestion', {}).get('type') == 'CHECKBOX':
+                    kind = 'multi'
+                else:
+                    kind = 'text'
+
+                field = field_overrides.get(question_id)
+                if not field:
+                    field = 'fotos' if kind == 'file' and 'fotos' not in used_fields else canonical_field_name(title)
+                    # Evita que duas perguntas disputem o mesmo campo
+                    if field in used_fields:
+                        suffix = 2
+                        while f"{field}_{suffix}" in used_fields:
+                            suffix += 1
+                        field = f"{field}_{suffix}"
+                    used_fields.add(field)
+
+                questions[question_id] = {
+                    'field': field,
+                    'title': title,
+                    'kind': kind
+                }
+
+        return questions
@@ -0,0 +1,229 @@
+"""
+Coordenador de sincronização paralela dos formulários Google Forms
+Busca todos os formulários em paralelo e processa as respostas no pool compartilhado
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+from config import Config
+
+
+def next_watermark(
+    upper: Optional[str],
+    last_sync: Optional[str],
+    done: Dict[str, str],
+    results: List[Dict]
+) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    Calcula a nova marca d'água sem passar por cima de respostas com falha
+
+    A marca d'água fica logo antes da resposta com falha mais antiga, para que
+    ela volte na próxima busca (o filtro do Forms é lastSubmittedTime > marca).
+    As respostas de sucesso que ficarem depois da marca são lembradas e puladas.
+
+    Args:
+        upper: Até onde avançar se nada falhar
+        last_sync: Marca d'água atual
+        done: {response_id: submission_time} já processados depois da marca atual
+        results: Resultados do process_form_response (com submission_time)
+
+    Returns:
+        (nova marca d'água, {response_id: submission_time} já processados depois dela)
+    """
+    failed = [r for r in results if not r.get('success')]
+    if not failed:
+        return upper or last_sync, {}
+
+    failed_times = [r.get('submission_time') for r in failed]
+    if not all(failed_times):
+        # Sem o horário da resposta não há como posicionar a marca: fica onde estava
+        watermark = last_sync
+    else:
+        earliest = datetime.fromisoformat(min(failed_times).replace('Z', '+00:00'))
+        watermark = (earliest - timedelta(microseconds=1)).isoformat().replace('+00:00', 'Z')
+        if upper:
+            watermark = min(watermark, upper)
+        if last_sync:
+            watermark = max(watermark, last_sync)
+
+    done = {
+        response_id: submitted for response_id, submitted in done.items()
+        if not watermark or submitted > watermark
+    }
+    for result in results:
+        submitted = result.get('submission_time')
+        if result.get('success') and result.get('response_id') and submitted and (not watermark or submitted > watermark):
+            done[result['response_id']] = submitted
+    return watermark, done
+
+
+class FormSyncCoordinator:
+    """Sincroniza vários formulários ao mesmo tempo respeitando a cota da API do Forms"""
+
+    def __init__(self, orchestrator, max_concurrent_fetches: Optional[int] = None):
+        """
+        Inicializa o coordenador
+
+        Args:
+            orchestrator: Instância do IntegrationOrchestrator (fornece Forms e o pool de workers)
+            max_concurrent_fetches: Máximo de chamadas simultâneas à API do Forms
+        """
+        self.orchestrator = orchestrator
+        self.max_concurrent_fetches = max_concurrent_fetches or Config.GOOGLE_FORMS_MAX_CONCURRENT
+        # Cota compartilhada por todas as sincronizações deste coordenador
+        self.forms_quota = threading.BoundedSemaphore(self.max_concurrent_fetches)
+
+    def _fetch_form(self, form: Dict, last_sync: Optional[str]) -> Dict:
+        """Busca e formata as novas respostas de um formulário (respeitando a cota)"""
+        google_forms = self.orchestrator.google_forms
+        with self.forms_quota:
+            start = time.perf_counter()
+            responses = google_forms.get_new_responses(form['id'], last_sync)
+            formatted = [google_forms.format_response_data(resp, form['id']) for resp in responses]
+            fetch_seconds = time.perf_counter() - start
+
+        return {
+            'responses': formatted,
+            'fetch_seconds': fetch_seconds
+        }
+
+    def _process_response(self, response: Dict, process_options: Dict) -> Dict:
+        """Processa uma resposta medindo o tempo gasto"""
+        start = time.perf_counter()
+        try:
+            result = self.orchestrator.process_form_response(response, **process_options)
+        except Exception as e:
+            result = {
+                'response_id': response.get('response_id'),
+                'success': False,
+                'errors': [str(e)]
+            }
+        result['processing_seconds'] = round(time.perf_counter() - start, 3)
+        # Usado pelo agendador para não avançar a marca d'água além de respostas com falha
+        result.setdefault('submission_time', response.get('submission_time'))
+        return result
+
+    def sync_forms(
+        self,
+        forms: Optional[List[Dict]] = None,
+        last_sync: Optional[str] = None,
+        process_options: Optional[Dict] = None,
+        skip_response_ids: Optional[Iterable[str]] = None
+    ) -> Dict:
+        """
+        Sincroniza os formulários em paralelo
+
+        As respostas de cada formulário entram na fila de trabalho assim que
+        a busca termina, sem esperar pelos demais formulários.
+
+        Args:
+            forms: Lista de formulários ({'id', 'name'}); usa forms_config.json se não fornecida
+            last_sync: Timestamp da última sincronização (ISO format)
+            process_options: Opções repassadas ao process_form_response
+            skip_response_ids: Respostas já processadas com sucesso (não são processadas de novo)
+
+        Returns:
+            Relatório agregado com tempos por formulário
+        """
+        if not self.orchestrator.google_forms:
+            raise ValueError("Google Forms não inicializado. Configure as credenciais primeiro.")
+
+        if forms is None:
+            forms = Config.get_forms_config().get('forms', [])
+        process_options = process_options or {}
+        skip_response_ids = set(skip_response_ids or ())
+
+        started = time.perf_counter()
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'total_forms': len(forms),
+            'forms_processed': 0,
+            'total_responses': 0,
+            'successful': 0,
+            'failed': 0,
+            'skipped': 0,
+            'form_results': [],
+            'results': [],
+            'errors': []
+        }
+
+        if not forms:
+            report['elapsed_seconds'] = 0.0
+            return report
+
+        form_reports = {}
+        work_futures = {}
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(forms), self.max_concurrent_fetches),
+            thread_name_prefix='forms-fetch'
+        ) as fetch_pool:
+            fetch_futures = {
+                fetch_pool.submit(self._fetch_form, form, last_sync): form
+                for form in forms
+            }
+
+            for future in as_completed(fetch_futures):
+                form = fetch_futures[future]
+                form_id = form.get('id')
+                form_name = form.get('name', 'Unknown')
+
+                try:
+                    fetched = future.result()
+                except Exception as e:
+                    report['errors'].append({
+                        'form_id': form_id,
+                        'form_name': form_name,
+                        'error': str(e)
+                    })
+                    continue
+
+                form_reports[form_id] = {
+                    'form_id': form_id,
+                    'form_name': form_name,
+                    'responses_found': len(fetched['responses']),
+                    'responses_processed': 0,
+                    'successful': 0,
+                    'failed': 0,
+                    'fetch_seconds': round(fetched['fetch_seconds'], 3),
+                    'processing_seconds': 0.0,
+                    'success': True
+                }
+                report['forms_processed'] += 1
+
+                # Junta as respostas na fila única do pool compartilhado
+                for response in fetched['responses']:
+                    if response.get('response_id') in skip_response_ids:
+                        report['skipped'] += 1
+                        continue
+                    response.setdefault('form_id', form_id)
+                    work_future = self.orchestrator.executor.submit(
+                        self._process_response, response, process_options
+                    )
+                    work_futures[work_future] = form_id
+
+        for future in as_completed(work_futures):
+            form_report = form_reports[work_futures[future]]
+            result = future.result()
+            report['results'].append(result)
+
+            form_report['responses_processed'] += 1
+            form_report['processing_seconds'] = round(
+                form_report['processing_seconds'] + result['processing_seconds'], 3
+            )
+            if result.get('success'):
+                form_report['successful'] += 1
+                report['successful'] += 1
+            else:
+                form_report['failed'] += 1
+                report['failed'] += 1
+            report['total_responses'] += 1
+
+        # Mantém a ordem do forms_config.json no relatório
+        report['form_results'] = [
+            form_reports[form.get('id')] for form in forms if form.get('id') in form_reports
+        ]
+        report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        return report
@@ -0,0 +1,334 @@
+"""
+Ingestão push do Google Forms via watches (Forms API + Cloud Pub/Sub)
+Substitui o polling: o Google avisa quando há novas respostas e buscamos só o delta.
+O estado (watches e marcas d'água) é compartilhado pelo servidor web, que ingere as
+notificações, e pelo agendador, único responsável por registrar e renovar os watches.
+"""
+import base64
+import json
+import os
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from config import Config
+from integrations.file_lock import interprocess_lock
+
+
+EVENT_TYPES = ('RESPONSES', 'SCHEMA')
+
+
+def build_pubsub_envelope(
+    form_id: str,
+    event_type: str = 'RESPONSES',
+    watch_id: str = 'local-watch',
+    message_id: Optional[str] = None
+) -> Dict:
+    """
+    Monta um envelope no formato de push do Pub/Sub (usado também pelo simulador local)
+
+    Args:
+        form_id: ID do formulário
+        event_type: 'RESPONSES' ou 'SCHEMA'
+        watch_id: ID do watch
+        message_id: ID da mensagem (gerado se não fornecido)
+
+    Returns:
+        Envelope JSON igual ao enviado pela assinatura push do Pub/Sub
+    """
+    now = datetime.now(timezone.utc)
+    return {
+        'message': {
+            'attributes': {
+                'formId': form_id,
+                'watchId': watch_id,
+                'eventType': event_type
+            },
+            'data': base64.b64encode(b'').decode('ascii'),
+            'messageId': message_id or now.strftime('%Y%m%d%H%M%S%f'),
+            'publishTime': now.isoformat().replace('+00:00', 'Z')
+        },
+        'subscription': 'projects/local/subscriptions/forms-watch'
+    }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Converte timestamp RFC3339 da API em datetime com fuso"""
+    if not value:
+        return None
+    from dateutil.parser import isoparse
+    return isoparse(value)
+
+
+class FormsWatchManager:
+    """Gerencia watches do Forms: criação, renovação, notificações e marca d'água por formulário"""
+
+    def __init__(
+        self,
+        google_forms,
+        topic_name: Optional[str] = None,
+        state_file: str = "forms_watches.json",
+        renew_before_hours: Optional[int] = None
+    ):
+        """
+        Inicializa o gerenciador de watches
+
+        Args:
+            google_forms: Instância do GoogleFormsIntegration
+            topic_name: Tópico Pub/Sub que recebe as notificações
+            state_file: Arquivo JSON com watches e marcas d'água
+            renew_before_hours: Renova watches que expiram dentro deste prazo
+        """
+        self.google_forms = google_forms
+        self.topic_name = topic_name or Config.GOOGLE_FORMS_WATCH_TOPIC
+        self.state_file = state_file
+        self.renew_before = timedelta(hours=renew_before_hours or Config.GOOGLE_FORMS_WATCH_RENEW_HOURS)
+        self.lock = Lock()
+        self._form_locks = {}
+        self._rerun = set()
+        self._recent_messages = []
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict:
+        """Carrega estado salvo (watches, marcas d'água e respostas já processadas)"""
+        state = {}
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao carregar estado dos watches: {e}")
+        for key in ('watches', 'watermarks', 'processed', 'retry'):
+            state.setdefault(key, {})
+        return state
+
+    def _save_state(self):
+        """Salva estado em disco (arquivo temporário + rename: quem lê nunca vê meio arquivo)"""
+        tmp_file = f"{self.state_file}.tmp.{os.getpid()}"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao salvar estado dos watches: {e}")
+
+    def _update_state(self, mutate: Callable[[Dict], None]):
+        """
+        Relê o estado do disco, aplica a alteração e salva
+
+        Servidor web e agendador gravam o mesmo arquivo: sob o lock de arquivo,
+        cada um altera só a sua parte sem apagar o que o outro gravou.
+        """
+        with self.lock, interprocess_lock(f"{self.state_file}.lock"):
+            self.state = self._load_state()
+            mutate(self.state)
+            self._save_state()
+
+    def _reload(self) -> Dict:
+        with self.lock:
+            self.state = self._load_state()
+            return self.state
+
+    def form_lock(self, form_id: str) -> Lock:
+        """Lock por formulário (evita buscar o mesmo delta duas vezes em paralelo)"""
+        with self.lock:
+            return self._form_locks.setdefault(form_id, Lock())
+
+    def request_rerun(self, form_id: str):
+        """Marca que chegou notificação: quem está ingerindo o formulário faz mais uma passada"""
+        with self.lock:
+            self._rerun.add(form_id)
+
+    def take_rerun(self, form_id: str) -> bool:
+        """Consome a marca de nova passada (True se havia)"""
+        with self.lock:
+            if form_id in self._rerun:
+                self._rerun.discard(form_id)
+                return True
+            return False
+
+    def has_rerun(self, form_id: str) -> bool:
+        with self.lock:
+            return form_id in self._rerun
+
+    def get_watermark(self, form_id: str) -> Optional[str]:
+        """Retorna o lastSubmittedTime até onde as respostas do formulário já foram processadas"""
+        return self._reload()['watermarks'].get(form_id)
+
+    def get_processed(self, form_id: str) -> Dict[str, str]:
+        """Respostas já processadas depois da marca d'água ({response_id: submission_time})"""
+        return dict(self._reload()['processed'].get(form_id, {}))
+
+    def set_watermark(self, form_id: str, timestamp: str):
+        """Avança a marca d'água do formulário (nunca retrocede)"""
+        def mutate(state):
+            current = state['watermarks'].get(form_id)
+            if not current or timestamp > current:
+                state['watermarks'][form_id] = timestamp
+        self._update_state(mutate)
+
+    def advance(self, form_id: str, watermark: Optional[str], processed: Dict[str, str], has_failures: bool):
+        """
+        Grava o resultado de uma ingestão, depois que as respostas foram processadas
+
+        Args:
+            form_id: ID do formulário
+            watermark: Nova marca d'água (logo antes da resposta com falha mais antiga, se houver)
+            processed: Respostas de sucesso depois da marca (puladas na próxima busca)
+            has_failures: Se True, o agendador tenta o formulário de novo sem esperar notificação
+        """
+        def mutate(state):
+            current = state['watermarks'].get(form_id)
+            if watermark and (not current or watermark > current):
+                state['watermarks'][form_id] = watermark
+            if processed:
+                state['processed'][form_id] = processed
+            else:
+                state['processed'].pop(form_id, None)
+            if has_failures:
+                state['retry'][form_id] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            else:
+                state['retry'].pop(form_id, None)
+        self._update_state(mutate)
+
+    def forms_to_retry(self) -> List[str]:
+        """Formulários com respostas que falharam e aguardam nova tentativa"""
+        return list(self._reload()['retry'])
+
+    def _store_watch(self, form_id: str, watch: Dict):
+        """Guarda um watch retornado pela API"""
+        key = f"{form_id}:{watch.get('eventType')}"
+        def mutate(state):
+            state['watches'][key] = {
+                'form_id': form_id,
+                'watch_id': watch.get('id'),
+                'event_type': watch.get('eventType'),
+                'expire_time': watch.get('expireTime'),
+                'state': watch.get('state', 'ACTIVE')
+            }
+        self._update_state(mutate)
+
+    def ensure_watches(self, form_ids: List[str], event_types=EVENT_TYPES) -> Dict:
+        """
+        Garante um watch ativo por formulário e tipo de evento
+
+        Reaproveita watches já existentes no projeto, renova os que estão perto de
+        expirar e cria os que faltam.
+
+        Args:
+            form_ids: IDs dos formulários
+            event_types: Tipos de evento a observar
+
+        Returns:
+            Resumo com watches criados, renovados, mantidos e erros
+        """
+        if not self.topic_name:
+            raise ValueError("GOOGLE_FORMS_WATCH_TOPIC não configurado")
+
+        summary = {'created': 0, 'renewed': 0, 'kept': 0, 'errors': []}
+        now = datetime.now(timezone.utc)
+
+        for form_id in form_ids:
+            try:
+                existing = {
+                    watch.get('eventType'): watch
+                    for watch in self.google_forms.list_watches(form_id)
+                    if watch.get('state') == 'ACTIVE'
+                }
+            except Exception as e:
+                summary['errors'].append({'form_id': form_id, 'error': str(e)})
+                continue
+
+            # Primeira vez em modo watch: só interessa o que chegar daqui pra frente
+            if self.get_watermark(form_id) is None:
+                self.set_watermark(form_id, now.isoformat().replace('+00:00', 'Z'))
+
+            for event_type in event_types:
+                try:
+                    watch = existing.get(event_type)
+                    if watch is None:
+                        watch = self.google_forms.create_watch(form_id, event_type, self.topic_name)
+                        summary['created'] += 1
+                    elif _parse_time(watch.get('expireTime')) - now <= self.renew_before:
+                        watch = self.google_forms.renew_watch(form_id, watch['id'])
+                        summary['renewed'] += 1
+                    else:
+                        summary['kept'] += 1
+                    self._store_watch(form_id, watch)
+                except Exception as e:
+                    summary['errors'].append({
+                        'form_id': form_id,
+                        'event_type': event_type,
+                        'error': str(e)
+                    })
+
+        return summary
+
+    def renew_expiring_watches(self) -> Dict:
+        """Renova (ou recria) os watches conhecidos que estão perto de expirar"""
+        summary = {'renewed': 0, 'recreated': 0, 'errors': []}
+        now = datetime.now(timezone.utc)
+
+        watches = list(self._reload()['watches'].values())
+
+        for watch in watches:
+            expire_time = _parse_time(watch.get('expire_time'))
+            if expire_time and expire_time - now > self.renew_before:
+                continue
+            form_id = watch['form_id']
+            try:
+                if expire_time and expire_time > now:
+                    renewed = self.google_forms.renew_watch(form_id, watch['watch_id'])
+                    summary['renewed'] += 1
+                else:
+                    # Expirado: o Google descarta o watch, é preciso criar outro
+                    renewed = self.google_forms.create_watch(form_id, watch['event_type'], self.topic_name)
+                    summary['recreated'] += 1
+                self._store_watch(form_id, renewed)
+            except Exception as e:
+                summary['errors'].append({
+                    'form_id': form_id,
+                    'event_type': watch.get('event_type'),
+                    'error': str(e)
+                })
+
+        return summary
+
+    def parse_notification(self, envelope: Dict) -> Optional[Dict]:
+        """
+        Extrai formulário e tipo de evento de uma notificação push do Pub/Sub
+
+        Args:
+            envelope: Corpo JSON recebido no endpoint
+
+        Returns:
+            {'form_id', 'event_type', 'watch_id', 'message_id'} ou None se for
+            uma mensagem repetida (o Pub/Sub entrega pelo menos uma vez)
+        """
+        message = envelope.get('message') or {}
+        attributes = message.get('attributes') or {}
+        form_id = attributes.get('formId')
+        event_type = attributes.get('eventType')
+
+        if not form_id or event_type not in EVENT_TYPES:
+            raise ValueError("Notificação inválida: formId/eventType ausentes")
+
+        message_id = message.get('messageId') or message.get('message_id')
+        with self.lock:
+            if message_id and message_id in self._recent_messages:
+                return None
+            if message_id:
+                self._recent_messages.append(message_id)
+                del self._recent_messages[:-500]
+
+        return {
+            'form_id': form_id,
+            'event_type': event_type,
+            'watch_id': attributes.get('watchId'),
+            'message_id': message_id
+        }
+
+    def get_status(self) -> Dict:
+        """Retorna watches conhecidos e marcas d'água"""
+        state = self._reload()
+        with self.lock:
+            return json.loads(json.dumps(state))
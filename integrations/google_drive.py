@@ -1,20 +1,29 @@
 """
 Integração com Google Drive
 """
-from typing import Dict, List, Optional, BinaryIO
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, BinaryIO
 from googleapiclient.errors import HttpError
+from integrations.circuit_breaker import circuit_protected
+from integrations.drive_index import DriveIndex, FOLDER_MIME_TYPE, parse_document_name
+from integrations.google_services import get_service
 from config import Config
 import io
 import os
 
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+
+# Limite de chamadas por requisição em lote da API do Drive
+BATCH_MAX_REQUESTS = 100
+
 
 class GoogleDriveIntegration:
     """Classe para integração com Google Drive"""
     
-    def __init__(self, credentials: Optional[Credentials] = None):
+    def __init__(self, credentials: Optional['Credentials'] = None):
         """
         Inicializa a integração com Google Drive
         
@@ -23,9 +32,80 @@ class GoogleDriveIntegration:
         """
         self.credentials = credentials
         self.service = None
+        self._local = threading.local()
+        # (pasta pai, nome da pasta) -> ID da pasta, para não recriar pastas já conhecidas
+        self._folder_cache: Dict[tuple, str] = {}
+        self._folder_lock = threading.Lock()
+        # Índice local (SQLite) de pastas/arquivos, atualizado por changes().list
+        self.index = DriveIndex()
+        self._index_lock = threading.Lock()
+        self._index_synced_at = 0.0
         if credentials:
-            self.service = build('drive', 'v3', credentials=credentials)
+            self.service = get_service('drive', 'v3', credentials)
         self.folder_id = Config.GOOGLE_DRIVE_FOLDER_ID
+        self.chunk_size = max(1, int(Config.GOOGLE_DRIVE_CHUNK_MB * 4)) * 256 * 1024  # múltiplo de 256 KB
+        self.resumable_min_bytes = int(Config.GOOGLE_DRIVE_RESUMABLE_MIN_MB * 1024 * 1024)
+    
+    def _http(self):
+        """http autorizado da thread atual (httplib2 não é thread-safe)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import httplib2
+            import google_auth_httplib2
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+    
+    @circuit_protected('google_drive')
+    def _execute(self, request):
+        """Executa uma requisição da API usando o http da thread atual"""
+        return request.execute(http=self._http())
+    
+    @circuit_protected('google_drive')
+    def _execute_batch(self, requests: Dict[str, object]) -> Dict[str, Dict]:
+        """
+        Executa várias requisições em lote (new_batch_http_request)
+        
+        Args:
+            requests: {id da requisição: requisição da API}
+            
+        Returns:
+            {id da requisição: resposta} - requisições com erro ficam com {'error': ...}
+        """
+        results = {}
+        
+        def callback(request_id, response, exception):
+            results[request_id] = {'error': str(exception)} if exception else response
+        
+        items = list(requests.items())
+        for start in range(0, len(items), BATCH_MAX_REQUESTS):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for request_id, request in items[start:start + BATCH_MAX_REQUESTS]:
+                batch.add(request, request_id=request_id)
+            batch.execute(http=self._http())
+        
+        return results
+    
+    @circuit_protected('google_drive')
+    def _upload_in_chunks(self, request, file_name: str) -> Dict:
+        """Envia um upload resumível parte a parte (next_chunk)"""
+        http = self._http()
+        file = None
+        while file is None:
+            status, file = request.next_chunk(http=http, num_retries=3)
+            if status:
+                print(f"   ⬆️  {file_name}: {int(status.progress() * 100)}%")
+        return file
+    
+    @staticmethod
+    def _content_size(file_path: Optional[str], file_content: Optional[BinaryIO]) -> int:
+        """Tamanho do conteúdo a enviar (sem ler o arquivo)"""
+        if file_path:
+            return os.path.getsize(file_path)
+        position = file_content.tell()
+        size = file_content.seek(0, io.SEEK_END) - position
+        file_content.seek(position)
+        return size
     
     def upload_file(
         self,
@@ -33,7 +113,8 @@ class GoogleDriveIntegration:
         file_content: Optional[BinaryIO] = None,
         file_name: str = "documento",
         mime_type: str = "application/pdf",
-        folder_id: Optional[str] = None
+        folder_id: Optional[str] = None,
+        existing_file_id: Optional[str] = None
     ) -> Dict:
         """
         Faz upload de um arquivo para o Google Drive
@@ -44,6 +125,7 @@ class GoogleDriveIntegration:
             file_name: Nome do arquivo
             mime_type: Tipo MIME do arquivo
             folder_id: ID da pasta de destino (usa a configurada se não fornecido)
+            existing_file_id: Se informado, envia como nova versão deste arquivo (sem duplicar)
             
         Returns:
             Metadados do arquivo enviado
@@ -60,20 +142,45 @@ class GoogleDriveIntegration:
         if folder_id:
             file_metadata['parents'] = [folder_id]
         
+        # googleapiclient.http carrega httplib2/google-auth: só importa ao enviar
+        from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+        
+        if not file_path and file_content is None:
+            raise ValueError("Forneça file_path ou file_content")
+        
         try:
+            # Arquivos grandes: upload resumível em partes (retoma a parte que falhar)
+            resumable = self._content_size(file_path, file_content) >= self.resumable_min_bytes
             if file_path:
-                media = MediaFileUpload(file_path, mimetype=mime_type)
-            elif file_content:
-                media = MediaIoBaseUpload(file_content, mimetype=mime_type)
+                media = MediaFileUpload(
+                    file_path, mimetype=mime_type, chunksize=self.chunk_size, resumable=resumable
+                )
             else:
-                raise ValueError("Forneça file_path ou file_content")
+                media = MediaIoBaseUpload(
+                    file_content, mimetype=mime_type, chunksize=self.chunk_size, resumable=resumable
+                )
             
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, name, webViewLink, webContentLink'
-            ).execute()
+            fields = 'id, name, mimeType, parents, webViewLink, webContentLink, modifiedTime'
+            if existing_file_id:
+                request = self.service.files().update(
+                    fileId=existing_file_id,
+                    body={'name': file_name},
+                    media_body=media,
+                    fields=fields
+                )
+            else:
+                request = self.service.files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields=fields
+                )
+            
+            if not resumable:
+                file = self._execute(request)
+            else:
+                file = self._upload_in_chunks(request, file_name)
             
+            self.index.upsert(file, parent_id=folder_id)
             return file
             
         except HttpError as error:
@@ -123,31 +230,171 @@ class GoogleDriveIntegration:
         
         file_metadata = {
             'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder'
+            'mimeType': FOLDER_MIME_TYPE
         }
         
         if parent_folder_id:
             file_metadata['parents'] = [parent_folder_id]
         
         try:
-            folder = self.service.files().create(
+            folder = self._execute(self.service.files().create(
                 body=file_metadata,
-                fields='id, name, webViewLink'
-            ).execute()
+                fields='id, name, mimeType, parents, webViewLink, modifiedTime'
+            ))
             
+            self.index.upsert(folder, parent_id=parent_folder_id)
+            with self._folder_lock:
+                self._folder_cache[(parent_folder_id, folder_name)] = folder['id']
             return folder
             
         except HttpError as error:
             print(f"Erro ao criar pasta no Google Drive: {error}")
             raise
     
-    def list_files(self, folder_id: Optional[str] = None, query: Optional[str] = None) -> List[Dict]:
+    @staticmethod
+    def _quote(value: str) -> str:
+        """Escapa um valor para a query de busca do Drive"""
+        return value.replace('\\', '\\\\').replace("'", "\\'")
+    
+    def _find_folders(self, folder_names: List[str], parent_folder_id: Optional[str]) -> Dict[str, str]:
+        """Busca pastas existentes pelo nome (uma consulta para vários nomes)"""
+        found = {}
+        for start in range(0, len(folder_names), 50):
+            names = folder_names[start:start + 50]
+            name_filter = ' or '.join(f"name = '{self._quote(name)}'" for name in names)
+            query = f"mimeType = '{FOLDER_MIME_TYPE}' and trashed = false and ({name_filter})"
+            if parent_folder_id:
+                query += f" and '{parent_folder_id}' in parents"
+            
+            page_token = None
+            while True:
+                results = self._execute(self.service.files().list(
+                    q=query,
+                    pageSize=100,
+                    pageToken=page_token,
+                    fields="nextPageToken, files(id, name)"
+                ))
+                for folder in results.get('files', []):
+                    found.setdefault(folder['name'], folder['id'])
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        return found
+    
+    def get_or_create_folder(self, folder_name: str, parent_folder_id: Optional[str] = None) -> str:
         """
-        Lista arquivos no Google Drive
+        Retorna o ID da pasta, criando-a só se ainda não existir
+        
+        Args:
+            folder_name: Nome da pasta
+            parent_folder_id: ID da pasta pai (opcional)
+            
+        Returns:
+            ID da pasta
+        """
+        return self.create_folders([folder_name], parent_folder_id)[folder_name]
+    
+    def create_folders(self, folder_names: List[str], parent_folder_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Garante várias pastas de uma vez: cache, uma busca pelas existentes
+        e criação das que faltam em uma única requisição em lote
+        
+        Args:
+            folder_names: Nomes das pastas
+            parent_folder_id: ID da pasta pai (opcional)
+            
+        Returns:
+            {nome da pasta: ID da pasta}
+        """
+        if not self.service:
+            raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
+        
+        with self._folder_lock:
+            folder_ids = {
+                name: self._folder_cache[(parent_folder_id, name)]
+                for name in folder_names
+                if (parent_folder_id, name) in self._folder_cache
+            }
+        missing = [name for name in dict.fromkeys(folder_names) if name not in folder_ids]
+        if not missing:
+            return folder_ids
+        
+        # Índice local em dia: a busca é local e a ausência no índice basta para criar
+        index_synced = self.sync_index()
+        for name in missing:
+            folder = self.index.find_folder(name, parent_folder_id)
+            if folder:
+                folder_ids[name] = folder['id']
+        missing = [name for name in missing if name not in folder_ids]
+        
+        try:
+            if missing and not index_synced:
+                folder_ids.update(self._find_folders(missing, parent_folder_id))
+            to_create = [name for name in missing if name not in folder_ids]
+            
+            if len(to_create) == 1:
+                folder_ids[to_create[0]] = self.create_folder(to_create[0], parent_folder_id)['id']
+            elif to_create:
+                requests = {}
+                for index, name in enumerate(to_create):
+                    body = {'name': name, 'mimeType': FOLDER_MIME_TYPE}
+                    if parent_folder_id:
+                        body['parents'] = [parent_folder_id]
+                    requests[str(index)] = self.service.files().create(
+                        body=body,
+                        fields='id, name, mimeType, parents, webViewLink, modifiedTime'
+                    )
+                
+                created = []
+                for index, response in self._execute_batch(requests).items():
+                    name = to_create[int(index)]
+                    if 'error' in response:
+                        print(f"⚠️  Erro ao criar pasta {name}: {response['error']}")
+                        continue
+                    folder_ids[name] = response['id']
+                    created.append(response)
+                self.index.upsert_many(created)
+        except HttpError as error:
+            print(f"Erro ao criar pastas no Google Drive: {error}")
+            raise
+        
+        with self._folder_lock:
+            for name, folder_id in folder_ids.items():
+                self._folder_cache[(parent_folder_id, name)] = folder_id
+        return folder_ids
+    
+    def update_files_metadata(self, updates: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Atualiza metadados de vários arquivos em uma requisição em lote
+        
+        Args:
+            updates: {file_id: metadados (ex: {'description': ..., 'properties': {...}})}
+            
+        Returns:
+            {file_id: metadados atualizados ou {'error': ...}}
+        """
+        if not self.service:
+            raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
+        
+        requests = {
+            file_id: self.service.files().update(fileId=file_id, body=body, fields='id, name')
+            for file_id, body in updates.items()
+        }
+        return self._execute_batch(requests) if requests else {}
+    
+    def list_files(
+        self,
+        folder_id: Optional[str] = None,
+        query: Optional[str] = None,
+        max_results: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Lista arquivos no Google Drive (percorre todas as páginas)
         
         Args:
             folder_id: ID da pasta (opcional)
             query: Query de busca (opcional)
+            max_results: Limite de arquivos retornados (opcional)
             
         Returns:
             Lista de arquivos
@@ -166,25 +413,128 @@ class GoogleDriveIntegration:
         q = ' and '.join(query_parts) if query_parts else None
         
         try:
-            results = self.service.files().list(
-                q=q,
-                pageSize=100,
-                fields="nextPageToken, files(id, name, mimeType, webViewLink, createdTime)"
-            ).execute()
-            
-            return results.get('files', [])
+            return self._list_all(
+                q,
+                "nextPageToken, files(id, name, mimeType, webViewLink, createdTime)",
+                max_results=max_results
+            )
             
         except HttpError as error:
             print(f"Erro ao listar arquivos do Google Drive: {error}")
             return []
     
+    def _list_all(self, q: Optional[str], fields: str, max_results: Optional[int] = None) -> List[Dict]:
+        """files().list seguindo nextPageToken até o fim (ou até max_results)"""
+        files = []
+        page_token = None
+        while True:
+            results = self._execute(self.service.files().list(
+                q=q,
+                pageSize=1000,
+                pageToken=page_token,
+                fields=fields
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token or (max_results and len(files) >= max_results):
+                break
+        return files[:max_results] if max_results else files
+    
+    def sync_index(self, force: bool = False) -> bool:
+        """
+        Atualiza o índice local com as mudanças do Drive desde a última leitura
+        
+        Na primeira vez lista os arquivos/pastas do sistema e guarda o token inicial;
+        depois lê só o delta com changes().list. Chamadas seguidas dentro de
+        GOOGLE_DRIVE_INDEX_SYNC_SECONDS não consultam o Drive.
+        
+        Args:
+            force: Ignora o intervalo mínimo entre sincronizações
+            
+        Returns:
+            True se o índice está em dia (pode ser usado sem consultar o Drive)
+        """
+        if not self.service:
+            return False
+        
+        with self._index_lock:
+            if not force and time.monotonic() - self._index_synced_at < Config.GOOGLE_DRIVE_INDEX_SYNC_SECONDS:
+                return True
+            
+            try:
+                page_token = self.index.get_page_token()
+                if page_token is None:
+                    self._bootstrap_index()
+                else:
+                    self._apply_changes(page_token)
+                self._index_synced_at = time.monotonic()
+                return True
+            except HttpError as error:
+                print(f"⚠️  Aviso: Erro ao sincronizar índice do Drive: {error}")
+                return False
+    
+    def _bootstrap_index(self):
+        """Carga inicial do índice (token obtido antes da listagem para não perder mudanças)"""
+        start_token = self._execute(self.service.changes().getStartPageToken())['startPageToken']
+        files = self._list_all(
+            "trashed = false and (name contains 'Imovel_' or name contains 'Demanda_' "
+            "or name contains 'Resposta_')",
+            "nextPageToken, files(id, name, mimeType, parents, webViewLink, modifiedTime)"
+        )
+        self.index.upsert_many([f for f in files if parse_document_name(f.get('name'))])
+        self.index.set_page_token(start_token)
+        print(f"🗂️  Índice do Drive carregado: {self.index.get_stats()}")
+    
+    def _apply_changes(self, page_token: str):
+        """Aplica ao índice as mudanças desde page_token"""
+        while page_token:
+            results = self._execute(self.service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                spaces='drive',
+                fields="nextPageToken, newStartPageToken, changes(fileId, removed, "
+                       "file(id, name, mimeType, parents, trashed, webViewLink, modifiedTime))"
+            ))
+            
+            upserts, removed = [], []
+            for change in results.get('changes', []):
+                file = change.get('file')
+                if change.get('removed') or not file:
+                    removed.append(change['fileId'])
+                elif file.get('trashed') or not parse_document_name(file.get('name')):
+                    # Apagado ou renomeado para fora do padrão do sistema
+                    removed.append(file['id'])
+                else:
+                    upserts.append(file)
+            
+            if removed:
+                self.index.remove_many(removed)
+                with self._folder_lock:
+                    removed_ids = set(removed)
+                    for key in [k for k, v in self._folder_cache.items() if v in removed_ids]:
+                        del self._folder_cache[key]
+            if upserts:
+                self.index.upsert_many(upserts)
+            
+            if results.get('newStartPageToken'):
+                self.index.set_page_token(results['newStartPageToken'])
+                break
+            page_token = results.get('nextPageToken')
+            self.index.set_page_token(page_token)
+    
+    @staticmethod
+    def property_folder_name(response_id: str) -> str:
+        """Nome da pasta de um imóvel (estável, para reaproveitar a mesma pasta)"""
+        return f"Imovel_{response_id}"
+    
     def save_form_response_document(
         self,
         form_data: Dict,
         analysis: Dict,
         response_id: str,
         pdf_path: Optional[str] = None,
-        is_property: bool = True
+        is_property: bool = True,
+        pdf_bytes: Optional[bytes] = None
     ) -> Dict:
         """
         Salva um documento com dados do formulário e análise
@@ -195,21 +545,25 @@ class GoogleDriveIntegration:
             response_id: ID da resposta
             pdf_path: Caminho do PDF gerado (se fornecido, faz upload do PDF)
             is_property: Se True, é imóvel; se False, é demanda
+            pdf_bytes: Conteúdo do PDF gerado em memória (enviado sem passar pelo disco)
             
         Returns:
             Metadados do documento criado
         """
         from datetime import datetime
         
-        # Se PDF foi fornecido, faz upload do PDF
-        if pdf_path and os.path.exists(pdf_path):
-            # Cria pasta específica para o imóvel/demanda se for imóvel
+        # PDF/texto já enviado desta resposta vira nova versão do mesmo arquivo
+        self.sync_index()
+        
+        # Se PDF foi fornecido (em memória ou em disco), faz upload do PDF
+        if pdf_bytes or (pdf_path and os.path.exists(pdf_path)):
+            # Pasta específica do imóvel (reaproveitada se já existir)
             folder_id = None
             if is_property:
-                folder_name = f"Imovel_{response_id}_{datetime.now().strftime('%Y%m%d')}"
                 try:
-                    folder = self.create_folder(folder_name, parent_folder_id=self.folder_id)
-                    folder_id = folder.get('id')
+                    folder_id = self.get_or_create_folder(
+                        self.property_folder_name(response_id), parent_folder_id=self.folder_id
+                    )
                 except Exception as e:
                     print(f"⚠️  Erro ao criar pasta: {e}. Salvando na pasta principal.")
                     folder_id = self.folder_id
@@ -217,12 +571,17 @@ class GoogleDriveIntegration:
             # Nome do arquivo
             file_name = f"{'Imovel' if is_property else 'Demanda'}_{response_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             
-            # Faz upload do PDF
+            folder_id = folder_id or self.folder_id
+            existing = self.index.find_document(response_id, 'application/pdf', parent_id=folder_id)
+            
+            # Faz upload do PDF (BytesIO vai direto para o MediaIoBaseUpload)
             return self.upload_file(
-                file_path=pdf_path,
+                file_path=None if pdf_bytes else pdf_path,
+                file_content=io.BytesIO(pdf_bytes) if pdf_bytes else None,
                 file_name=file_name,
                 mime_type="application/pdf",
-                folder_id=folder_id or self.folder_id
+                folder_id=folder_id,
+                existing_file_id=existing['id'] if existing else None
             )
         else:
             # Fallback: salva como texto (compatibilidade)
@@ -239,7 +598,15 @@ Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
             
             title = f"Resposta_{response_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            existing = self.index.find_document(response_id, 'text/plain', parent_id=self.folder_id)
             
+            if existing:
+                return self.upload_file(
+                    file_content=io.BytesIO(content.encode('utf-8')),
+                    file_name=title,
+                    mime_type='text/plain',
+                    existing_file_id=existing['id']
+                )
             return self.create_document_from_text(content, title)
 
 
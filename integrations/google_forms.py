@@ -2,17 +2,21 @@
 Integração com Google Forms
 """
 import json
-from typing import Dict, List, Optional
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
 from googleapiclient.errors import HttpError
+from integrations.form_schema_cache import FormSchemaCache
+from integrations.google_services import get_service
 from config import Config
 
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
 
 class GoogleFormsIntegration:
     """Classe para integração com Google Forms"""
     
-    def __init__(self, credentials: Optional[Credentials] = None):
+    def __init__(self, credentials: Optional['Credentials'] = None):
         """
         Inicializa a integração com Google Forms
         
@@ -21,18 +25,37 @@ class GoogleFormsIntegration:
         """
         self.credentials = credentials
         self.service = None
+        # httplib2 não é thread-safe: cada thread usa seu próprio objeto http
+        self._local = threading.local()
+        self.schema_cache = FormSchemaCache()
+        self._schema_lock = threading.Lock()
         if credentials:
-            self.service = build('forms', 'v1', credentials=credentials)
+            self.service = get_service('forms', 'v1', credentials)
+    
+    def _execute(self, request):
+        """Executa uma requisição da API usando o http da thread atual"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import httplib2
+            import google_auth_httplib2
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return request.execute(http=http)
     
-    def get_form_responses(self, form_id: Optional[str] = None) -> List[Dict]:
+    def get_form_responses(self, form_id: Optional[str] = None, since: Optional[str] = None) -> List[Dict]:
         """
         Obtém todas as respostas de um formulário
         
         Args:
             form_id: ID do formulário (usa o configurado se não fornecido)
+            since: Se informado, a API retorna só respostas enviadas depois deste timestamp
             
         Returns:
             Lista de respostas do formulário
+            
+        Raises:
+            HttpError: Se a API falhar (429, 5xx, cota...): quem sincroniza não pode
+                       confundir a falha com "nenhuma resposta nova"
         """
         if not self.service:
             raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
@@ -41,14 +64,23 @@ class GoogleFormsIntegration:
         if not form_id:
             raise ValueError("ID do formulário não fornecido")
         
-        try:
-            form = self.service.forms().get(formId=form_id).execute()
-            responses = self.service.forms().responses().list(formId=form_id).execute()
-            
-            return responses.get('responses', [])
-        except HttpError as error:
-            print(f"Erro ao obter respostas do formulário: {error}")
-            return []
+        responses = []
+        page_token = None
+        filter_query = f"timestamp > {self._rfc3339(since)}" if since else None
+        while True:
+            page = self._execute(
+                self.service.forms().responses().list(
+                    formId=form_id,
+                    filter=filter_query,
+                    pageToken=page_token
+                )
+            )
+            responses.extend(page.get('responses', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return responses
     
     def get_new_responses(self, form_id: Optional[str] = None, last_sync: Optional[str] = None) -> List[Dict]:
         """
@@ -61,7 +93,8 @@ class GoogleFormsIntegration:
         Returns:
             Lista de novas respostas
         """
-        all_responses = self.get_form_responses(form_id)
+        # O filtro por timestamp é aplicado na própria API (só o delta trafega)
+        all_responses = self.get_form_responses(form_id, since=last_sync)
         
         if not last_sync:
             return all_responses
@@ -74,28 +107,161 @@ class GoogleFormsIntegration:
         
         return new_responses
     
-    def format_response_data(self, response: Dict) -> Dict:
+    @staticmethod
+    def _rfc3339(timestamp: str) -> str:
+        """Garante o formato RFC3339 (com fuso) exigido pelo filtro da API"""
+        if timestamp.endswith('Z') or '+' in timestamp[10:] or '-' in timestamp[10:]:
+            return timestamp
+        return f"{timestamp}Z"
+    
+    def create_watch(self, form_id: str, event_type: str, topic_name: str) -> Dict:
+        """
+        Registra um watch (notificação push via Cloud Pub/Sub) no formulário
+        
+        Args:
+            form_id: ID do formulário
+            event_type: 'RESPONSES' (novas respostas) ou 'SCHEMA' (formulário editado)
+            topic_name: Tópico Pub/Sub (projects/<projeto>/topics/<tópico>)
+            
+        Returns:
+            Watch criado (id, eventType, expireTime...)
+        """
+        if not self.service:
+            raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
+        
+        body = {
+            'watch': {
+                'target': {'topic': {'topicName': topic_name}},
+                'eventType': event_type
+            }
+        }
+        return self._execute(self.service.forms().watches().create(formId=form_id, body=body))
+    
+    def renew_watch(self, form_id: str, watch_id: str) -> Dict:
+        """Renova um watch existente por mais 7 dias"""
+        if not self.service:
+            raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
+        
+        return self._execute(
+            self.service.forms().watches().renew(formId=form_id, watchId=watch_id, body={})
+        )
+    
+    def list_watches(self, form_id: str) -> List[Dict]:
+        """Lista os watches registrados por este projeto no formulário"""
+        if not self.service:
+            raise ValueError("Serviço não inicializado. Configure as credenciais primeiro.")
+        
+        return self._execute(self.service.forms().watches().list(formId=form_id)).get('watches', [])
+    
+    def get_form_schema(self, form_id: str, question_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Obtém o schema do formulário (question_id -> campo), usando o cache
+        
+        O formulário só é buscado novamente na API quando não há cache ou quando
+        aparece uma pergunta desconhecida (formulário editado). Se a última busca
+        falhou há pouco (ex: 403), não tenta de novo dentro da janela de falha e
+        usa o schema de fallback.
+        
+        Args:
+            form_id: ID do formulário
+            question_ids: IDs das perguntas presentes na resposta (opcional)
+            
+        Returns:
+            Schema do formulário ou None se não for possível obtê-lo
+        """
+        if self.schema_cache.covers(form_id, question_ids or []):
+            return self.schema_cache.get(form_id)
+        
+        if not self.service or self.schema_cache.recent_failure(form_id):
+            return self._fallback_schema(form_id)
+        
+        with self._schema_lock:
+            # Outra thread pode ter atualizado o cache (ou registrado a falha) enquanto esperávamos
+            if self.schema_cache.covers(form_id, question_ids or []):
+                return self.schema_cache.get(form_id)
+            if self.schema_cache.recent_failure(form_id):
+                return self._fallback_schema(form_id)
+            return self.refresh_form_schema(form_id)
+    
+    def _fallback_schema(self, form_id: str) -> Optional[Dict]:
+        """Schema em cache + field_map do forms_config.json (sem chamar a API)"""
+        form_config = Config.get_form_by_id(form_id) or {}
+        return self.schema_cache.fallback(form_id, form_config.get('field_map'))
+    
+    def refresh_form_schema(self, form_id: str) -> Optional[Dict]:
+        """
+        Busca a definição do formulário na API e atualiza o cache
+        
+        Args:
+            form_id: ID do formulário
+            
+        Returns:
+            Schema atualizado (ou o schema de fallback se a busca falhar)
+        """
+        try:
+            form = self._execute(self.service.forms().get(formId=form_id))
+        except (HttpError, OSError) as error:
+            print(f"⚠️  Aviso: Não foi possível obter a estrutura do formulário {form_id}: {error}")
+            self.schema_cache.record_failure(form_id, error)
+            return self._fallback_schema(form_id)
+        
+        form_config = Config.get_form_by_id(form_id) or {}
+        return self.schema_cache.store(form_id, form, form_config.get('field_map'))
+    
+    def format_response_data(self, response: Dict, form_id: Optional[str] = None) -> Dict:
         """
         Formata os dados de uma resposta para um formato padronizado
         
+        As respostas são indexadas pelos nomes de campo do sistema (nome, telefone,
+        valor, quartos...) conforme o schema do formulário. Perguntas de múltipla
+        escolha viram listas e uploads viram listas de URLs do Drive.
+        
         Args:
             response: Resposta bruta do Google Forms
+            form_id: ID do formulário (usa o formId da resposta se não fornecido)
             
         Returns:
             Dados formatados
         """
+        form_id = form_id or response.get('formId')
+        answers = response.get('answers', {})
+        
+        schema = None
+        if form_id:
+            schema = self.get_form_schema(form_id, list(answers.keys()))
+        questions = schema.get('questions', {}) if schema else {}
+        
         formatted = {
             'response_id': response.get('responseId'),
+            'form_id': form_id,
+            'form_title': schema.get('title', '') if schema else '',
             'submission_time': response.get('lastSubmittedTime'),
             'answers': {}
         }
         
         # Processa as respostas
-        answers = response.get('answers', {})
         for question_id, answer_data in answers.items():
-            answer = answer_data.get('textAnswers', {}).get('answers', [{}])[0]
-            formatted['answers'][question_id] = answer.get('value', '')
+            question = questions.get(question_id, {})
+            field = question.get('field', question_id)
+            
+            if 'fileUploadAnswers' in answer_data:
+                files = answer_data['fileUploadAnswers'].get('answers', [])
+                formatted['answers'][field] = [
+                    f"https://drive.google.com/uc?export=view&id={file_answer['fileId']}"
+                    for file_answer in files if file_answer.get('fileId')
+                ]
+                continue
+            
+            values = [
+                answer.get('value', '')
+                for answer in answer_data.get('textAnswers', {}).get('answers', [])
+            ]
+            if question.get('kind') == 'multi' or len(values) > 1:
+                formatted['answers'][field] = values
+            else:
+                formatted['answers'][field] = values[0] if values else ''
+        
+        if response.get('respondentEmail'):
+            formatted['answers'].setdefault('email', response['respondentEmail'])
         
         return formatted
-
-
@@ -0,0 +1,40 @@
+"""
+Cache dos serviços de descoberta das APIs Google (Forms, Drive)
+Montar um serviço com build() custa caro; o mesmo serviço é reaproveitado
+por todas as integrações que usam as mesmas credenciais
+"""
+from threading import Lock
+
+
+_services = {}
+_lock = Lock()
+
+
+def _credentials_key(credentials):
+    """Identifica a conta/cliente das credenciais (estável após refresh do token)"""
+    return (
+        getattr(credentials, 'client_id', None),
+        getattr(credentials, 'refresh_token', None) or getattr(credentials, 'token', None)
+    )
+
+
+def get_service(api: str, version: str, credentials):
+    """
+    Retorna o serviço da API, construindo-o apenas na primeira vez
+
+    Args:
+        api: Nome da API ('forms', 'drive')
+        version: Versão da API ('v1', 'v3')
+        credentials: Credenciais OAuth2 do Google
+
+    Returns:
+        Recurso do googleapiclient pronto para uso
+    """
+    key = (api, version, _credentials_key(credentials))
+    with _lock:
+        service = _services.get(key)
+        if service is None:
+            from googleapiclient.discovery import build
+            service = build(api, version, credentials=credentials, cache_discovery=False)
+            _services[key] = service
+        return service
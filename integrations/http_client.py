@@ -0,0 +1,331 @@
+"""
+Cliente HTTP resiliente compartilhado pelas integrações REST (ClickUp, Chaves na Mão)
+Timeouts de conexão/leitura, retry com backoff e jitter para chamadas idempotentes,
+respeito aos cabeçalhos de rate limit (desacelera antes de estourar a cota) e
+histograma de latência por host.
+"""
+import random
+import time
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Limites superiores (ms) das faixas do histograma de latência
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Histograma de latência (contagem por faixa, média, máximo e erros)"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.status: Dict[str, int] = {}
+
+    def record(self, elapsed_ms: float, status: Optional[int] = None, error: bool = False):
+        index = len(LATENCY_BUCKETS_MS)
+        for i, limit in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= limit:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error:
+            self.errors += 1
+        key = str(status) if status is not None else 'erro'
+        self.status[key] = self.status.get(key, 0) + 1
+
+    def snapshot(self) -> Dict:
+        labels = [f"<={limit}ms" for limit in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 1) if self.count else None,
+            'max_ms': round(self.max_ms, 1),
+            'buckets': dict(zip(labels, self.buckets)),
+            'status': dict(self.status)
+        }
+
+
+class _HostState:
+    """Estado de rate limit e latência de um host"""
+
+    def __init__(self):
+        self.next_allowed_at = 0.0
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.throttled = 0
+        self.retries = 0
+        self.latency = LatencyHistogram()
+
+
+class ResilientHTTPClient:
+    """Sessão HTTP com timeouts, retry com backoff e controle de rate limit por host"""
+
+    def __init__(
+        self,
+        name: str,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        rate_limit_margin: Optional[int] = None,
+        max_concurrent: Optional[int] = None
+    ):
+        """
+        Args:
+            name: Nome do cliente (aparece nas estatísticas)
+            connect_timeout: Timeout de conexão em segundos (padrão: HTTP_CONNECT_TIMEOUT)
+            read_timeout: Timeout de leitura em segundos (padrão: HTTP_READ_TIMEOUT)
+            max_retries: Novas tentativas por requisição (padrão: HTTP_MAX_RETRIES)
+            backoff_seconds: Espera base do backoff exponencial (padrão: HTTP_BACKOFF_SECONDS)
+            rate_limit_margin: Pausa até o reset quando restarem N requisições da cota
+            max_concurrent: Requisições simultâneas (None = sem limite)
+        """
+        self.name = name
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else Config.HTTP_READ_TIMEOUT
+        )
+        self.max_retries = max_retries if max_retries is not None else Config.HTTP_MAX_RETRIES
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else Config.HTTP_BACKOFF_SECONDS
+        self.rate_limit_margin = rate_limit_margin if rate_limit_margin is not None else Config.HTTP_RATE_LIMIT_MARGIN
+        self.max_concurrent = max_concurrent
+
+        pool_size = max(10, max_concurrent or 0)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._slots = BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = Lock()
+
+    # ------------------------------------------------------------------
+    # Rate limit
+    # ------------------------------------------------------------------
+
+    def _host(self, url: str) -> _HostState:
+        host = urlsplit(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState()
+            return state
+
+    @staticmethod
+    def _header_number(headers, *names) -> Optional[float]:
+        for name in names:
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    @staticmethod
+    def _reset_timestamp(value: Optional[float]) -> Optional[float]:
+        """X-RateLimit-Reset vem como epoch (ClickUp) ou segundos restantes (outras APIs)"""
+        if value is None:
+            return None
+        now = time.time()
+        return value if value > now - 60 else now + value
+
+    def _wait_turn(self, state: _HostState):
+        """Espera até o host aceitar a próxima requisição"""
+        with self._lock:
+            wait = state.next_allowed_at - time.time()
+            if wait > 0:
+                state.throttled += 1
+        if wait > 0:
+            if wait >= 1:
+                print(f"⏳ [{self.name}] Rate limit: aguardando {wait:.1f}s")
+            time.sleep(wait)
+
+    def _note_rate_limit(self, state: _HostState, response: requests.Response) -> Optional[float]:
+        """
+        Atualiza o estado do host pelos cabeçalhos da resposta
+
+        Com a cota quase no fim, espaça as próximas requisições até o reset
+        (ou pausa até o reset dentro da margem), em vez de esperar pelo 429.
+
+        Returns:
+            Espera sugerida em segundos (Retry-After / reset) quando a resposta é 429
+        """
+        headers = response.headers
+        limit = self._header_number(headers, 'X-RateLimit-Limit', 'RateLimit-Limit')
+        remaining = self._header_number(headers, 'X-RateLimit-Remaining', 'RateLimit-Remaining')
+        reset_at = self._reset_timestamp(self._header_number(headers, 'X-RateLimit-Reset', 'RateLimit-Reset'))
+        retry_after = self._header_number(headers, 'Retry-After')
+        now = time.time()
+
+        next_allowed = None
+        if response.status_code == 429:
+            if retry_after is not None:
+                next_allowed = now + retry_after
+            else:
+                next_allowed = reset_at or now + max(self.backoff_seconds, 1)
+        elif remaining is not None and reset_at and reset_at > now:
+            if remaining <= self.rate_limit_margin:
+                next_allowed = reset_at
+            elif limit and remaining < limit * 0.2:
+                # Último quinto da cota: distribui o que resta até o reset
+                next_allowed = now + (reset_at - now) / remaining
+
+        with self._lock:
+            if limit is not None:
+                state.limit = int(limit)
+            if remaining is not None:
+                state.remaining = int(remaining)
+            if reset_at is not None:
+                state.reset_at = reset_at
+            if next_allowed:
+                state.next_allowed_at = max(state.next_allowed_at, next_allowed)
+
+        if response.status_code == 429:
+            return max(0.0, (next_allowed or now) - now)
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial com jitter (50% a 150% do valor base, até 60s)"""
+        return min(60.0, self.backoff_seconds * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    # ------------------------------------------------------------------
+    # Requisições
+    # ------------------------------------------------------------------
+
+    def request(self, method: str, url: str, retry: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Faz a requisição com timeout, controle de rate limit e retry
+
+        429 e falhas de conexão (antes do envio) são repetidos em qualquer método;
+        5xx/408 e timeouts de leitura só em métodos idempotentes (ou com retry=True).
+
+        Args:
+            method: Método HTTP
+            url: URL completa
+            retry: Força (True) ou desliga (False) o retry de falhas ambíguas
+            **kwargs: Repassados ao requests (json, params, headers, timeout...)
+
+        Returns:
+            Resposta (já validada com raise_for_status)
+        """
+        method = method.upper()
+        idempotent = retry if retry is not None else method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout)
+        state = self._host(url)
+
+        attempt = 0
+        while True:
+            self._wait_turn(state)
+            start = time.perf_counter()
+            try:
+                if self._slots:
+                    with self._slots:
+                        response = self.session.request(method, url, **kwargs)
+                else:
+                    response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    state.latency.record(elapsed_ms, error=True)
+                # Sem conexão a requisição não chegou ao servidor; nos demais casos ela pode ter sido aplicada
+                safe = isinstance(e, requests.exceptions.ConnectTimeout) or (
+                    idempotent and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                )
+                if not safe or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️  [{self.name}] {method} {urlsplit(url).path} falhou ({e.__class__.__name__}), "
+                      f"nova tentativa em {delay:.1f}s")
+            else:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    state.latency.record(elapsed_ms, status=response.status_code,
+                                         error=response.status_code >= 500)
+                wait_429 = self._note_rate_limit(state, response)
+                retryable = response.status_code in RETRYABLE_STATUS and (
+                    response.status_code == 429 or idempotent
+                )
+                if not retryable or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = wait_429 if wait_429 is not None else self._backoff(attempt)
+                print(f"⚠️  [{self.name}] {method} {urlsplit(url).path} retornou {response.status_code}, "
+                      f"nova tentativa em {delay:.1f}s")
+
+            with self._lock:
+                state.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def get_stats(self) -> Dict:
+        """Latência, retries e estado de rate limit por host"""
+        with self._lock:
+            return {
+                host: {
+                    'latency': state.latency.snapshot(),
+                    'retries': state.retries,
+                    'throttled': state.throttled,
+                    'rate_limit': {
+                        'limit': state.limit,
+                        'remaining': state.remaining,
+                        'reset_at': state.reset_at
+                    }
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+_clients: Dict[str, ResilientHTTPClient] = {}
+_clients_lock = Lock()
+
+
+def get_http_client(name: str, **options) -> ResilientHTTPClient:
+    """
+    Cliente compartilhado por nome (um por API), criado no primeiro uso
+
+    Args:
+        name: Nome da API (ex: 'clickup', 'chaves_na_mao')
+        **options: Repassadas ao ResilientHTTPClient na criação
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = ResilientHTTPClient(name, **options)
+        return client
+
+
+def get_http_stats() -> Dict:
+    """Estatísticas de todos os clientes criados até agora"""
+    with _clients_lock:
+        clients = list(_clients.items())
+    return {name: client.get_stats() for name, client in clients}
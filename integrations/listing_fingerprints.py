@@ -0,0 +1,145 @@
+"""
+Impressões digitais (hash do conteúdo) dos imóveis já enviados ao Chaves na Mão
+Permite que uma importação de XML envie só o que mudou: compara o hash do imóvel
+parseado com o do último envio e separa novos, alterados, inalterados e removidos.
+"""
+import hashlib
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+from threading import Lock
+
+
+def listing_key(property_data: Dict) -> Optional[str]:
+    """Chave estável do imóvel: referencia ou, na falta dela, codigo_cliente"""
+    referencia = str(property_data.get('referencia') or '').strip()
+    if referencia:
+        return referencia
+    codigo_cliente = str(property_data.get('codigo_cliente') or '').strip()
+    return f"cliente:{codigo_cliente}" if codigo_cliente else None
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v not in (None, '', [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def fingerprint(property_data: Dict) -> str:
+    """Hash SHA-256 do imóvel normalizado (ordem das chaves, espaços e 100.0 == 100 não contam)"""
+    canonical = json.dumps(
+        _normalize(property_data), sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ListingFingerprintStore:
+    """Hash do último envio de cada imóvel, por origem (feed) importada"""
+
+    def __init__(self, db_file: str = "listing_fingerprints.db"):
+        """
+        Args:
+            db_file: Arquivo SQLite com os hashes
+        """
+        self.db_file = db_file
+        self.lock = Lock()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS listing_fingerprints (
+                    source TEXT NOT NULL,
+                    listing_key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source, listing_key)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS listing_import_stats (
+                    source TEXT PRIMARY KEY,
+                    pushed INTEGER DEFAULT 0,
+                    push_seconds REAL DEFAULT 0
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar hashes dos imóveis: {e}")
+
+    def get_all(self, source: str) -> Dict[str, str]:
+        """{chave do imóvel: hash} de uma origem"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT listing_key, fingerprint FROM listing_fingerprints WHERE source = ?",
+            (source,)
+        ).fetchall()
+        conn.close()
+        return dict(rows)
+
+    def upsert_many(self, source: str, fingerprints: Iterable[Tuple[str, str]]):
+        """Grava o hash do último envio bem-sucedido de cada imóvel"""
+        rows = [(source, key, value) for key, value in fingerprints]
+        if not rows:
+            return
+        with self.lock:
+            conn = self._connect()
+            conn.executemany('''
+                INSERT INTO listing_fingerprints (source, listing_key, fingerprint)
+                VALUES (?, ?, ?)
+                ON CONFLICT(source, listing_key) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    updated_at = datetime('now')
+            ''', rows)
+            conn.commit()
+            conn.close()
+
+    def remove_many(self, source: str, keys: List[str]):
+        with self.lock:
+            conn = self._connect()
+            conn.executemany(
+                "DELETE FROM listing_fingerprints WHERE source = ? AND listing_key = ?",
+                [(source, key) for key in keys]
+            )
+            conn.commit()
+            conn.close()
+
+    def record_push_time(self, source: str, pushed: int, seconds: float):
+        """Acumula o tempo gasto nos envios (base da estimativa de tempo economizado)"""
+        if pushed <= 0:
+            return
+        with self.lock:
+            conn = self._connect()
+            conn.execute('''
+                INSERT INTO listing_import_stats (source, pushed, push_seconds)
+                VALUES (?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    pushed = listing_import_stats.pushed + excluded.pushed,
+                    push_seconds = listing_import_stats.push_seconds + excluded.push_seconds
+            ''', (source, pushed, seconds))
+            conn.commit()
+            conn.close()
+
+    def average_push_seconds(self, source: str) -> Optional[float]:
+        """Tempo médio de envio de um imóvel (histórico da origem)"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT pushed, push_seconds FROM listing_import_stats WHERE source = ?",
+            (source,)
+        ).fetchone()
+        conn.close()
+        if not row or not row[0]:
+            return None
+        return row[1] / row[0]
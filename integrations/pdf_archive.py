@@ -0,0 +1,124 @@
+"""
+Arquivo local de PDFs gerados (pasta pdfs/) com política de retenção
+Remove os PDFs mais antigos que o prazo e, se ainda passar do limite de tamanho,
+os mais antigos até caber.
+"""
+import os
+import time
+from typing import Dict, Optional
+from threading import Lock
+from config import Config
+
+
+class PDFArchive:
+    """Guarda cópias locais dos PDFs respeitando limite de idade e de tamanho"""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_mb: Optional[float] = None,
+        max_age_days: Optional[float] = None
+    ):
+        """
+        Inicializa o arquivo local
+
+        Args:
+            directory: Pasta dos PDFs
+            max_mb: Tamanho máximo da pasta em MB (0 = sem limite)
+            max_age_days: Idade máxima dos arquivos em dias (0 = sem limite)
+        """
+        self.directory = directory or Config.PDF_ARCHIVE_DIR
+        self.max_bytes = int((Config.PDF_ARCHIVE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.max_age_seconds = (
+            Config.PDF_ARCHIVE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        ) * 86400
+        self.lock = Lock()
+
+    def save(self, file_name: str, data: bytes) -> str:
+        """
+        Grava um PDF no arquivo e aplica a política de retenção
+
+        Args:
+            file_name: Nome do arquivo (sem pasta)
+            data: Conteúdo do PDF
+
+        Returns:
+            Caminho do arquivo gravado
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, os.path.basename(file_name))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self.enforce_policy(keep=path)
+        return path
+
+    def _list_files(self):
+        """Lista (caminho, mtime, tamanho) dos PDFs, do mais antigo para o mais novo"""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith('.pdf'):
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_mtime, stat.st_size))
+        except FileNotFoundError:
+            return []
+        files.sort(key=lambda f: f[1])
+        return files
+
+    def enforce_policy(self, keep: Optional[str] = None) -> Dict:
+        """
+        Remove PDFs fora da política (idade e tamanho total)
+
+        Args:
+            keep: Caminho que nunca é removido (o PDF que acabou de ser gravado)
+
+        Returns:
+            {'removed', 'freed_bytes', 'remaining_files', 'remaining_bytes'}
+        """
+        summary = {'removed': 0, 'freed_bytes': 0, 'remaining_files': 0, 'remaining_bytes': 0}
+
+        with self.lock:
+            files = self._list_files()
+            now = time.time()
+            kept = []
+
+            for path, mtime, size in files:
+                expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+                if expired and path != keep and self._remove(path):
+                    summary['removed'] += 1
+                    summary['freed_bytes'] += size
+                else:
+                    kept.append((path, mtime, size))
+
+            total = sum(size for _, _, size in kept)
+            if self.max_bytes:
+                remaining = []
+                for path, mtime, size in kept:
+                    if total > self.max_bytes and path != keep and self._remove(path):
+                        total -= size
+                        summary['removed'] += 1
+                        summary['freed_bytes'] += size
+                    else:
+                        remaining.append((path, mtime, size))
+                kept = remaining
+
+            summary['remaining_files'] = len(kept)
+            summary['remaining_bytes'] = total
+
+        if summary['removed']:
+            print(f"🧹 Arquivo de PDFs: {summary['removed']} removido(s), "
+                  f"{summary['freed_bytes'] / (1024 * 1024):.1f} MB liberados")
+        return summary
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            print(f"⚠️  Aviso: Não foi possível remover {path}: {e}")
+            return False
@@ -3,59 +3,214 @@ Gerador de PDF para imóveis e demandas
 """
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, List, Optional, Union
 from datetime import datetime
+import io
 import os
+import threading
+from config import Config
+from integrations.photo_thumbnails import get_thumbnail_cache, photo_url_list
+
+
+def _build_stylesheet():
+    """Folha de estilos base + estilos customizados (montada uma vez por processo)"""
+    styles = getSampleStyleSheet()
+
+    # Título principal
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a237e'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+
+    # Subtítulo
+    styles.add(ParagraphStyle(
+        name='CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#283593'),
+        spaceAfter=12,
+        spaceBefore=12
+    ))
+
+    # Texto normal
+    styles.add(ParagraphStyle(
+        name='CustomBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6
+    ))
+
+    # Rodapé
+    styles.add(ParagraphStyle(
+        name='Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.grey,
+        alignment=TA_CENTER
+    ))
+    return styles
+
+
+# Estilos compartilhados por todos os PDFs (só leitura depois de montados)
+STYLES = _build_stylesheet()
+
+# Tabela principal (dados básicos / dados do cliente)
+MAIN_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+])
+
+# Tabela de detalhes (características / demanda)
+DETAIL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5c6bc0')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+
+# Tabela da análise do ChatGPT
+ANALYSIS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7986cb')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP')
+])
+
+TABLE_COL_WIDTHS = [2*inch, 4*inch]
+
+# Grade de fotos: 3 colunas na mesma largura das tabelas
+PHOTO_GRID_COLUMNS = 3
+PHOTO_CELL_WIDTH = 2*inch
+PHOTO_CELL_HEIGHT = 1.5*inch
+PHOTO_GRID_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4)
+])
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_pdf_generator() -> 'PDFGenerator':
+    """Retorna o gerador de PDF compartilhado do processo"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = PDFGenerator()
+    return _instance
 
 
 class PDFGenerator:
     """Classe para gerar PDFs formatados"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        # Estilos e tabelas são pré-calculados no módulo; a instância não guarda estado
+        self.styles = STYLES
+    
+    def _table(self, data, style: TableStyle) -> Table:
+        """Cria uma tabela de duas colunas com um estilo pré-calculado"""
+        table = Table(data, colWidths=TABLE_COL_WIDTHS)
+        table.setStyle(style)
+        return table
+    
+    def _photo_grid(self, fotos) -> Optional[Table]:
+        """
+        Grade com as miniaturas das fotos (até PDF_PHOTO_MAX)
+        
+        As fotos vêm do cache de miniaturas: só as que não estão nele são baixadas
+        (em paralelo) e reduzidas. Retorna None se nenhuma foto puder ser usada.
+        """
+        if not Config.PDF_PHOTOS_ENABLED:
+            return None
+        urls = photo_url_list(fotos)[:Config.PDF_PHOTO_MAX]
+        if not urls:
+            return None
+        try:
+            thumbnails = get_thumbnail_cache().get_thumbnails(urls)
+        except Exception as e:
+            print(f"⚠️  Aviso: Fotos não incluídas no PDF: {e}")
+            return None
+        if not thumbnails:
+            return None
+        
+        # Miniaturas já em memória: o ReportLab só lê a imagem no build()
+        cells: List = [
+            Image(io.BytesIO(data), width=PHOTO_CELL_WIDTH - 8, height=PHOTO_CELL_HEIGHT - 8, kind='proportional')
+            for data in thumbnails
+        ]
+        cells += [''] * (-len(cells) % PHOTO_GRID_COLUMNS)
+        rows = [cells[i:i + PHOTO_GRID_COLUMNS] for i in range(0, len(cells), PHOTO_GRID_COLUMNS)]
+        table = Table(rows, colWidths=[PHOTO_CELL_WIDTH] * PHOTO_GRID_COLUMNS, rowHeights=PHOTO_CELL_HEIGHT)
+        table.setStyle(PHOTO_GRID_STYLE)
+        return table
     
-    def _setup_custom_styles(self):
-        """Configura estilos customizados"""
-        # Título principal
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Title'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a237e'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-        
-        # Subtítulo
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#283593'),
-            spaceAfter=12,
-            spaceBefore=12
-        ))
-        
-        # Texto normal
-        self.styles.add(ParagraphStyle(
-            name='CustomBody',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=6
-        ))
+    def _footer(self) -> Paragraph:
+        """Rodapé com a data de geração"""
+        return Paragraph(
+            f"Gerado automaticamente em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
+            self.styles['Footer']
+        )
+    
+    def render_pdf(
+        self,
+        form_data: Dict,
+        analysis: Dict,
+        response_id: str,
+        is_property: bool = True
+    ) -> bytes:
+        """
+        Gera o PDF em memória, sem gravar em disco
+        
+        Args:
+            form_data: Dados do formulário
+            analysis: Análise do ChatGPT
+            response_id: ID da resposta
+            is_property: Se True, layout de imóvel; se False, de demanda
+            
+        Returns:
+            Conteúdo do PDF
+        """
+        buffer = io.BytesIO()
+        if is_property:
+            self.generate_property_pdf(form_data, analysis, response_id, output_path=buffer)
+        else:
+            self.generate_demand_pdf(form_data, analysis, response_id, output_path=buffer)
+        return buffer.getvalue()
     
     def generate_property_pdf(
         self,
         form_data: Dict,
         analysis: Dict,
         response_id: str,
-        output_path: Optional[str] = None
-    ) -> str:
+        output_path: Optional[Union[str, BinaryIO]] = None
+    ) -> Union[str, BinaryIO]:
         """
         Gera PDF formatado com dados do imóvel
         
@@ -63,12 +218,12 @@ class PDFGenerator:
             form_data: Dados do formulário
             analysis: Análise do ChatGPT
             response_id: ID da resposta
-            output_path: Caminho para salvar PDF (opcional)
+            output_path: Caminho ou objeto file-like (ex: BytesIO) para salvar o PDF (opcional)
             
         Returns:
-            Caminho do arquivo PDF gerado
+            Caminho do arquivo PDF gerado (ou o próprio objeto file-like)
         """
-        if not output_path:
+        if output_path is None:
             os.makedirs('pdfs', exist_ok=True)
             output_path = f"pdfs/imovel_{response_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         
@@ -96,18 +251,7 @@ class PDFGenerator:
             ['Valor/Orçamento', answers.get('valor', answers.get('orcamento', info.get('orcamento', 'Não informado')))],
         ]
         
-        basic_table = Table(basic_data, colWidths=[2*inch, 4*inch])
-        basic_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
+        basic_table = self._table(basic_data, MAIN_TABLE_STYLE)
         story.append(basic_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -128,20 +272,17 @@ class PDFGenerator:
                 characteristics.append(['Área Útil', f"{answers.get('area_util')} m²"])
             
             if characteristics:
-                char_table = Table(characteristics, colWidths=[2*inch, 4*inch])
-                char_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5c6bc0')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-                ]))
+                char_table = self._table(characteristics, DETAIL_TABLE_STYLE)
                 story.append(char_table)
                 story.append(Spacer(1, 0.2*inch))
         
+        # Fotos (miniaturas em cache)
+        photo_grid = self._photo_grid(answers.get('fotos'))
+        if photo_grid:
+            story.append(Paragraph("FOTOS", self.styles['CustomHeading']))
+            story.append(photo_grid)
+            story.append(Spacer(1, 0.2*inch))
+        
         # Análise do ChatGPT
         story.append(Paragraph("ANÁLISE INTELIGENTE", self.styles['CustomHeading']))
         
@@ -155,18 +296,7 @@ class PDFGenerator:
         if analysis.get('resumo'):
             analysis_data.append(['Resumo', analysis.get('resumo')])
         
-        analysis_table = Table(analysis_data, colWidths=[2*inch, 4*inch])
-        analysis_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7986cb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP')
-        ]))
+        analysis_table = self._table(analysis_data, ANALYSIS_TABLE_STYLE)
         story.append(analysis_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -185,17 +315,7 @@ class PDFGenerator:
         
         # Rodapé
         story.append(Spacer(1, 0.3*inch))
-        footer = Paragraph(
-            f"Gerado automaticamente em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
-            ParagraphStyle(
-                name='Footer',
-                parent=self.styles['Normal'],
-                fontSize=8,
-                textColor=colors.grey,
-                alignment=TA_CENTER
-            )
-        )
-        story.append(footer)
+        story.append(self._footer())
         
         # Gera PDF
         doc.build(story)
@@ -206,8 +326,8 @@ class PDFGenerator:
         form_data: Dict,
         analysis: Dict,
         response_id: str,
-        output_path: Optional[str] = None
-    ) -> str:
+        output_path: Optional[Union[str, BinaryIO]] = None
+    ) -> Union[str, BinaryIO]:
         """
         Gera PDF formatado com dados da demanda do cliente
         
@@ -215,12 +335,12 @@ class PDFGenerator:
             form_data: Dados do formulário
             analysis: Análise do ChatGPT
             response_id: ID da resposta
-            output_path: Caminho para salvar PDF (opcional)
+            output_path: Caminho ou objeto file-like (ex: BytesIO) para salvar o PDF (opcional)
             
         Returns:
-            Caminho do arquivo PDF gerado
+            Caminho do arquivo PDF gerado (ou o próprio objeto file-like)
         """
-        if not output_path:
+        if output_path is None:
             os.makedirs('pdfs', exist_ok=True)
             output_path = f"pdfs/demanda_{response_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         
@@ -247,18 +367,7 @@ class PDFGenerator:
             ['Email', answers.get('email', info.get('email', 'Não informado'))],
         ]
         
-        client_table = Table(client_data, colWidths=[2*inch, 4*inch])
-        client_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3949ab')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
+        client_table = self._table(client_data, MAIN_TABLE_STYLE)
         story.append(client_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -277,17 +386,7 @@ class PDFGenerator:
         if answers.get('banheiro'):
             demand_data.append(['Banheiros', str(answers.get('banheiro'))])
         
-        demand_table = Table(demand_data, colWidths=[2*inch, 4*inch])
-        demand_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5c6bc0')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-        ]))
+        demand_table = self._table(demand_data, DETAIL_TABLE_STYLE)
         story.append(demand_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -303,18 +402,7 @@ class PDFGenerator:
         if analysis.get('resumo'):
             analysis_data.append(['Resumo', analysis.get('resumo')])
         
-        analysis_table = Table(analysis_data, colWidths=[2*inch, 4*inch])
-        analysis_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7986cb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP')
-        ]))
+        analysis_table = self._table(analysis_data, ANALYSIS_TABLE_STYLE)
         story.append(analysis_table)
         story.append(Spacer(1, 0.2*inch))
         
@@ -333,17 +421,7 @@ class PDFGenerator:
         
         # Rodapé
         story.append(Spacer(1, 0.3*inch))
-        footer = Paragraph(
-            f"Gerado automaticamente em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
-            ParagraphStyle(
-                name='Footer',
-                parent=self.styles['Normal'],
-                fontSize=8,
-                textColor=colors.grey,
-                alignment=TA_CENTER
-            )
-        )
-        story.append(footer)
+        story.append(self._footer())
         
         # Gera PDF
         doc.build(story)
@@ -0,0 +1,116 @@
+"""
+Serviço de renderização de PDFs em processos separados
+O ReportLab é Python puro e preso ao GIL: em lotes e backfills a geração dos PDFs
+é distribuída entre os núcleos por um ProcessPoolExecutor.
+"""
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+from config import Config
+
+
+PDF_KINDS = ('imovel', 'demanda')
+
+
+def _init_worker():
+    """Carrega o ReportLab e monta os estilos uma vez por processo"""
+    from integrations.pdf_generator import get_pdf_generator
+    get_pdf_generator()
+
+
+def _render_job(job: Dict) -> bytes:
+    """
+    Renderiza um PDF (executado no processo filho)
+
+    Args:
+        job: {'form_data', 'analysis', 'response_id', 'kind'} - apenas dados serializáveis
+
+    Returns:
+        Conteúdo do PDF
+    """
+    from integrations.pdf_generator import get_pdf_generator
+    return get_pdf_generator().render_pdf(
+        form_data=job['form_data'],
+        analysis=job['analysis'],
+        response_id=job['response_id'],
+        is_property=job['kind'] == 'imovel'
+    )
+
+
+def build_job(form_data: Dict, analysis: Dict, response_id: str, kind: str = 'imovel') -> Dict:
+    """Monta um job de renderização validando o tipo de layout"""
+    if kind not in PDF_KINDS:
+        raise ValueError(f"Tipo de PDF inválido: {kind} (use {', '.join(PDF_KINDS)})")
+    return {
+        'form_data': form_data,
+        'analysis': analysis,
+        'response_id': response_id,
+        'kind': kind
+    }
+
+
+class PDFRenderService:
+    """Fila de renderização de PDFs com pool de processos (criado no primeiro uso)"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: Processos de renderização (padrão: PDF_RENDER_WORKERS ou nº de CPUs)
+        """
+        self.max_workers = max_workers or Config.PDF_RENDER_WORKERS or os.cpu_count() or 1
+        self._pool = None
+        self._lock = Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        """Descarta um pool quebrado (processo filho morreu); o próximo uso cria outro"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def submit(self, form_data: Dict, analysis: Dict, response_id: str, kind: str = 'imovel') -> Future:
+        """Envia um PDF para renderização; o Future retorna os bytes do PDF"""
+        job = build_job(form_data, analysis, response_id, kind)
+        try:
+            return self._get_pool().submit(_render_job, job)
+        except BrokenProcessPool:
+            self._reset_pool()
+            return self._get_pool().submit(_render_job, job)
+
+    def render(self, form_data: Dict, analysis: Dict, response_id: str, kind: str = 'imovel') -> bytes:
+        """Renderiza um PDF no pool e espera o resultado"""
+        try:
+            return self.submit(form_data, analysis, response_id, kind).result()
+        except BrokenProcessPool:
+            # Pool indisponível: renderiza no próprio processo para não perder o PDF
+            self._reset_pool()
+            print("⚠️  Aviso: Pool de renderização indisponível, gerando PDF no processo atual")
+            return _render_job(build_job(form_data, analysis, response_id, kind))
+
+    def render_many(self, jobs: Iterable[Dict], chunksize: int = 4) -> List[bytes]:
+        """
+        Renderiza vários PDFs (mesma ordem dos jobs)
+
+        Args:
+            jobs: Jobs montados com build_job
+            chunksize: Jobs enviados por vez a cada processo (reduz overhead de IPC)
+        """
+        return list(self._get_pool().map(_render_job, list(jobs), chunksize=chunksize))
+
+    def shutdown(self, wait: bool = True):
+        """Encerra os processos de renderização"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
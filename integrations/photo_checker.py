@@ -0,0 +1,298 @@
+"""
+Verificação das URLs de fotos dos imóveis do feed
+Foto quebrada no feed penaliza o anúncio nos portais. As URLs são verificadas com
+HEAD em paralelo, fora do caminho da geração do feed, e o resultado (status,
+content-type, tamanho, data da verificação) fica em cache no SQLite com TTL. A
+geração do feed só consulta o cache: URLs sem verificação ou vencidas entram na
+fila e o feed é gerado de novo quando alguma foto muda de situação.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from threading import Lock
+import requests
+from config import Config
+from integrations.http_client import get_http_client
+
+OK = 'ok'
+DEAD = 'dead'      # 4xx ou resposta que não é imagem: não vai (ou é sinalizada) no feed
+ERROR = 'error'    # timeout, falha de conexão, 5xx, 429: situação desconhecida, verifica de novo antes
+
+# Servidores que não aceitam HEAD: verifica com GET (sem baixar o corpo)
+HEAD_NOT_ALLOWED = (405, 501)
+
+# URLs por consulta ao cache (limite de parâmetros do SQLite)
+LOOKUP_BATCH = 500
+
+
+class PhotoURLChecker:
+    """Cache (SQLite) e verificação em paralelo das URLs de fotos"""
+
+    def __init__(
+        self,
+        db_file: str = "photo_checks.db",
+        ttl_hours: Optional[float] = None,
+        retry_hours: Optional[float] = None,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        on_change: Optional[Callable[[Set[str]], None]] = None
+    ):
+        """
+        Args:
+            db_file: Arquivo SQLite do cache
+            ttl_hours: Validade de uma verificação conclusiva (padrão: PHOTO_CHECK_TTL_HOURS)
+            retry_hours: Validade de uma verificação com erro (padrão: PHOTO_CHECK_RETRY_HOURS)
+            workers: Requisições HEAD simultâneas (padrão: PHOTO_CHECK_WORKERS)
+            timeout: Timeout de leitura por URL em segundos (padrão: PHOTO_CHECK_TIMEOUT)
+            on_change: Chamado com as URLs que passaram a estar (ou deixaram de estar) quebradas
+        """
+        self.db_file = db_file
+        self.ttl_seconds = (Config.PHOTO_CHECK_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self.retry_seconds = (Config.PHOTO_CHECK_RETRY_HOURS if retry_hours is None else retry_hours) * 3600
+        self.workers = max(1, Config.PHOTO_CHECK_WORKERS if workers is None else workers)
+        self.on_change = on_change
+        self.http = get_http_client(
+            'photo_check',
+            read_timeout=Config.PHOTO_CHECK_TIMEOUT if timeout is None else timeout,
+            max_retries=1,
+            max_concurrent=self.workers
+        )
+        self.lock = Lock()
+        self._cond = threading.Condition()
+        self._pending: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.stats = {'checked': 0, 'dead_found': 0, 'errors': 0, 'last_batch_seconds': None}
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS photo_checks (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    http_status INTEGER,
+                    content_type TEXT,
+                    size INTEGER,
+                    error TEXT,
+                    checked_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_photo_checks_checked_at
+                ON photo_checks (checked_at)
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar cache de fotos: {e}")
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def lookup(self, urls: Iterable[str]) -> Dict[str, Dict]:
+        """Última verificação de cada URL (as nunca verificadas ficam de fora)"""
+        wanted = sorted(set(urls))
+        rows = []
+        conn = self._connect()
+        for i in range(0, len(wanted), LOOKUP_BATCH):
+            batch = wanted[i:i + LOOKUP_BATCH]
+            rows += conn.execute(
+                "SELECT url, status, http_status, content_type, size, error, checked_at FROM photo_checks "
+                f"WHERE url IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+        conn.close()
+        return {
+            row[0]: {
+                'status': row[1],
+                'http_status': row[2],
+                'content_type': row[3],
+                'size': row[4],
+                'error': row[5],
+                'checked_at': row[6]
+            }
+            for row in rows
+        }
+
+    def is_stale(self, check: Optional[Dict], now: Optional[float] = None) -> bool:
+        """Sem verificação ou verificação vencida (erros vencem antes)"""
+        if not check:
+            return True
+        ttl = self.retry_seconds if check['status'] == ERROR else self.ttl_seconds
+        return (now or time.time()) - check['checked_at'] >= ttl
+
+    def dead_urls(self, urls: Iterable[str], schedule_stale: bool = True) -> Set[str]:
+        """
+        URLs quebradas segundo o cache (sem requisição; usado na geração do feed)
+
+        Args:
+            urls: URLs das fotos
+            schedule_stale: Coloca na fila as URLs sem verificação ou vencidas
+        """
+        urls = {url for url in urls if url}
+        checks = self.lookup(urls)
+        if schedule_stale:
+            now = time.time()
+            stale = {url for url in urls if self.is_stale(checks.get(url), now)}
+            if stale:
+                self.schedule(stale)
+        return {url for url, check in checks.items() if check['status'] == DEAD}
+
+    def _save(self, results: List[Dict]):
+        with self.lock:
+            conn = self._connect()
+            conn.executemany('''
+                INSERT OR REPLACE INTO photo_checks
+                (url, status, http_status, content_type, size, error, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (r['url'], r['status'], r['http_status'], r['content_type'], r['size'], r['error'], r['checked_at'])
+                for r in results
+            ])
+            conn.commit()
+            conn.close()
+
+    def purge(self, max_age_days: float = 30) -> int:
+        """Apaga verificações antigas (URLs que saíram do feed não são mais verificadas)"""
+        with self.lock:
+            conn = self._connect()
+            cursor = conn.execute("DELETE FROM photo_checks WHERE checked_at < ?", (time.time() - max_age_days * 86400,))
+            conn.commit()
+            conn.close()
+            return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Verificação
+    # ------------------------------------------------------------------
+
+    def check_url(self, url: str) -> Dict:
+        """Verifica uma URL com HEAD (GET sem corpo se o servidor não aceitar HEAD)"""
+        result = {
+            'url': url, 'status': ERROR, 'http_status': None,
+            'content_type': None, 'size': None, 'error': None, 'checked_at': time.time()
+        }
+        try:
+            try:
+                response = self.http.request('HEAD', url, allow_redirects=True)
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code not in HEAD_NOT_ALLOWED:
+                    raise
+                response = self.http.request('GET', url, allow_redirects=True, stream=True)
+                response.close()
+        except requests.exceptions.HTTPError as e:
+            response = e.response
+            if response is None:
+                result['error'] = str(e)[:300]
+                return result
+        except requests.exceptions.RequestException as e:
+            result['error'] = f"{e.__class__.__name__}: {str(e)[:250]}"
+            return result
+
+        status_code = response.status_code
+        content_type = (response.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        size = response.headers.get('Content-Length')
+        result['http_status'] = status_code
+        result['content_type'] = content_type or None
+        result['size'] = int(size) if size and size.isdigit() else None
+
+        if status_code >= 500 or status_code == 429:
+            result['error'] = f"HTTP {status_code}"
+        elif status_code >= 400:
+            result['status'] = DEAD
+            result['error'] = f"HTTP {status_code}"
+        elif content_type and not content_type.startswith('image/'):
+            # Página de erro/redirecionamento para HTML no lugar da foto
+            result['status'] = DEAD
+            result['error'] = f"Content-Type {content_type}"
+        else:
+            result['status'] = OK
+        return result
+
+    def check_urls(self, urls: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Verifica as URLs em paralelo, grava no cache e avisa on_change
+
+        Returns:
+            Resultado de cada URL
+        """
+        urls = sorted({url for url in urls if url})
+        if not urls:
+            return {}
+        previous = self.lookup(urls)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(urls)), thread_name_prefix='photo-check') as executor:
+            results = list(executor.map(self.check_url, urls))
+        self._save(results)
+
+        self.stats['checked'] += len(results)
+        self.stats['dead_found'] += sum(1 for r in results if r['status'] == DEAD)
+        self.stats['errors'] += sum(1 for r in results if r['status'] == ERROR)
+        self.stats['last_batch_seconds'] = round(time.perf_counter() - start, 3)
+
+        # Só interessa quem entrou ou saiu de "quebrada" (erro transitório não muda o feed)
+        changed = {
+            r['url'] for r in results
+            if r['status'] != ERROR and (r['status'] == DEAD) != (previous.get(r['url'], {}).get('status') == DEAD)
+        }
+        if changed and self.on_change:
+            try:
+                self.on_change(changed)
+            except Exception as e:
+                print(f"⚠️  Aviso: Erro ao atualizar o feed após verificar fotos: {e}")
+        return {r['url']: r for r in results}
+
+    # ------------------------------------------------------------------
+    # Fila em segundo plano
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Inicia a thread que verifica as URLs da fila (daemon)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._worker, name='photo-checker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Sinaliza a thread para parar (o lote em andamento termina)"""
+        self._stopping = True
+        with self._cond:
+            self._cond.notify_all()
+        self._thread = None
+
+    def schedule(self, urls: Iterable[str]):
+        """Coloca URLs na fila de verificação (não bloqueia)"""
+        self.start()
+        with self._cond:
+            self._pending.update(url for url in urls if url)
+            self._cond.notify_all()
+
+    def _worker(self):
+        while not self._stopping:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping:
+                    return
+                batch = set(self._pending)
+                self._pending.clear()
+            try:
+                self.check_urls(batch)
+            except Exception as e:
+                print(f"❌ Erro ao verificar fotos: {e}")
+
+    def get_stats(self) -> Dict:
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM photo_checks GROUP BY status").fetchall())
+        conn.close()
+        with self._cond:
+            pending = len(self._pending)
+        return {**self.stats, 'cached': counts, 'pending': pending}
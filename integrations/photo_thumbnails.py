@@ -0,0 +1,304 @@
+"""
+Miniaturas das fotos dos imóveis para os PDFs
+As fotos são baixadas em paralelo, reduzidas uma única vez (Pillow) e guardadas
+num cache em disco endereçado pelo conteúdo (sha256 da imagem original): a mesma
+foto em URLs diferentes vira um único arquivo. Um índice SQLite liga cada URL à
+sua miniatura, então gerar de novo o PDF do mesmo imóvel não baixa nem decodifica
+nada. O cache tem limite de tamanho e remove as miniaturas usadas há mais tempo (LRU).
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from threading import Lock
+import requests
+from PIL import Image, ImageOps
+from config import Config
+from integrations.http_client import get_http_client
+
+# URL que falhou (404, não é imagem...) só é tentada de novo depois disso
+FAILED_RETRY_SECONDS = 3600
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def photo_url_list(fotos) -> List[str]:
+    """URLs das fotos (lista de URLs, de {'url': ...} ou texto único)"""
+    if not fotos:
+        return []
+    if not isinstance(fotos, (list, tuple)):
+        fotos = [fotos]
+    urls = []
+    for foto in fotos:
+        url = foto.get('url') if isinstance(foto, dict) else foto
+        if isinstance(url, str) and url.strip().lower().startswith(('http://', 'https://')):
+            urls.append(url.strip())
+    return urls
+
+
+class ThumbnailCache:
+    """Cache em disco (endereçado pelo conteúdo, com LRU) das miniaturas das fotos"""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_mb: Optional[float] = None,
+        size_px: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_download_mb: Optional[float] = None,
+        url_ttl_days: Optional[float] = None
+    ):
+        """
+        Args:
+            directory: Pasta do cache (padrão: PDF_PHOTO_CACHE_DIR)
+            max_mb: Tamanho máximo do cache em MB (0 = sem limite; padrão: PDF_PHOTO_CACHE_MAX_MB)
+            size_px: Maior lado da miniatura em pixels (padrão: PDF_PHOTO_THUMB_PX)
+            workers: Downloads simultâneos (padrão: PDF_PHOTO_WORKERS)
+            max_download_mb: Fotos maiores que isso são ignoradas (padrão: PDF_PHOTO_MAX_DOWNLOAD_MB)
+            url_ttl_days: Dias até baixar de novo a foto de uma URL já conhecida
+                          (padrão: PDF_PHOTO_URL_TTL_DAYS)
+        """
+        self.directory = directory or Config.PDF_PHOTO_CACHE_DIR
+        self.max_bytes = int((Config.PDF_PHOTO_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.size_px = size_px or Config.PDF_PHOTO_THUMB_PX
+        self.workers = max(1, workers or Config.PDF_PHOTO_WORKERS)
+        self.max_download_bytes = int(
+            (Config.PDF_PHOTO_MAX_DOWNLOAD_MB if max_download_mb is None else max_download_mb) * 1024 * 1024
+        )
+        self.url_ttl_seconds = (Config.PDF_PHOTO_URL_TTL_DAYS if url_ttl_days is None else url_ttl_days) * 86400
+        self.db_file = os.path.join(self.directory, 'index.db')
+        self.http = get_http_client('photo_fetch', max_retries=1, max_concurrent=self.workers)
+        self.lock = Lock()
+        self._failed: Dict[str, float] = {}
+        self.stats = {'hits': 0, 'downloads': 0, 'deduplicated': 0, 'failures': 0, 'evicted': 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    url TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar cache de miniaturas: {e}")
+
+    def _path(self, digest: str) -> str:
+        """Miniatura de um conteúdo (subpasta pelos 2 primeiros caracteres do hash)"""
+        return os.path.join(self.directory, digest[:2], f"{digest}_{self.size_px}.jpg")
+
+    def _lookup(self, urls: List[str]) -> Dict[str, str]:
+        """URL -> caminho da miniatura, para as URLs com miniatura válida no cache"""
+        if not urls:
+            return {}
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT url, digest, fetched_at FROM thumbnails WHERE url IN ({','.join('?' * len(urls))})",
+            urls
+        ).fetchall()
+        conn.close()
+        now = time.time()
+        found = {}
+        for url, digest, fetched_at in rows:
+            path = self._path(digest)
+            if (not self.url_ttl_seconds or now - fetched_at < self.url_ttl_seconds) and os.path.exists(path):
+                found[url] = path
+        return found
+
+    def _download(self, url: str) -> Optional[bytes]:
+        """Baixa a foto em partes, desistindo assim que passar de max_download_bytes"""
+        try:
+            response = self.http.get(url, stream=True)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Aviso: Não foi possível baixar a foto {url}: {e}")
+            return None
+        try:
+            length = response.headers.get('Content-Length')
+            if self.max_download_bytes and length and length.isdigit() and int(length) > self.max_download_bytes:
+                print(f"⚠️  Aviso: Foto grande demais ignorada ({int(length) / 1024 / 1024:.1f} MB): {url}")
+                return None
+            chunks = []
+            total = 0
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+                total += len(chunk)
+                if self.max_download_bytes and total > self.max_download_bytes:
+                    print(f"⚠️  Aviso: Foto grande demais ignorada (mais de "
+                          f"{self.max_download_bytes / 1024 / 1024:.0f} MB): {url}")
+                    return None
+                chunks.append(chunk)
+            return b''.join(chunks) or None
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Aviso: Não foi possível baixar a foto {url}: {e}")
+            return None
+        finally:
+            response.close()
+
+    def _make_thumbnail(self, data: bytes) -> bytes:
+        """Decodifica, corrige a orientação (EXIF), reduz e recomprime em JPEG"""
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.size_px, self.size_px))
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=80, optimize=True)
+            return output.getvalue()
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        """Conteúdo da miniatura (None se outro processo acabou de removê-la)"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _fetch(self, url: str) -> Optional[bytes]:
+        """Baixa a foto e grava a miniatura (se o conteúdo ainda não estiver no cache)"""
+        thumbnail = self._fetch_thumbnail(url)
+        if thumbnail is None:
+            self.stats['failures'] += 1
+            self._failed[url] = time.time()
+        return thumbnail
+
+    def _fetch_thumbnail(self, url: str) -> Optional[bytes]:
+        data = self._download(url)
+        if data is None:
+            return None
+        self.stats['downloads'] += 1
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        # Mesma foto já em cache por outra URL: não decodifica de novo
+        thumbnail = self._read(path)
+        if thumbnail is not None:
+            self.stats['deduplicated'] += 1
+        else:
+            try:
+                thumbnail = self._make_thumbnail(data)
+            except Exception as e:
+                print(f"⚠️  Aviso: Foto inválida em {url}: {e}")
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(thumbnail)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (url, digest, fetched_at) VALUES (?, ?, ?)",
+                (url, digest, time.time())
+            )
+            conn.commit()
+            conn.close()
+        return thumbnail
+
+    def get_thumbnails(self, urls: Iterable[str]) -> List[bytes]:
+        """
+        Miniaturas (JPEG em memória) das fotos, na ordem das URLs; fotos que falharem ficam de fora
+
+        As que estão no cache são lidas direto (e marcadas como usadas agora); as
+        demais são baixadas em paralelo. O conteúdo é devolvido já lido: a remoção
+        de um arquivo pelo LRU de outro processo não afeta o PDF em geração.
+        """
+        urls = list(dict.fromkeys(urls))
+        thumbnails: Dict[str, bytes] = {}
+        for url, path in self._lookup(urls).items():
+            data = self._read(path)
+            if data is not None:
+                thumbnails[url] = data
+        self.stats['hits'] += len(thumbnails)
+
+        now = time.time()
+        missing = [
+            url for url in urls
+            if url not in thumbnails and now - self._failed.get(url, 0) >= FAILED_RETRY_SECONDS
+        ]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing)), thread_name_prefix='photo-fetch') as executor:
+                for url, data in zip(missing, executor.map(self._fetch, missing)):
+                    if data:
+                        thumbnails[url] = data
+            self.enforce_limit()
+
+        return [thumbnails[url] for url in urls if url in thumbnails]
+
+    def _list_files(self):
+        """Lista (caminho, mtime, tamanho) das miniaturas, da usada há mais tempo para a mais recente"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.jpg'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((path, stat.st_mtime, stat.st_size))
+        files.sort(key=lambda f: f[1])
+        return files
+
+    def enforce_limit(self, keep: Optional[set] = None) -> Dict:
+        """
+        Remove as miniaturas usadas há mais tempo até o cache caber no limite
+
+        Args:
+            keep: Caminhos que nunca são removidos
+
+        Returns:
+            {'removed', 'remaining_bytes'}
+        """
+        summary = {'removed': 0, 'remaining_bytes': 0}
+        with self.lock:
+            files = self._list_files()
+            total = sum(size for _, _, size in files)
+            if self.max_bytes:
+                for path, _, size in files:
+                    if total <= self.max_bytes:
+                        break
+                    if keep and path in keep:
+                        continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    summary['removed'] += 1
+            summary['remaining_bytes'] = total
+        # Entradas do índice que apontam para miniaturas removidas viram miss em _lookup
+        self.stats['evicted'] += summary['removed']
+        return summary
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'cache_bytes': sum(size for _, _, size in self._list_files())}
+
+
+_instance = None
+_instance_lock = Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Retorna o cache de miniaturas compartilhado do processo"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = ThumbnailCache()
+    return _instance
@@ -0,0 +1,465 @@
+"""
+Armazenamento dos imóveis do feed do Chaves na Mão (SQLite)
+Fonte dos dados do feed: cada imóvel é gravado uma vez, com data de atualização
+e versão (cursor) indexadas, para que o feed completo seja gerado sem reler o XML
+e consumidores incrementais peçam só o que mudou (feed.xml?since= / ?cursor=).
+
+Ciclo de vida: cada imóvel expira (TTL a partir da última alteração ou
+data_expiracao própria), pode ser removido logicamente (soft delete), imóveis de
+teste são removidos automaticamente e o feed tem um limite de imóveis ativos
+(os atualizados há mais tempo saem primeiro). Removidos são apagados de vez
+depois do período de retenção. Remoções ganham nova versão e aparecem no feed
+incremental como lápides (get_removed); o contador de versões fica numa tabela
+própria para nunca voltar atrás.
+"""
+import json
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from threading import Lock
+from config import Config
+from integrations.listing_fingerprints import fingerprint
+
+# Colunas adicionadas depois da criação da tabela (migração de bancos existentes)
+EXTRA_COLUMNS = {
+    'category': 'TEXT',
+    'expires_at': 'REAL',
+    'deleted_at': 'REAL',
+    'delete_reason': 'TEXT',
+}
+
+ACTIVE = "deleted_at IS NULL AND (expires_at IS NULL OR expires_at > ?)"
+
+
+def property_key(property_data: Dict) -> Optional[str]:
+    """Chave do imóvel no feed: codigo ou referencia"""
+    key = property_data.get('codigo', property_data.get('referencia'))
+    return str(key).strip() if key else None
+
+
+def _explicit_expiry(property_data: Dict) -> Optional[float]:
+    """data_expiracao do imóvel (ISO 8601) como timestamp, se houver"""
+    value = property_data.get('data_expiracao')
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class PropertyStore:
+    """Imóveis do feed com data de atualização, versão monotônica e ciclo de vida"""
+
+    def __init__(
+        self,
+        db_file: str = "properties.db",
+        ttl_days: Optional[float] = None,
+        max_listings: Optional[int] = None,
+        deleted_retention_days: Optional[float] = None,
+        test_prefixes: Optional[Tuple[str, ...]] = None
+    ):
+        """
+        Args:
+            db_file: Arquivo SQLite dos imóveis
+            ttl_days: Dias sem alteração até o imóvel expirar (0 = não expira;
+                      padrão: CHAVES_NA_MAO_LISTING_TTL_DAYS)
+            max_listings: Limite de imóveis ativos no feed (0 = sem limite;
+                          padrão: CHAVES_NA_MAO_FEED_MAX_LISTINGS)
+            deleted_retention_days: Dias até apagar de vez um imóvel removido
+                                    (padrão: CHAVES_NA_MAO_DELETED_RETENTION_DAYS)
+            test_prefixes: Prefixos de referência de imóveis de teste, removidos
+                           automaticamente (padrão: CHAVES_NA_MAO_TEST_PREFIXES)
+        """
+        self.db_file = db_file
+        self.ttl_days = Config.CHAVES_NA_MAO_LISTING_TTL_DAYS if ttl_days is None else ttl_days
+        self.max_listings = Config.CHAVES_NA_MAO_FEED_MAX_LISTINGS if max_listings is None else max_listings
+        self.deleted_retention_days = (
+            Config.CHAVES_NA_MAO_DELETED_RETENTION_DAYS if deleted_retention_days is None else deleted_retention_days
+        )
+        self.test_prefixes = tuple(Config.get_test_prefixes() if test_prefixes is None else test_prefixes)
+        self.lock = Lock()
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_database(self):
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS properties (
+                    property_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    category TEXT,
+                    expires_at REAL,
+                    deleted_at REAL,
+                    delete_reason TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(properties)").fetchall()]
+            for column, column_type in EXTRA_COLUMNS.items():
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE properties ADD COLUMN {column} {column_type}")
+            # Contador de versões separado da tabela: apagar de vez (purge) a linha com a
+            # maior versão não pode fazer o cursor voltar atrás
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS property_store_meta (
+                    name TEXT PRIMARY KEY,
+                    value NUMERIC NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                INSERT OR IGNORE INTO property_store_meta (name, value)
+                SELECT 'version', COALESCE(MAX(version), 0) FROM properties
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_properties_expires_at
+                ON properties (expires_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_properties_deleted_at
+                ON properties (deleted_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_properties_category
+                ON properties (category)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_properties_updated_at
+                ON properties (updated_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_properties_version
+                ON properties (version)
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️  Aviso: Erro ao inicializar banco de dados de imóveis: {e}")
+
+    @staticmethod
+    def _meta(conn, name: str, default=0):
+        row = conn.execute("SELECT value FROM property_store_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, name: str, value):
+        conn.execute("INSERT OR REPLACE INTO property_store_meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _reserve_versions(self, conn, count: int) -> int:
+        """Reserva count versões novas (conexão já em transação); retorna a última versão usada antes delas"""
+        version = self._meta(conn, 'version')
+        self._set_meta(conn, 'version', version + count)
+        return version
+
+    def upsert_many(self, properties: Iterable[Dict]) -> List[str]:
+        """
+        Grava os imóveis (novos ou alterados) numa única transação
+
+        Imóveis sem mudança de conteúdo não ganham nova versão, então não
+        reaparecem no feed incremental (nem voltam ao feed se já tinham sido
+        removidos ou expirado). Sem 'categoria' nos dados (ex: imóvel relido de
+        um XML), a categoria já gravada é mantida. Só imóveis novos ou alterados
+        têm a expiração recalculada (TTL a partir desta alteração, ou data_expiracao
+        do imóvel): um imóvel ainda presente em imoveis/ mas com o mesmo conteúdo
+        mantém a expiração antiga e continua expirado depois do TTL.
+
+        Returns:
+            Chaves dos imóveis novos ou alterados
+        """
+        rows = []
+        for property_data in properties:
+            key = property_key(property_data)
+            if key:
+                rows.append((key, property_data, fingerprint(property_data)))
+        if not rows:
+            return []
+
+        now = time.time()
+        changed = []
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                version = self._meta(conn, 'version')
+                for key, property_data, content_hash in rows:
+                    row = conn.execute(
+                        "SELECT fingerprint, category FROM properties WHERE property_key = ?", (key,)
+                    ).fetchone()
+                    if row and row[1] and not property_data.get('categoria'):
+                        property_data = {**property_data, 'categoria': row[1]}
+                        content_hash = fingerprint(property_data)
+                    if row and row[0] == content_hash:
+                        continue
+                    version += 1
+                    changed.append(key)
+                    expires_at = _explicit_expiry(property_data)
+                    if expires_at is None and self.ttl_days:
+                        expires_at = now + self.ttl_days * 86400
+                    conn.execute('''
+                        INSERT INTO properties
+                            (property_key, data, fingerprint, version, category, expires_at, created_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(property_key) DO UPDATE SET
+                            data = excluded.data,
+                            fingerprint = excluded.fingerprint,
+                            version = excluded.version,
+                            category = excluded.category,
+                            expires_at = excluded.expires_at,
+                            deleted_at = NULL,
+                            delete_reason = NULL,
+                            updated_at = excluded.updated_at
+                    ''', (key, json.dumps(property_data, ensure_ascii=False, default=str),
+                          content_hash, version, property_data.get('categoria'), expires_at, now, now))
+                self._set_meta(conn, 'version', version)
+                conn.commit()
+            finally:
+                conn.close()
+        return changed
+
+    def upsert(self, property_data: Dict) -> bool:
+        """Grava um imóvel; True se ele é novo ou mudou"""
+        return bool(self.upsert_many([property_data]))
+
+    def get_all(self, category: Optional[str] = None) -> List[Dict]:
+        """Imóveis ativos (ou os de uma categoria), na ordem em que entraram no feed"""
+        query = f"SELECT data FROM properties WHERE {ACTIVE}"
+        params = [time.time()]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        query += " ORDER BY created_at, property_key"
+        conn = self._connect()
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    @staticmethod
+    def _delta_filter(query: str, params: List, since: Optional[float], after_version: Optional[int]):
+        if since is not None:
+            query += " AND updated_at > ?"
+            params.append(since)
+        if after_version is not None:
+            query += " AND version > ?"
+            params.append(after_version)
+        return query + " ORDER BY version", params
+
+    def get_changed(self, since: Optional[float] = None, after_version: Optional[int] = None) -> List[Dict]:
+        """
+        Imóveis ativos novos ou alterados depois de um instante e/ou de uma versão
+
+        Args:
+            since: Timestamp (epoch); retorna os atualizados depois dele
+            after_version: Versão (cursor); retorna os gravados depois dela
+
+        Returns:
+            Imóveis em ordem de versão
+        """
+        query, params = self._delta_filter(
+            f"SELECT data FROM properties WHERE {ACTIVE}", [time.time()], since, after_version
+        )
+        conn = self._connect()
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_removed(self, since: Optional[float] = None, after_version: Optional[int] = None) -> List[Dict]:
+        """
+        Imóveis que saíram do feed (removidos, expirados, de teste, excedentes) depois
+        de um instante e/ou de uma versão: as "lápides" do feed incremental
+
+        Returns:
+            [{'referencia', 'removido_em', 'motivo'}] em ordem de versão
+        """
+        now = time.time()
+        query, params = self._delta_filter(
+            f"SELECT property_key, deleted_at, delete_reason, expires_at FROM properties WHERE NOT ({ACTIVE})",
+            [now], since, after_version
+        )
+        conn = self._connect()
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [
+            {
+                'referencia': key,
+                'removido_em': deleted_at if deleted_at is not None else expires_at,
+                'motivo': reason or 'expired'
+            }
+            for key, deleted_at, reason, expires_at in rows
+        ]
+
+    def needs_full_resync(self, since: Optional[float] = None, after_version: Optional[int] = None) -> bool:
+        """
+        True se remoções posteriores ao ponto pedido já foram apagadas de vez (purge):
+        o consumidor precisa do feed completo, o incremental não as traria mais
+        """
+        conn = self._connect()
+        purged_version = self._meta(conn, 'purged_version')
+        purged_until = self._meta(conn, 'purged_until')
+        conn.close()
+        if after_version is not None and after_version < purged_version:
+            return True
+        return since is not None and since < purged_until
+
+    def current_version(self) -> int:
+        """Versão mais recente (cursor para a próxima consulta incremental)"""
+        conn = self._connect()
+        version = self._meta(conn, 'version')
+        conn.close()
+        return version
+
+    def version_at(self, timestamp: float) -> int:
+        """Última versão gravada até o instante (cursor de um feed gerado nesse instante)"""
+        conn = self._connect()
+        version = conn.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM properties WHERE updated_at <= ?", (timestamp,)
+        ).fetchone()[0]
+        conn.close()
+        return version
+
+    def count(self) -> int:
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+        conn.close()
+        return total
+
+    def is_test_key(self, key: Optional[str]) -> bool:
+        """Referência de imóvel de teste (TEST_..., REAL_TEST_...)"""
+        return bool(key) and any(key.startswith(prefix) for prefix in self.test_prefixes)
+
+    def _soft_delete(self, conn, keys: List[str], reason: str, now: float) -> List[str]:
+        """Marca os imóveis como removidos com nova versão (o feed muda); conexão já em transação"""
+        if not keys:
+            return []
+        version = self._reserve_versions(conn, len(keys))
+        conn.executemany('''
+            UPDATE properties
+            SET deleted_at = ?, delete_reason = ?, version = ?, updated_at = ?
+            WHERE property_key = ?
+        ''', [(now, reason, version + i + 1, now, key) for i, key in enumerate(keys)])
+        return keys
+
+    def soft_delete(self, keys: Iterable[str], reason: str = 'manual') -> List[str]:
+        """
+        Remove imóveis do feed mantendo o registro até o fim da retenção
+
+        Returns:
+            Chaves efetivamente removidas (ativas até agora)
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                placeholders = ', '.join('?' for _ in keys)
+                active = [row[0] for row in conn.execute(
+                    f"SELECT property_key FROM properties WHERE property_key IN ({placeholders}) AND {ACTIVE}",
+                    (*keys, now)
+                ).fetchall()]
+                removed = self._soft_delete(conn, active, reason, now)
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+    def enforce_policy(self) -> Dict:
+        """
+        Aplica o ciclo de vida: expira, remove imóveis de teste, aplica o limite
+        de imóveis ativos e apaga de vez os removidos há mais que a retenção
+
+        Returns:
+            {'expired', 'test', 'evicted', 'purged', 'active', 'changed_keys'}
+        """
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                expired = [row[0] for row in conn.execute(
+                    "SELECT property_key FROM properties WHERE deleted_at IS NULL AND expires_at <= ?", (now,)
+                ).fetchall()]
+                self._soft_delete(conn, expired, 'expired', now)
+
+                test = []
+                for prefix in self.test_prefixes:
+                    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    test += [row[0] for row in conn.execute(
+                        "SELECT property_key FROM properties WHERE deleted_at IS NULL "
+                        "AND property_key LIKE ? ESCAPE '\\'",
+                        (escaped + '%',)
+                    ).fetchall()]
+                self._soft_delete(conn, test, 'test', now)
+
+                evicted = []
+                active = conn.execute(f"SELECT COUNT(*) FROM properties WHERE {ACTIVE}", (now,)).fetchone()[0]
+                if self.max_listings and active > self.max_listings:
+                    # Excedente: saem os imóveis atualizados há mais tempo
+                    evicted = [row[0] for row in conn.execute(
+                        f"SELECT property_key FROM properties WHERE {ACTIVE} ORDER BY updated_at, version LIMIT ?",
+                        (now, active - self.max_listings)
+                    ).fetchall()]
+                    self._soft_delete(conn, evicted, 'evicted', now)
+                    active -= len(evicted)
+
+                # Lápides apagadas de vez: guarda até onde foram, para o incremental
+                # pedir o feed completo a quem tem cursor anterior
+                cutoff = now - self.deleted_retention_days * 86400
+                horizon = conn.execute(
+                    "SELECT MAX(version), MAX(updated_at) FROM properties WHERE deleted_at IS NOT NULL AND deleted_at < ?",
+                    (cutoff,)
+                ).fetchone()
+                if horizon[0] is not None:
+                    self._set_meta(conn, 'purged_version', max(self._meta(conn, 'purged_version'), horizon[0]))
+                    self._set_meta(conn, 'purged_until', max(self._meta(conn, 'purged_until'), horizon[1]))
+                purged = conn.execute(
+                    "DELETE FROM properties WHERE deleted_at IS NOT NULL AND deleted_at < ?", (cutoff,)
+                ).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+
+        return {
+            'expired': len(expired),
+            'test': len(test),
+            'evicted': len(evicted),
+            'purged': purged,
+            'active': active,
+            'changed_keys': expired + test + evicted
+        }
+
+    def get_stats(self) -> Dict:
+        """Retorna estatísticas dos imóveis"""
+        try:
+            now = time.time()
+            conn = self._connect()
+            row = conn.execute(f'''
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN {ACTIVE} THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN deleted_at IS NOT NULL THEN 1 ELSE 0 END),
+                    MAX(updated_at),
+                    (SELECT value FROM property_store_meta WHERE name = 'version')
+                FROM properties
+            ''', (now,)).fetchone()
+            conn.close()
+            return {
+                'total': row[0],
+                'active': row[1] or 0,
+                'deleted': row[2] or 0,
+                'max_listings': self.max_listings or None,
+                'last_updated_at': row[3],
+                'version': row[4] or 0
+            }
+        except Exception as e:
+            print(f"❌ Erro ao obter estatísticas de imóveis: {e}")
+            return {'total': 0, 'active': 0, 'deleted': 0, 'max_listings': None, 'last_updated_at': None, 'version': 0}
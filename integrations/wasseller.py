@@ -7,6 +7,18 @@ import requests
 import json
 import os
 from config import Config
+from integrations.circuit_breaker import circuit_protected
+
+
+class WhatsAppDisconnectedError(ValueError):
+    """
+    WhatsApp desconectado no painel Waseller (HTTP 501)
+
+    Continua sendo ValueError para quem já trata o erro, mas carrega o status 501:
+    o circuit breaker conta como falha do serviço (o envio não vai funcionar
+    até alguém reconectar o WhatsApp).
+    """
+    status_code = 501
 
 
 class WassellerIntegration:
@@ -34,6 +46,7 @@ class WassellerIntegration:
         # Carrega configuração de grupos e exceções
         self.config = self._load_config()
     
+    @circuit_protected('wasseller')
     def send_message(
         self,
         phone_number: str,
@@ -71,7 +84,10 @@ class WassellerIntegration:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = requests.post(
+                url, json=payload, headers=self.headers,
+                timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+            )
             
             # Trata diferentes códigos de status conforme documentação
             if response.status_code == 200:
@@ -85,7 +101,7 @@ class WassellerIntegration:
             elif response.status_code == 501:
                 error_data = response.json() if response.text else {}
                 error_msg = error_data.get('message', 'Página do Whatsapp não aberta ou API desconectada.')
-                raise ValueError(
+                raise WhatsAppDisconnectedError(
                     f"WhatsApp desconectado: {error_msg}\n"
                     f"⚠️  AÇÃO NECESSÁRIA: Acesse o painel Waseller e conecte/autentique o WhatsApp.\n"
                     f"   O token está válido, mas o WhatsApp precisa estar online no painel para enviar mensagens."
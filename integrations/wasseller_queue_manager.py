@@ -6,6 +6,7 @@ import time
 import requests
 from typing import Dict, Optional, Callable
 from datetime import datetime, timedelta
+from integrations.circuit_breaker import CircuitOpenError, get_breaker
 from integrations.message_queue import MessageQueue
 from integrations.wasseller import WassellerIntegration
 
@@ -116,8 +117,16 @@ class WassellerQueueManager:
         Returns:
             Resultado do envio
         """
-        # Verifica disponibilidade
-        availability = self.check_availability()
+        # Circuito aberto (Wasseller fora do ar): vai direto para a fila, sem esperar
+        if not get_breaker('wasseller').allows_calls():
+            availability = {
+                'available': False,
+                'message': 'Wasseller indisponível (circuito aberto)',
+                'reason': 'circuit_open'
+            }
+        else:
+            # Verifica disponibilidade
+            availability = self.check_availability()
         
         if not availability.get('available', True):
             if use_queue:
@@ -167,6 +176,12 @@ class WassellerQueueManager:
                             time.sleep(self.check_interval)
                             continue
                     
+            except CircuitOpenError as e:
+                # Circuito abriu durante as tentativas: não insiste, enfileira
+                last_error = str(e)
+                attempts += 1
+                break
+                
             except ValueError as e:
                 error_msg = str(e)
                 last_error = error_msg
@@ -244,6 +259,11 @@ class WassellerQueueManager:
         
         try:
             for _ in range(max_messages):
+                # Circuito aberto: deixa as mensagens na fila até o serviço voltar
+                if not get_breaker('wasseller').allows_calls():
+                    results['circuit_open'] = True
+                    break
+                
                 message = self.queue.get_next_message(max_attempts=self.max_retries)
                 
                 if not message:
@@ -275,6 +295,12 @@ class WassellerQueueManager:
                         )
                         results['failed'] += 1
                         
+                except CircuitOpenError:
+                    # Circuito abriu agora: a mensagem continua pendente, sem gastar tentativa
+                    results['still_pending'] += 1
+                    results['circuit_open'] = True
+                    break
+                
                 except Exception as e:
                     self.queue.mark_failed(message['id'], str(e))
                     results['failed'] += 1
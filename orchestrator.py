@@ -3,89 +3,305 @@ Sistema de orquestração principal para integração de ferramentas imobiliári
 """
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 from datetime import datetime
 import xml.etree.ElementTree as ET
-from integrations.google_forms import GoogleFormsIntegration
-from integrations.chatgpt import ChatGPTIntegration
-from integrations.clickup import ClickUpIntegration
-from integrations.google_drive import GoogleDriveIntegration
-from integrations.chaves_na_mao import ChavesNaMaoIntegration
-from integrations.wasseller import WassellerIntegration
-from integrations.wasseller_queue_manager import WassellerQueueManager
-from integrations.email_fallback import EmailFallback
+from integrations.circuit_breaker import CircuitOpenError, get_breaker, is_service_failure
+from integrations.form_sync import FormSyncCoordinator, next_watermark
+from integrations.pdf_archive import PDFArchive
 from config import Config
 
+# As integrações (googleapiclient, openai, requests...) só são importadas no
+# primeiro uso, dentro das propriedades abaixo
+if TYPE_CHECKING:
+    from integrations.google_forms import GoogleFormsIntegration
+    from integrations.chatgpt import ChatGPTIntegration
+    from integrations.clickup import ClickUpIntegration
+    from integrations.google_drive import GoogleDriveIntegration
+    from integrations.chaves_na_mao import ChavesNaMaoIntegration
+    from integrations.wasseller import WassellerIntegration
+    from integrations.wasseller_queue_manager import WassellerQueueManager
+    from integrations.email_fallback import EmailFallback
+    from integrations.forms_watch import FormsWatchManager
+    from integrations.pdf_render_service import PDFRenderService
+    from integrations.drive_upload_queue import DriveUploadQueue
+    from integrations.deferred_steps import DeferredStepQueue
+    from integrations.property_store import PropertyStore
+    from integrations.feed_builder import FeedBuilder
+    from integrations.feed_publisher import FeedPublisher
+    from integrations.photo_checker import PhotoURLChecker
+
 
 class IntegrationOrchestrator:
     """Orquestrador principal que coordena todas as integrações"""
     
-    def __init__(self):
-        """Inicializa o orquestrador com todas as integrações"""
-        # Inicializa integrações uma a uma, sem derrubar tudo se alguma falhar
-        # Isso evita que problemas na OpenAI/ChatGPT impeçam o resto do fluxo
-        
-        # ChatGPT
-        try:
-            self.chatgpt = ChatGPTIntegration()
-        except Exception as e:
-            print(f"⚠️  Aviso: Erro ao inicializar ChatGPTIntegration: {e}")
-            self.chatgpt = None
-        
-        # ClickUp (obrigatório para criação de tarefas)
-        try:
-            self.clickup = ClickUpIntegration()
-        except Exception as e:
-            print(f"⚠️  Aviso: Erro ao inicializar ClickUpIntegration: {e}")
-            self.clickup = None
+    def __init__(self, start_upload_workers: bool = True):
+        """
+        Inicializa o orquestrador
         
-        # Chaves na Mão - tenta inicializar, mas não é obrigatório (usa XML)
-        try:
-            self.chaves_na_mao = ChavesNaMaoIntegration()
-        except Exception:
-            self.chaves_na_mao = None  # Não precisa de API Key, usa XML
+        As integrações são criadas sob demanda (no primeiro acesso) e reaproveitadas,
+        para que scripts que usam só uma delas não paguem a inicialização de todas.
         
-        # Wasseller (WhatsApp) - importante para notificações
-        try:
-            self.wasseller = WassellerIntegration()
-            # Inicializa gerenciador de fila para evitar conflitos com uso manual
-            self.wasseller_queue = WassellerQueueManager(self.wasseller)
-        except Exception as e:
-            print(f"⚠️  Aviso: Erro ao inicializar WassellerIntegration: {e}")
-            self.wasseller = None
-            self.wasseller_queue = None
+        Args:
+            start_upload_workers: Se False, a fila do Drive só recebe uploads
+                (os workers rodam em outro processo, ex.: o servidor web)
+        """
+        self.start_upload_workers = start_upload_workers
+        # Integrações já construídas (None = falhou ao inicializar, não tenta de novo)
+        self._integrations = {}
+        self._integrations_lock = threading.RLock()
+        self._google_credentials = None
+        self._google_credentials_loaded = False
         
-        # Sistema de fallback por email
-        try:
-            self.email_fallback = EmailFallback()
-        except Exception as e:
-            print(f"⚠️  Aviso: Erro ao inicializar EmailFallback: {e}")
-            self.email_fallback = None
+        # Pool compartilhado para processar respostas (webhook e sincronização)
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.ORCHESTRATOR_MAX_WORKERS,
+            thread_name_prefix='lead-worker'
+        )
+        self.form_sync = FormSyncCoordinator(self)
+        self.pdf_archive = PDFArchive()
+    
+    def _get_integration(self, name: str, factory, warn: bool = True):
+        """
+        Constrói a integração no primeiro acesso e memoriza o resultado
         
-        # Google Forms e Drive precisam de credenciais OAuth2
-        # Tenta carregar automaticamente se arquivo existir
-        self.google_forms = None
-        self.google_drive = None
+        Inicializa integrações uma a uma, sem derrubar tudo se alguma falhar.
+        Isso evita que problemas na OpenAI/ChatGPT impeçam o resto do fluxo.
+        """
+        if name in self._integrations:
+            return self._integrations[name]
         
-        # Tenta carregar credenciais automaticamente
-        try:
-            if os.path.exists('google_credentials.json'):
-                from google.oauth2.credentials import Credentials
-                creds = Credentials.from_authorized_user_file('google_credentials.json')
-                self.set_google_credentials(creds)
-                print("✅ Credenciais Google carregadas automaticamente")
-        except Exception as e:
-            print(f"⚠️  Aviso: Não foi possível carregar credenciais Google automaticamente: {e}")
+        with self._integrations_lock:
+            if name not in self._integrations:
+                try:
+                    self._integrations[name] = factory()
+                except Exception as e:
+                    if warn:
+                        print(f"⚠️  Aviso: Erro ao inicializar {name}: {e}")
+                    self._integrations[name] = None
+            return self._integrations[name]
+    
+    @property
+    def pdf_renderer(self) -> 'PDFRenderService':
+        """Pool de processos para renderizar PDFs em lote (criado no primeiro uso)"""
+        def factory():
+            from integrations.pdf_render_service import PDFRenderService
+            return PDFRenderService()
+        return self._get_integration('PDFRenderService', factory)
+    
+    @property
+    def drive_uploads(self) -> Optional['DriveUploadQueue']:
+        """Fila persistente de uploads do Drive (workers iniciados no primeiro uso)"""
+        def factory():
+            from integrations.drive_upload_queue import DriveUploadQueue
+            queue = DriveUploadQueue(lambda: self.google_drive)
+            if self.start_upload_workers:
+                queue.start()
+            return queue
+        return self._get_integration('DriveUploadQueue', factory)
+    
+    @property
+    def deferred_steps(self) -> Optional['DeferredStepQueue']:
+        """Etapas adiadas por integração fora do ar (reexecutadas pelo agendador)"""
+        def factory():
+            from integrations.deferred_steps import DeferredStepQueue
+            return DeferredStepQueue()
+        return self._get_integration('DeferredStepQueue', factory)
+    
+    @property
+    def property_store(self) -> Optional['PropertyStore']:
+        """Imóveis do feed do Chaves na Mão (fonte do feed completo e incremental)"""
+        def factory():
+            from integrations.property_store import PropertyStore
+            store = PropertyStore()
+            # Primeira execução: importa os imóveis do feed já publicado
+            if store.count() == 0 and os.path.exists(Config.CHAVES_NA_MAO_FEED_FILE):
+                try:
+                    store.upsert_many(self._load_feed_properties(Config.CHAVES_NA_MAO_FEED_FILE))
+                except Exception as e:
+                    print(f"⚠️  Aviso: Não foi possível importar o feed existente: {e}")
+            return store
+        return self._get_integration('PropertyStore', factory)
+    
+    @property
+    def feed_builder(self) -> Optional['FeedBuilder']:
+        """Gera o feed completo e os sub-feeds por categoria/transação"""
+        def factory():
+            from integrations.feed_builder import FeedBuilder
+            return FeedBuilder(self.property_store, photo_checker=self.photo_checker)
+        return self._get_integration('FeedBuilder', factory)
+    
+    @property
+    def photo_checker(self) -> Optional['PhotoURLChecker']:
+        """Cache de verificação das URLs de fotos do feed (None se PHOTO_CHECK_ENABLED=False)"""
+        if not Config.PHOTO_CHECK_ENABLED:
+            return None
+        def factory():
+            from integrations.photo_checker import PhotoURLChecker
+            return PhotoURLChecker(on_change=self._on_photos_checked)
+        return self._get_integration('PhotoURLChecker', factory)
+    
+    def _on_photos_checked(self, urls: Set[str]):
+        """Fotos que entraram/saíram de 'quebradas': gera de novo os imóveis que as usam"""
+        if self.feed_builder.dead_photo_action != 'exclude':
+            return
+        keys = self.feed_builder.keys_with_photos(urls)
+        if keys:
+            self.feed_publisher.request(keys)
+    
+    @property
+    def feed_publisher(self) -> Optional['FeedPublisher']:
+        """Único escritor do feed: junta as atualizações e grava de forma atômica"""
+        def factory():
+            from integrations.feed_publisher import FeedPublisher
+            publisher = FeedPublisher(self.feed_builder)
+            publisher.start()
+            return publisher
+        return self._get_integration('FeedPublisher', factory)
+    
+    @property
+    def chatgpt(self) -> Optional['ChatGPTIntegration']:
+        """ChatGPT"""
+        def factory():
+            from integrations.chatgpt import ChatGPTIntegration
+            return ChatGPTIntegration()
+        return self._get_integration('ChatGPTIntegration', factory)
+    
+    @property
+    def clickup(self) -> Optional['ClickUpIntegration']:
+        """ClickUp (obrigatório para criação de tarefas)"""
+        def factory():
+            from integrations.clickup import ClickUpIntegration
+            return ClickUpIntegration()
+        return self._get_integration('ClickUpIntegration', factory)
+    
+    @property
+    def chaves_na_mao(self) -> Optional['ChavesNaMaoIntegration']:
+        """Chaves na Mão - não é obrigatório (o feed é gerado em XML, sem API Key)"""
+        def factory():
+            from integrations.chaves_na_mao import ChavesNaMaoIntegration
+            return ChavesNaMaoIntegration()
+        return self._get_integration('ChavesNaMaoIntegration', factory, warn=False)
+    
+    @property
+    def wasseller(self) -> Optional['WassellerIntegration']:
+        """Wasseller (WhatsApp) - importante para notificações"""
+        def factory():
+            from integrations.wasseller import WassellerIntegration
+            return WassellerIntegration()
+        return self._get_integration('WassellerIntegration', factory)
+    
+    @property
+    def wasseller_queue(self) -> Optional['WassellerQueueManager']:
+        """Gerenciador de fila para evitar conflitos com uso manual do Wasseller"""
+        def factory():
+            if not self.wasseller:
+                return None
+            from integrations.wasseller_queue_manager import WassellerQueueManager
+            return WassellerQueueManager(self.wasseller)
+        return self._get_integration('WassellerQueueManager', factory)
+    
+    @property
+    def email_fallback(self) -> Optional['EmailFallback']:
+        """Sistema de fallback por email"""
+        def factory():
+            from integrations.email_fallback import EmailFallback
+            return EmailFallback()
+        return self._get_integration('EmailFallback', factory)
+    
+    def _ensure_google_credentials(self):
+        """Carrega google_credentials.json no primeiro acesso ao Forms/Drive"""
+        if self._google_credentials_loaded:
+            return
+        with self._integrations_lock:
+            if self._google_credentials_loaded:
+                return
+            self._google_credentials_loaded = True
+            try:
+                if self._google_credentials is None and os.path.exists('google_credentials.json'):
+                    from google.oauth2.credentials import Credentials
+                    self._google_credentials = Credentials.from_authorized_user_file('google_credentials.json')
+                    print("✅ Credenciais Google carregadas automaticamente")
+            except Exception as e:
+                print(f"⚠️  Aviso: Não foi possível carregar credenciais Google automaticamente: {e}")
+    
+    def _get_google_integration(self, name: str, factory):
+        """Integrações Google: só existem quando há credenciais OAuth2"""
+        self._ensure_google_credentials()
+        if self._google_credentials is None:
+            return None
+        return self._get_integration(name, factory)
+    
+    @property
+    def google_forms(self) -> Optional['GoogleFormsIntegration']:
+        """Google Forms (precisa de credenciais OAuth2)"""
+        def factory():
+            from integrations.google_forms import GoogleFormsIntegration
+            return GoogleFormsIntegration(self._google_credentials)
+        return self._get_google_integration('GoogleFormsIntegration', factory)
+    
+    @property
+    def google_drive(self) -> Optional['GoogleDriveIntegration']:
+        """Google Drive (precisa de credenciais OAuth2)"""
+        def factory():
+            from integrations.google_drive import GoogleDriveIntegration
+            return GoogleDriveIntegration(self._google_credentials)
+        return self._get_google_integration('GoogleDriveIntegration', factory)
+    
+    @property
+    def forms_watch(self) -> Optional['FormsWatchManager']:
+        """Gerenciador de watches do Forms (ingestão push)"""
+        def factory():
+            if not self.google_forms:
+                return None
+            from integrations.forms_watch import FormsWatchManager
+            return FormsWatchManager(self.google_forms)
+        return self._get_google_integration('FormsWatchManager', factory)
+    
+    @staticmethod
+    def _same_credentials(current, new) -> bool:
+        """Indica se duas credenciais OAuth2 são da mesma conta/cliente"""
+        if current is None or new is None:
+            return False
+        if current is new:
+            return True
+        return (
+            getattr(current, 'refresh_token', None) == getattr(new, 'refresh_token', None)
+            and getattr(current, 'client_id', None) == getattr(new, 'client_id', None)
+        )
     
     def set_google_credentials(self, credentials):
         """
         Define as credenciais do Google para Forms e Drive
         
+        Se forem as mesmas credenciais já em uso, os serviços já construídos
+        são mantidos (nada é reconstruído).
+        
         Args:
             credentials: Credenciais OAuth2 do Google
         """
-        self.google_forms = GoogleFormsIntegration(credentials)
-        self.google_drive = GoogleDriveIntegration(credentials)
+        with self._integrations_lock:
+            self._google_credentials_loaded = True
+            if self._same_credentials(self._google_credentials, credentials):
+                return
+            self._google_credentials = credentials
+            for name in ('GoogleFormsIntegration', 'GoogleDriveIntegration', 'FormsWatchManager'):
+                self._integrations.pop(name, None)
+    
+    @staticmethod
+    def _is_property_response(form_response: Dict) -> bool:
+        """Indica se a resposta é de imóvel (True) ou de demanda de cliente (False)"""
+        answers = form_response.get('answers', {})
+        tipo_form = form_response.get('form_title', '').lower()
+        
+        # Se tem campos específicos de imóvel (valor, quartos, etc) ou título indica imóvel
+        return bool(
+            'imovel' in tipo_form or 'imóvel' in tipo_form
+            or answers.get('valor') or answers.get('quartos')
+        )
     
     def process_form_response(
         self,
@@ -93,7 +309,9 @@ class IntegrationOrchestrator:
         send_whatsapp: bool = True,
         create_lead: bool = True,
         save_to_drive: bool = True,
-        create_task: bool = True
+        create_task: bool = True,
+        use_render_pool: bool = False,
+        task_batch: Optional[List[Dict]] = None
     ) -> Dict:
         """
         Processa uma resposta de formulário completa
@@ -104,6 +322,9 @@ class IntegrationOrchestrator:
             create_lead: Se deve criar lead no Chaves na Mão
             save_to_drive: Se deve salvar no Google Drive
             create_task: Se deve criar tarefa no ClickUp
+            use_render_pool: Gera o PDF no pool de processos (lotes e backfills)
+            task_batch: Se fornecida, a tarefa do ClickUp não é criada aqui: o item
+                        entra na lista para ser criado em lote (process_batch)
             
         Returns:
             Resultado do processamento completo
@@ -118,16 +339,26 @@ class IntegrationOrchestrator:
         
         try:
             # Passo 1: Analisar com ChatGPT (ou usar dados simulados se não disponível)
-            if self.chatgpt:
+            chatgpt_breaker = get_breaker('chatgpt')
+            analysis = None
+            if self.chatgpt and chatgpt_breaker.allows_calls():
                 print(f"Analisando resposta {result['response_id']} com ChatGPT...")
                 analysis = self.chatgpt.analyze_form_data(form_response)
-                task_description = self.chatgpt.generate_task_description(analysis)
-                result['steps']['chatgpt_analysis'] = {
-                    'success': True,
-                    'analysis': analysis
-                }
-            else:
-                print(f"⚠️  ChatGPT não disponível, usando análise simulada...")
+                if 'error' in analysis and not chatgpt_breaker.allows_calls():
+                    # O circuito abriu nesta chamada: segue com a análise simulada
+                    analysis = None
+                else:
+                    task_description = self.chatgpt.generate_task_description(analysis)
+                    result['steps']['chatgpt_analysis'] = {
+                        'success': True,
+                        'analysis': analysis
+                    }
+            
+            if analysis is None:
+                if self.chatgpt:
+                    print(f"⚠️  ChatGPT fora do ar (circuito aberto), usando análise simulada...")
+                else:
+                    print(f"⚠️  ChatGPT não disponível, usando análise simulada...")
                 # Cria análise simulada baseada nos dados do formulário
                 answers = form_response.get('answers', {})
                 analysis = {
@@ -165,29 +396,42 @@ Observações: {analysis['informacoes_extraidas']['observacoes']}
                 result['steps']['chatgpt_analysis'] = {
                     'success': True,
                     'analysis': analysis,
-                    'note': 'Análise simulada (ChatGPT não disponível)'
+                    'note': 'Análise simulada (ChatGPT não disponível)',
+                    'circuit_open': bool(self.chatgpt)
                 }
             
             # Passo 2: Criar tarefa no ClickUp
-            if create_task:
+            if create_task and task_batch is not None:
+                # Lote: process_batch cria todas as tarefas de uma vez no final
+                task_batch.append({
+                    'analysis': analysis,
+                    'task_description': task_description,
+                    'response_id': result['response_id'],
+                    'result': result
+                })
+                result['steps']['clickup_task'] = {'success': True, 'pending': True}
+            elif create_task:
                 try:
                     print(f"Criando tarefa no ClickUp...")
-                    task = self.clickup.create_task_from_analysis(
+                    # Reprocessamento da mesma resposta atualiza a tarefa existente
+                    outcome = self.clickup.upsert_task_from_analysis(
                         analysis=analysis,
                         task_description=task_description,
                         response_id=result['response_id']
                     )
-                    result['steps']['clickup_task'] = {
+                    task = outcome['task']
+                    self._record_clickup_step(result, analysis, task_description, {
                         'success': True,
+                        'action': outcome['action'],
                         'task_id': task.get('id'),
                         'task_url': task.get('url')
-                    }
+                    })
                 except Exception as e:
-                    result['steps']['clickup_task'] = {
+                    self._record_clickup_step(result, analysis, task_description, {
                         'success': False,
-                        'error': str(e)
-                    }
-                    result['errors'].append(f"ClickUp: {str(e)}")
+                        'error': str(e),
+                        'service_failure': isinstance(e, CircuitOpenError) or is_service_failure(e)
+                    })
             
             # Passo 3: Gerar XML do Chaves na Mão
             if create_lead:
@@ -228,34 +472,14 @@ Observações: {analysis['informacoes_extraidas']['observacoes']}
                         'descritivo': answers.get('observacoes', info.get('observacoes', '')),
                         'fotos': answers.get('fotos', []) if isinstance(answers.get('fotos'), list) else [],
                     }
+                    # Linha de produto do formulário (sub-feed feeds/<categoria>.xml)
+                    category = Config.get_form_category(form_response.get('form_id'))
+                    if category:
+                        property_data['categoria'] = category
                     
-                    # Atualiza feed principal
-                    feed_file = 'chaves_na_mao_feed.xml'
-                    existing_properties = []
-                    
-                    # Carrega feed existente
-                    if os.path.exists(feed_file):
-                        try:
-                            tree = ET.parse(feed_file)
-                            root = tree.getroot()
-                            for imovel_elem in root.findall('.//imovel'):
-                                prop_data = {}
-                                for child in imovel_elem:
-                                    if child.text:
-                                        prop_data[child.tag] = child.text
-                                if prop_data:
-                                    existing_properties.append(prop_data)
-                        except:
-                            existing_properties = []
-                    
-                    # Adiciona novo imóvel (evita duplicatas)
-                    if not any(p.get('codigo', p.get('referencia')) == property_data['codigo'] for p in existing_properties):
-                        existing_properties.append(property_data)
-                    
-                    # Gera novo feed
-                    feed_xml = generator.generate_feed_xml(existing_properties)
-                    with open(feed_file, 'w', encoding='utf-8') as f:
-                        f.write(feed_xml)
+                    # Atualiza o imóvel no banco do feed; o publicador junta as atualizações
+                    # de leads simultâneos e gera o feed e os sub-feeds afetados uma vez só
+                    self.feed_publisher.upsert(property_data)
                     
                     result['steps']['chaves_na_mao_xml'] = {
                         'success': True,
@@ -278,49 +502,71 @@ Observações: {analysis['informacoes_extraidas']['observacoes']}
             if save_to_drive:
                 try:
                     # Detecta se é imóvel ou demanda baseado nos dados
-                    answers = form_response.get('answers', {})
-                    tipo_form = form_response.get('form_title', '').lower()
-                    
-                    # Se tem campos específicos de imóvel (valor, quartos, etc) ou título indica imóvel
-                    if 'imovel' in tipo_form or 'imóvel' in tipo_form or answers.get('valor') or answers.get('quartos'):
-                        is_property = True
-                    else:
-                        is_property = False
+                    is_property = self._is_property_response(form_response)
                     
-                    # Gera PDF
+                    # Gera PDF em memória (sem arquivo temporário em disco)
                     print(f"Gerando PDF...")
-                    from integrations.pdf_generator import PDFGenerator
-                    pdf_generator = PDFGenerator()
-                    
-                    if is_property:
-                        pdf_path = pdf_generator.generate_property_pdf(
+                    if use_render_pool and self.pdf_renderer:
+                        pdf_bytes = self.pdf_renderer.render(
                             form_data=form_response,
                             analysis=analysis,
-                            response_id=result['response_id']
+                            response_id=result['response_id'],
+                            kind='imovel' if is_property else 'demanda'
                         )
                     else:
-                        pdf_path = pdf_generator.generate_demand_pdf(
+                        from integrations.pdf_generator import get_pdf_generator
+                        pdf_bytes = get_pdf_generator().render_pdf(
                             form_data=form_response,
                             analysis=analysis,
-                            response_id=result['response_id']
+                            response_id=result['response_id'],
+                            is_property=is_property
                         )
                     
-                    print(f"PDF gerado: {pdf_path}")
+                    pdf_file_name = (
+                        f"{'imovel' if is_property else 'demanda'}_{result['response_id']}_"
+                        f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                    )
+                    
+                    # Cópia local só se o arquivo estiver habilitado ou se não houver Drive
+                    if Config.PDF_ARCHIVE_ENABLED or not self.google_drive:
+                        pdf_path = self.pdf_archive.save(pdf_file_name, pdf_bytes)
+                    
+                    print(f"PDF gerado: {pdf_path or f'{len(pdf_bytes)} bytes em memória'}")
                     result['steps']['pdf_generation'] = {
                         'success': True,
-                        'pdf_path': pdf_path
+                        'pdf_path': pdf_path,
+                        'pdf_size': len(pdf_bytes)
                     }
                     
-                    # Tenta salvar PDF no Google Drive (se configurado)
-                    if self.google_drive:
+                    # Upload em fila própria: o pipeline segue sem esperar o Drive
+                    # (também no modo síncrono, se o circuito do Drive estiver aberto)
+                    drive_async = Config.DRIVE_UPLOAD_ASYNC or not get_breaker('google_drive').allows_calls()
+                    if self.google_drive and drive_async and self.drive_uploads:
+                        upload_id = self.drive_uploads.enqueue(
+                            response_id=result['response_id'],
+                            form_data=form_response,
+                            analysis=analysis,
+                            pdf_bytes=pdf_bytes,
+                            is_property=is_property
+                        )
+                        print(f"PDF na fila de upload do Drive (#{upload_id})")
+                        result['steps']['google_drive'] = {
+                            'success': True,
+                            'queued': True,
+                            'upload_id': upload_id,
+                            'status': 'pending',
+                            'pdf_path': pdf_path
+                        }
+                    # Upload síncrono (DRIVE_UPLOAD_ASYNC=False)
+                    elif self.google_drive:
                         try:
                             print(f"Salvando PDF no Google Drive...")
                             document = self.google_drive.save_form_response_document(
                                 form_data=form_response,
                                 analysis=analysis,
                                 response_id=result['response_id'],
-                                pdf_path=pdf_path,
-                                is_property=is_property
+                                is_property=is_property,
+                                pdf_bytes=pdf_bytes
                             )
                             result['steps']['google_drive'] = {
                                 'success': True,
@@ -330,10 +576,14 @@ Observações: {analysis['informacoes_extraidas']['observacoes']}
                                 'folder_created': is_property  # Indica se pasta foi criada
                             }
                         except Exception as e:
+                            # Upload falhou: guarda o PDF localmente para não perdê-lo
+                            if pdf_path is None:
+                                pdf_path = self.pdf_archive.save(pdf_file_name, pdf_bytes)
                             result['steps']['google_drive'] = {
                                 'success': False,
                                 'error': str(e),
-                                'note': 'PDF gerado localmente, mas upload para Drive falhou'
+                                'note': 'PDF gerado localmente, mas upload para Drive falhou',
+                                'pdf_path': pdf_path
                             }
                             result['errors'].append(f"Google Drive: {str(e)}")
                     else:
@@ -343,9 +593,6 @@ Observações: {analysis['informacoes_extraidas']['observacoes']}
                             'pdf_path': pdf_path
                         }
                     
-                    # Limpa PDF local após upload (opcional)
-                    # os.remove(pdf_path)  # Descomente se quiser remover após upload
-                    
                 except Exception as e:
                     result['steps']['pdf_generation'] = {
                         'success': False,
@@ -530,6 +777,166 @@ Equipe Imobiliária
         
         return result
     
+    def _record_clickup_step(self, result: Dict, analysis: Dict, task_description: str, outcome: Dict):
+        """
+        Grava no resultado o passo do ClickUp (criação individual ou em lote)
+        
+        Falha por ClickUp fora do ar adia a etapa (reexecutada pelo agendador);
+        as demais entram nos erros da resposta.
+        """
+        if outcome['success']:
+            result['steps']['clickup_task'] = {
+                'success': True,
+                'action': outcome['action'],
+                'task_id': outcome['task_id'],
+                'task_url': outcome['task_url']
+            }
+            return
+        
+        deferred_id = None
+        if outcome.get('service_failure') and self.deferred_steps:
+            deferred_id = self.deferred_steps.enqueue(
+                'clickup_task',
+                result['response_id'],
+                {'analysis': analysis, 'task_description': task_description},
+                not_before=get_breaker('clickup').retry_at,
+                error=outcome['error']
+            )
+        if deferred_id:
+            print(f"⏸️  Tarefa do ClickUp adiada (#{deferred_id}): {outcome['error']}")
+            result['steps']['clickup_task'] = {
+                'success': True,
+                'deferred': True,
+                'deferred_id': deferred_id,
+                'reason': outcome['error']
+            }
+        else:
+            result['steps']['clickup_task'] = {
+                'success': False,
+                'error': outcome['error']
+            }
+            result['errors'].append(f"ClickUp: {outcome['error']}")
+            result['success'] = False
+    
+    @staticmethod
+    def _property_from_element(imovel_elem) -> Dict:
+        """Converte um elemento <imovel> de volta nos dados usados pelo gerador de XML"""
+        from integrations.chaves_na_mao_fields import parse_imovel_element
+        # Mesma especificação do gerador: valores tipados (500000.00 não vira 50000000)
+        return parse_imovel_element(imovel_elem)
+    
+    def _load_feed_properties(self, xml_file: str) -> List[Dict]:
+        """Lê os imóveis de um XML no formato do feed do Chaves na Mão"""
+        root = ET.parse(xml_file).getroot()
+        properties = []
+        for imovel_elem in root.findall('.//imovel'):
+            prop_data = self._property_from_element(imovel_elem)
+            if any(prop_data.values()):
+                properties.append(prop_data)
+        return properties
+    
+    def rebuild_chaves_na_mao_feed(
+        self,
+        source_dir: str = 'imoveis',
+        feed_file: Optional[str] = None
+    ) -> Dict:
+        """
+        Reconstrói o feed do Chaves na Mão a partir dos XMLs individuais dos imóveis
+        
+        Os imóveis dos XMLs individuais são gravados no banco do feed (só os
+        alterados ganham nova versão) e o feed é gerado a partir do banco,
+        depois de aplicado o ciclo de vida (expiração, testes e limite). XMLs
+        mais antigos que o TTL e imóveis de teste não voltam para o feed.
+        
+        Args:
+            source_dir: Pasta com os XMLs individuais (um por resposta)
+            feed_file: Arquivo do feed a ser gerado (padrão: CHAVES_NA_MAO_FEED_FILE)
+            
+        Returns:
+            Resumo da reconstrução
+        """
+        feed_file = feed_file or Config.CHAVES_NA_MAO_FEED_FILE
+        store = self.property_store
+        oldest_mtime = time.time() - store.ttl_days * 86400 if store.ttl_days else 0
+        properties = {}
+        skipped = 0
+        errors = []
+        if os.path.isdir(source_dir):
+            for file_name in sorted(os.listdir(source_dir)):
+                if not file_name.endswith('.xml'):
+                    continue
+                file_path = os.path.join(source_dir, file_name)
+                try:
+                    if os.path.getmtime(file_path) < oldest_mtime:
+                        skipped += 1
+                        continue
+                    for prop_data in self._load_feed_properties(file_path):
+                        codigo = prop_data.get('codigo', prop_data.get('referencia'))
+                        if store.is_test_key(codigo):
+                            skipped += 1
+                            continue
+                        prop_data.setdefault('codigo', codigo)
+                        properties[codigo] = prop_data
+                except Exception as e:
+                    errors.append({'file': file_name, 'error': str(e)})
+        
+        changed = store.upsert_many(properties.values())
+        lifecycle = store.enforce_policy()
+        if feed_file == self.feed_builder.feed_file:
+            published = self.feed_publisher.publish() or {}
+        else:
+            published = self.feed_builder.publish(feed_file=feed_file)
+        
+        return {
+            'properties': published.get('properties', 0),
+            'changed': len(changed),
+            'skipped': skipped,
+            'lifecycle': {key: value for key, value in lifecycle.items() if key != 'changed_keys'},
+            'feed_file': feed_file,
+            'sub_feeds': published.get('sub_feeds', []),
+            'errors': errors + ([{'file': feed_file, 'error': published['error']}] if 'error' in published else [])
+        }
+    
+    def enforce_feed_retention(self) -> Dict:
+        """Aplica o ciclo de vida dos imóveis do feed e regenera o que mudou"""
+        lifecycle = self.property_store.enforce_policy()
+        changed_keys = lifecycle.pop('changed_keys')
+        if changed_keys:
+            lifecycle['sub_feeds'] = (self.feed_publisher.publish(changed_keys) or {}).get('sub_feeds', [])
+        return lifecycle
+    
+    def check_feed_photos(self) -> Dict:
+        """
+        Verifica agora as fotos do feed sem verificação ou com verificação vencida
+        
+        A geração do feed só consulta o cache; esta tarefa (agendador) mantém o
+        cache em dia para todos os imóveis publicados.
+        """
+        checker = self.photo_checker
+        if not checker:
+            return {'enabled': False}
+        from integrations.feed_builder import photo_urls
+        from integrations.photo_checker import DEAD, ERROR
+        urls = {url for property_data in self.property_store.get_all() for url in photo_urls(property_data)}
+        checks = checker.lookup(urls)
+        now = time.time()
+        stale = [url for url in urls if checker.is_stale(checks.get(url), now)]
+        results = checker.check_urls(stale)
+        return {
+            'photos': len(urls),
+            'checked': len(results),
+            'dead': sum(1 for r in results.values() if r['status'] == DEAD),
+            'errors': sum(1 for r in results.values() if r['status'] == ERROR),
+            'purged': checker.purge(),
+        }
+    
+    def remove_feed_property(self, key: str) -> bool:
+        """Remove um imóvel do feed (soft delete) e regenera o feed"""
+        removed = self.property_store.soft_delete([key])
+        if removed:
+            self.feed_publisher.publish(removed)
+        return bool(removed)
+    
     def sync_google_forms(
         self,
         form_id: Optional[str] = None,
@@ -562,7 +969,7 @@ Equipe Imobiliária
             
             # Formata respostas
             formatted_responses = [
-                self.google_forms.format_response_data(resp)
+                self.google_forms.format_response_data(resp, form_id)
                 for resp in responses
             ]
             
@@ -585,16 +992,222 @@ Equipe Imobiliária
         
         return sync_result
     
-    def process_batch(self, form_responses: List[Dict]) -> Dict:
+    def sync_all_forms(
+        self,
+        last_sync: Optional[str] = None,
+        skip_response_ids: Optional[Set[str]] = None,
+        **process_options
+    ) -> Dict:
+        """
+        Sincroniza todos os formulários configurados em paralelo
+        
+        Args:
+            last_sync: Timestamp da última sincronização
+            skip_response_ids: Respostas já processadas com sucesso (não são processadas de novo)
+            **process_options: Opções repassadas ao process_form_response
+            
+        Returns:
+            Relatório agregado com tempos por formulário
+        """
+        return self.form_sync.sync_forms(
+            last_sync=last_sync,
+            process_options=process_options,
+            skip_response_ids=skip_response_ids
+        )
+    
+    def handle_forms_notification(self, envelope: Dict) -> Dict:
+        """
+        Trata uma notificação push de watch do Google Forms
+        
+        Responde rápido: a busca do delta e o processamento vão para o pool.
+        
+        Args:
+            envelope: Corpo JSON enviado pela assinatura push do Pub/Sub
+            
+        Returns:
+            Status do recebimento
+        """
+        if not self.forms_watch:
+            raise ValueError("Google Forms não inicializado. Configure as credenciais primeiro.")
+        
+        notification = self.forms_watch.parse_notification(envelope)
+        if notification is None:
+            return {'status': 'duplicate'}
+        
+        form_id = notification['form_id']
+        if notification['event_type'] == 'SCHEMA':
+            # Formulário editado: descarta o schema em cache e busca o novo
+            self.google_forms.schema_cache.invalidate(form_id)
+            self.executor.submit(self.google_forms.refresh_form_schema, form_id)
+        else:
+            self.executor.submit(self.ingest_form_delta, form_id)
+        
+        return {'status': 'accepted', **notification}
+    
+    def ingest_form_delta(self, form_id: str) -> Dict:
+        """
+        Busca só as respostas novas desde a última ingestão e processa
+        
+        A marca d'água só avança depois que as respostas foram processadas, e
+        nunca passa de uma resposta que falhou. Notificações que chegam enquanto
+        o formulário está sendo ingerido viram mais uma passada de quem já está
+        ingerindo, em vez de prender outra thread do pool esperando o lock.
+        
+        Args:
+            form_id: ID do formulário notificado
+            
+        Returns:
+            Respostas processadas, com falha e puladas (já processadas antes)
+        """
+        summary = {'form_id': form_id, 'responses_processed': 0, 'failed': 0, 'skipped': 0}
+        form_lock = self.forms_watch.form_lock(form_id)
+        # Marca antes de tentar o lock: se outra thread estiver ingerindo, ela vê a marca ao terminar
+        self.forms_watch.request_rerun(form_id)
+        while True:
+            if not form_lock.acquire(blocking=False):
+                summary['status'] = 'coalesced'
+                return summary
+            try:
+                while self.forms_watch.take_rerun(form_id):
+                    result = self._ingest_form_delta_once(form_id)
+                    for key in ('responses_processed', 'failed', 'skipped'):
+                        summary[key] += result[key]
+            finally:
+                form_lock.release()
+            if not self.forms_watch.has_rerun(form_id):
+                return summary
+    
+    def _ingest_form_delta_once(self, form_id: str) -> Dict:
+        """Uma passada de ingestão (chamada com o lock do formulário)"""
+        watermark = self.forms_watch.get_watermark(form_id)
+        processed = self.forms_watch.get_processed(form_id)
+        with self.form_sync.forms_quota:
+            responses = self.google_forms.get_new_responses(form_id, watermark)
+        
+        results = []
+        skipped = 0
+        for response in responses:
+            formatted = self.google_forms.format_response_data(response, form_id)
+            if formatted.get('response_id') in processed:
+                skipped += 1
+                continue
+            try:
+                result = self.process_form_response(formatted)
+            except Exception as e:
+                result = {'response_id': formatted.get('response_id'), 'success': False, 'errors': [str(e)]}
+            result.setdefault('submission_time', formatted.get('submission_time'))
+            results.append(result)
+        
+        latest = max((resp.get('lastSubmittedTime', '') for resp in responses), default=None)
+        new_watermark, processed = next_watermark(latest, watermark, processed, results)
+        failed = sum(1 for result in results if not result.get('success'))
+        self.forms_watch.advance(form_id, new_watermark, processed, has_failures=failed > 0)
+        
+        if results:
+            print(f"📥 Watch do Forms: {len(results)} nova(s) resposta(s) em {form_id} ({failed} com falha)")
+        
+        return {'responses_processed': len(results), 'failed': failed, 'skipped': skipped}
+    
+    def _replay_clickup_task(self, step: Dict) -> Dict:
+        """Reexecuta a criação/atualização da tarefa do ClickUp de uma resposta"""
+        if not self.clickup:
+            raise ValueError("ClickUp não inicializado")
+        outcome = self.clickup.upsert_task_from_analysis(
+            analysis=step['payload']['analysis'],
+            task_description=step['payload']['task_description'],
+            response_id=step['response_id']
+        )
+        return {
+            'action': outcome['action'],
+            'task_id': outcome['task'].get('id'),
+            'task_url': outcome['task'].get('url')
+        }
+    
+    def replay_deferred_steps(self, max_items: int = 50) -> Dict:
+        """
+        Reexecuta as etapas adiadas cujo circuito já aceita chamadas
+        
+        Args:
+            max_items: Máximo de etapas por execução
+            
+        Returns:
+            Contagem de etapas concluídas, reagendadas e com falha definitiva
+        """
+        handlers = {
+            'clickup_task': ('clickup', self._replay_clickup_task)
+        }
+        report = {'processed': 0, 'done': 0, 'retrying': 0, 'failed': 0, 'skipped_open_circuits': []}
+        if not self.deferred_steps:
+            return {**report, 'skipped': 'Fila de etapas adiadas não disponível'}
+        
+        # Etapas de serviços com circuito aberto ficam na fila (nem são lidas)
+        ready_steps = []
+        for step_name, (breaker_name, _) in handlers.items():
+            if get_breaker(breaker_name).allows_calls():
+                ready_steps.append(step_name)
+            else:
+                report['skipped_open_circuits'].append(breaker_name)
+        
+        claimed = self.deferred_steps.claim_due(limit=max_items, steps=ready_steps)
+        for index, step in enumerate(claimed):
+            # As etapas rodam em sequência: renova o lease das que ainda faltam
+            self.deferred_steps.renew_leases([pending['id'] for pending in claimed[index:]])
+            breaker_name, handler = handlers[step['step']]
+            report['processed'] += 1
+            try:
+                outcome = handler(step)
+                self.deferred_steps.mark_done(step['id'], outcome)
+                report['done'] += 1
+                print(f"✅ Etapa adiada {step['step']} de {step['response_id']} concluída")
+            except CircuitOpenError as e:
+                # Circuito abriu no meio da rodada: devolve sem gastar tentativa
+                self.deferred_steps.postpone(step['id'], e.retry_at, str(e))
+                report['retrying'] += 1
+            except Exception as e:
+                if is_service_failure(e) and self.deferred_steps.mark_retry(step, str(e)):
+                    report['retrying'] += 1
+                else:
+                    if not is_service_failure(e):
+                        self.deferred_steps.mark_failed(step, str(e))
+                    report['failed'] += 1
+                    print(f"❌ Etapa adiada {step['step']} de {step['response_id']} falhou: {e}")
+        
+        report['queue'] = self.deferred_steps.get_stats()
+        return report
+    
+    def process_batch(self, form_responses: List[Dict], **process_options) -> Dict:
         """
         Processa múltiplas respostas em lote
         
+        As respostas rodam no pool compartilhado de workers e os PDFs são
+        renderizados no pool de processos, usando todos os núcleos. As tarefas
+        do ClickUp são criadas no final, todas de uma vez (create_tasks_bulk).
+        
         Args:
             form_responses: Lista de respostas do formulário
+            **process_options: Opções repassadas ao process_form_response
             
         Returns:
             Resultado do processamento em lote
         """
+        process_options.setdefault('use_render_pool', True)
+        task_batch = None
+        if process_options.get('create_task', True) and self.clickup:
+            task_batch = []
+            process_options['task_batch'] = task_batch
+        
+        # Cria de uma vez (requisição em lote) as pastas dos imóveis do lote no Drive
+        if process_options.get('save_to_drive', True) and self.google_drive:
+            folder_names = [
+                self.google_drive.property_folder_name(response.get('response_id'))
+                for response in form_responses
+                if response.get('response_id') and self._is_property_response(response)
+            ]
+            if folder_names:
+                try:
+                    self.google_drive.create_folders(folder_names, parent_folder_id=self.google_drive.folder_id)
+                except Exception as e:
+                    print(f"⚠️  Aviso: Erro ao criar pastas do lote no Drive: {e}")
         batch_result = {
             'timestamp': datetime.now().isoformat(),
             'total': len(form_responses),
@@ -604,24 +1217,33 @@ Equipe Imobiliária
             'results': []
         }
         
-        for response in form_responses:
+        futures = [
+            self.executor.submit(self.process_form_response, response, **process_options)
+            for response in form_responses
+        ]
+        
+        for response, future in zip(form_responses, futures):
             try:
-                result = self.process_form_response(response)
-                batch_result['results'].append(result)
+                batch_result['results'].append(future.result())
                 batch_result['processed'] += 1
-                
-                if result['success']:
-                    batch_result['successful'] += 1
-                else:
-                    batch_result['failed'] += 1
-                    
             except Exception as e:
-                batch_result['failed'] += 1
                 batch_result['results'].append({
                     'response_id': response.get('response_id'),
                     'success': False,
                     'error': str(e)
                 })
         
+        if task_batch:
+            print(f"Criando {len(task_batch)} tarefa(s) no ClickUp em lote...")
+            outcomes = self.clickup.create_tasks_bulk(task_batch)
+            for item, outcome in zip(task_batch, outcomes):
+                self._record_clickup_step(item['result'], item['analysis'], item['task_description'], outcome)
+        
+        for result in batch_result['results']:
+            if result['success']:
+                batch_result['successful'] += 1
+            else:
+                batch_result['failed'] += 1
+        
         return batch_result
 
@@ -3,12 +3,11 @@ Script auxiliar para configurar autenticação OAuth2 do Google
 """
 import os
 import webbrowser
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
 from config import Config
 
 SCOPES = [
     'https://www.googleapis.com/auth/forms.responses.readonly',
+    'https://www.googleapis.com/auth/forms.body.readonly',
     'https://www.googleapis.com/auth/drive.file'
 ]
 
@@ -39,6 +38,7 @@ def setup_google_oauth():
     print(f"   Redirect URI: {Config.GOOGLE_REDIRECT_URI}\n")
     
     try:
+        from google_auth_oauthlib.flow import Flow
         flow = Flow.from_client_config(
             {
                 "web": {
@@ -125,6 +125,7 @@ def setup_google_oauth():
 def load_google_credentials():
     """Carrega credenciais salvas"""
     import json
+    from google.oauth2.credentials import Credentials
     
     # Tenta carregar do arquivo
     if os.path.exists('google_credentials.json'):
@@ -146,7 +147,7 @@ def load_google_credentials():
     token_uri = os.getenv('GOOGLE_OAUTH_TOKEN_URI', 'https://oauth2.googleapis.com/token')
     client_id = Config.GOOGLE_CLIENT_ID
     client_secret = Config.GOOGLE_CLIENT_SECRET
-    scopes_str = os.getenv('GOOGLE_OAUTH_SCOPES', 'https://www.googleapis.com/auth/forms.responses.readonly,https://www.googleapis.com/auth/drive.file')
+    scopes_str = os.getenv('GOOGLE_OAUTH_SCOPES', 'https://www.googleapis.com/auth/forms.responses.readonly,https://www.googleapis.com/auth/forms.body.readonly,https://www.googleapis.com/auth/drive.file')
     
     if token and refresh_token and client_id and client_secret:
         scopes = [s.strip() for s in scopes_str.split(',')]
@@ -12,6 +12,7 @@ from config import Config
 
 SCOPES = [
     'https://www.googleapis.com/auth/forms.responses.readonly',
+    'https://www.googleapis.com/auth/forms.body.readonly',
     'https://www.googleapis.com/auth/drive.file'
 ]
 
@@ -0,0 +1,50 @@
+"""
+Simulador local de notificações de watch do Google Forms
+Envia para o servidor local um envelope igual ao push do Pub/Sub, sem precisar do Google Cloud
+
+Uso:
+    python simular_notificacao_forms.py [form_id] [RESPONSES|SCHEMA] [url]
+"""
+import sys
+import requests
+from config import Config
+from integrations.forms_watch import build_pubsub_envelope
+
+
+def simular_notificacao(form_id=None, event_type='RESPONSES', url='http://localhost:5000/api/webhook/forms-watch'):
+    """Envia uma notificação simulada para o endpoint de watches"""
+    print("="*70)
+    print("📨 SIMULADOR DE NOTIFICAÇÃO - WATCH GOOGLE FORMS")
+    print("="*70)
+
+    form_id = form_id or (Config.get_form_ids() or [None])[0]
+    if not form_id:
+        print("❌ Nenhum formulário informado ou configurado em forms_config.json")
+        return False
+
+    envelope = build_pubsub_envelope(form_id, event_type)
+    params = {'token': Config.GOOGLE_FORMS_WATCH_TOKEN} if Config.GOOGLE_FORMS_WATCH_TOKEN else None
+
+    print(f"\n📋 Formulário: {form_id}")
+    print(f"📌 Evento: {event_type}")
+    print(f"🌐 Endpoint: {url}\n")
+
+    try:
+        response = requests.post(url, json=envelope, params=params, timeout=10)
+        print(f"Status: {response.status_code}")
+        print(f"Resposta: {response.text}")
+        return response.ok
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Erro ao enviar notificação: {e}")
+        print("💡 Verifique se o servidor está rodando: python app.py")
+        return False
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    sucesso = simular_notificacao(
+        form_id=args[0] if len(args) > 0 else None,
+        event_type=args[1].upper() if len(args) > 1 else 'RESPONSES',
+        url=args[2] if len(args) > 2 else 'http://localhost:5000/api/webhook/forms-watch'
+    )
+    sys.exit(0 if sucesso else 1)
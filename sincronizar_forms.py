@@ -42,52 +42,41 @@ def sincronizar_todos_forms():
         print(f"📋 Formulários encontrados: {len(forms)}")
         print()
         
-        total_processados = 0
-        total_erros = 0
+        # Busca todos os formulários em paralelo e processa no pool compartilhado
+        report = orchestrator.sync_all_forms(
+            send_whatsapp=True,
+            create_lead=True,
+            save_to_drive=True,
+            create_task=True,
+            use_render_pool=True  # Backfill: PDFs renderizados em todos os núcleos
+        )
         
-        # Processa cada formulário
-        for form in forms:
-            form_id = form.get('id')
-            form_name = form.get('name', 'Sem nome')
-            
-            print(f"🔄 Processando: {form_name}")
-            
-            try:
-                # Busca novas respostas
-                responses = orchestrator.google_forms.get_new_responses(form_id)
-                
-                if responses:
-                    print(f"   ✅ {len(responses)} nova(s) resposta(s) encontrada(s)")
-                    
-                    # Processa cada resposta
-                    for response in responses:
-                        try:
-                            result = orchestrator.process_form_response(
-                                response,
-                                send_whatsapp=True,
-                                create_lead=True,
-                                save_to_drive=True,
-                                create_task=True
-                            )
-                            
-                            if result.get('success'):
-                                total_processados += 1
-                                print(f"   ✅ Processado: {result.get('response_id', 'N/A')}")
-                            else:
-                                total_erros += 1
-                                print(f"   ❌ Erro ao processar: {result.get('errors', [])}")
-                        except Exception as e:
-                            total_erros += 1
-                            print(f"   ❌ Erro: {str(e)}")
-                else:
-                    print(f"   ℹ️  Nenhuma nova resposta")
-                    
-            except Exception as e:
-                total_erros += 1
-                print(f"   ❌ Erro ao processar formulário: {str(e)}")
-            
+        for form_result in report['form_results']:
+            print(f"🔄 {form_result['form_name']}")
+            if form_result['responses_found']:
+                print(f"   ✅ {form_result['responses_found']} nova(s) resposta(s) encontrada(s)")
+                print(f"   ✅ Processadas: {form_result['successful']} | ❌ Erros: {form_result['failed']}")
+            else:
+                print(f"   ℹ️  Nenhuma nova resposta")
+            print(f"   ⏱️  Busca: {form_result['fetch_seconds']}s | Processamento: {form_result['processing_seconds']}s")
             print()
         
+        for error in report['errors']:
+            print(f"❌ Erro ao processar formulário {error.get('form_name')}: {error.get('error')}")
+        
+        for result in report['results']:
+            if not result.get('success'):
+                print(f"   ❌ Erro ao processar {result.get('response_id', 'N/A')}: {result.get('errors', [])}")
+        
+        # O script termina logo em seguida: espera a fila de uploads do Drive esvaziar
+        if report['total_responses'] and orchestrator.google_drive and orchestrator.drive_uploads:
+            print("⬆️  Aguardando uploads para o Google Drive...")
+            if not orchestrator.drive_uploads.wait_until_idle(timeout=600):
+                print("⚠️  Uploads restantes continuam na fila (serão enviados pelo servidor/agendador)")
+        
+        total_processados = report['successful']
+        total_erros = report['failed'] + len(report['errors'])
+        
         # Resumo
         print("="*70)
         print("📊 RESUMO")
@@ -95,6 +84,7 @@ def sincronizar_todos_forms():
         print(f"✅ Processados com sucesso: {total_processados}")
         print(f"❌ Erros: {total_erros}")
         print(f"📋 Total de formulários verificados: {len(forms)}")
+        print(f"⏱️  Tempo total: {report['elapsed_seconds']}s")
         print()
         
         return total_erros == 0